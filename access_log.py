@@ -0,0 +1,560 @@
+"""
+Columnar Access Log Store
+Keeps access log entries in parallel typed arrays with interned IDs instead
+of one dict per entry, and builds the entry dicts only when they are read.
+"""
+
+import bisect
+import os
+import threading
+import time
+from array import array
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+# Format of the timestamps passed to ChineseWallModel.access_object
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+# Epoch value stored for timestamps that are not in TIMESTAMP_FORMAT; the
+# original string is kept in LogBlock.raw_timestamps instead
+RAW_TIMESTAMP = -2 ** 63
+
+# Naive timestamps are stored as seconds since this moment
+EPOCH = datetime(1970, 1, 1)
+ONE_SECOND = timedelta(seconds=1)
+
+# Company column value for entries without a conflicting or accessed company
+NO_COMPANY = -1
+
+# Columns of a log block and their array type codes
+COLUMN_TYPES = {
+    "timestamps": "q",
+    "users": "i",
+    "companies": "i",
+    "objects": "i",
+    "reason_companies": "i",
+    "granted": "b",
+    "reasons": "b",
+}
+NUMPY_TYPES = {"q": np.int64, "i": np.int32, "b": np.int8}
+
+# Number of in-memory entries read per hold of the log lock
+HOT_READ_BATCH = 1000
+
+# Segment files written in the background at once; a spill beyond this waits
+# for one to finish, so memory stays bounded when the disk falls behind
+MAX_SEGMENT_WRITES = 2
+
+def parse_timestamp(timestamp: str) -> Optional[int]:
+    """Convert a "YYYY-MM-DD HH:MM:SS" timestamp to epoch seconds, or None"""
+    if len(timestamp) != 19 or timestamp[10] != " ":
+        return None
+    try:
+        moment = datetime.fromisoformat(timestamp)
+    except ValueError:
+        return None
+    return (moment - EPOCH) // ONE_SECOND
+
+def format_timestamp(epoch: int) -> str:
+    """Convert epoch seconds back to a "YYYY-MM-DD HH:MM:SS" timestamp"""
+    return time.strftime(TIMESTAMP_FORMAT, time.gmtime(epoch))
+
+def parse_bound(timestamp: str) -> int:
+    """Convert a timestamp or date used as a query bound to epoch seconds"""
+    return (datetime.fromisoformat(timestamp) - EPOCH) // ONE_SECOND
+
+class InternTable:
+    """Maps strings to dense integer indexes"""
+    
+    def __init__(self, values: Sequence[str] = ()):
+        # Format: [string], indexed by string index
+        self.values: List[str] = list(values)
+        
+        # Format: {string: string index}
+        self.index: Dict[str, int] = {value: i for i, value in enumerate(self.values)}
+    
+    def intern(self, value: str) -> int:
+        """Return the index of a string, adding it if needed"""
+        position = self.index.get(value)
+        if position is None:
+            position = self.index[value] = len(self.values)
+            self.values.append(value)
+        return position
+
+class LogBlock:
+    """A run of access log entries: typed columns plus the ID tables they index"""
+    
+    def __init__(self):
+        # Format: {column name: array}, see COLUMN_TYPES
+        self.columns: Dict[str, Any] = {name: array(code) for name, code in COLUMN_TYPES.items()}
+        
+        self.user_ids = InternTable()
+        self.company_ids = InternTable()
+        self.object_ids = InternTable()
+        
+        # Names at the time an ID was first logged, indexed like the intern tables
+        self.user_names: List[str] = []
+        self.company_names: List[str] = []
+        
+        # Timestamps not in TIMESTAMP_FORMAT
+        # Format: {position in block: timestamp}
+        self.raw_timestamps: Dict[int, str] = {}
+    
+    def __len__(self) -> int:
+        return len(self.columns["timestamps"])
+    
+    def column(self, name: str) -> np.ndarray:
+        """Get a column as a NumPy array (a view for in-memory blocks)"""
+        values = self.columns[name]
+        if isinstance(values, array):
+            return np.frombuffer(values, dtype=NUMPY_TYPES[values.typecode])
+        return values
+    
+    def save(self, path: str, count: int) -> None:
+        """Write the first count entries to a compressed, self-contained segment file"""
+        data = {name: self.column(name)[:count].copy() for name in COLUMN_TYPES}
+        
+        # Renumber the IDs so the segment only carries the ones it uses
+        (data["users"],), data["user_ids"], data["user_names"] = self._localize(
+            [data["users"]], self.user_ids, self.user_names)
+        (data["companies"], data["reason_companies"]), data["company_ids"], data["company_names"] = \
+            self._localize([data["companies"], data["reason_companies"]], self.company_ids, self.company_names)
+        (data["objects"],), data["object_ids"], _ = self._localize([data["objects"]], self.object_ids, None)
+        
+        raw = sorted((position, timestamp) for position, timestamp in self.raw_timestamps.items()
+                     if position < count)
+        data["raw_positions"] = np.array([position for position, _ in raw], dtype=np.int64)
+        data["raw_timestamps"] = np.array([timestamp for _, timestamp in raw], dtype=str)
+        
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as segment_file:
+            np.savez_compressed(segment_file, **data)
+        os.replace(tmp_path, path)
+    
+    @staticmethod
+    def _localize(columns: List[np.ndarray], table: InternTable,
+                  names: Optional[List[str]]) -> Tuple[List[np.ndarray], np.ndarray, np.ndarray]:
+        """Renumber ID columns to just the IDs they use, keeping NO_COMPANY entries"""
+        used = np.unique(np.concatenate([values[values != NO_COMPANY] for values in columns]))
+        remap = np.full(len(table.values), NO_COMPANY, dtype=np.int32)
+        remap[used] = np.arange(len(used), dtype=np.int32)
+        
+        localized = [np.where(values == NO_COMPANY, NO_COMPANY, remap[np.maximum(values, 0)]).astype(np.int32)
+                     for values in columns]
+        ids = np.array([table.values[i] for i in used.tolist()], dtype=str)
+        local_names = np.array([names[i] for i in used.tolist()] if names is not None else [], dtype=str)
+        return localized, ids, local_names
+    
+    @classmethod
+    def load(cls, path: str) -> "LogBlock":
+        """Read a segment file written by save()"""
+        block = cls()
+        with np.load(path) as data:
+            block.columns = {name: data[name] for name in COLUMN_TYPES}
+            block.user_ids = InternTable(data["user_ids"].tolist())
+            block.company_ids = InternTable(data["company_ids"].tolist())
+            block.object_ids = InternTable(data["object_ids"].tolist())
+            block.user_names = data["user_names"].tolist()
+            block.company_names = data["company_names"].tolist()
+            block.raw_timestamps = dict(zip(data["raw_positions"].tolist(), data["raw_timestamps"].tolist()))
+        return block
+    
+    def remainder(self, count: int) -> "LogBlock":
+        """
+        Copy the entries after the first count into a new in-memory block
+        Returns: the new block, whose ID tables only hold the IDs its entries use
+        """
+        block = LogBlock()
+        data = {name: self.column(name)[count:] for name in COLUMN_TYPES}
+        
+        (data["users"],), user_ids, user_names = self._localize([data["users"]], self.user_ids, self.user_names)
+        (data["companies"], data["reason_companies"]), company_ids, company_names = \
+            self._localize([data["companies"], data["reason_companies"]], self.company_ids, self.company_names)
+        (data["objects"],), object_ids, _ = self._localize([data["objects"]], self.object_ids, None)
+        
+        block.columns = {name: array(code, data[name].astype(NUMPY_TYPES[code]).tobytes())
+                         for name, code in COLUMN_TYPES.items()}
+        block.user_ids = InternTable(user_ids.tolist())
+        block.company_ids = InternTable(company_ids.tolist())
+        block.object_ids = InternTable(object_ids.tolist())
+        block.user_names = user_names.tolist()
+        block.company_names = company_names.tolist()
+        block.raw_timestamps = {position - count: timestamp
+                                for position, timestamp in self.raw_timestamps.items() if position >= count}
+        return block
+
+class AccessLog(Sequence):
+    """
+    Append-only access log stored column by column.
+
+    Each entry costs about 26 bytes: an int64 epoch timestamp, int32 indexes
+    of the interned user, company, object and the company named in the reason,
+    a granted flag and a reason code. Reading an entry returns the same dict
+    that ChineseWallModel used to store, with names and the reason text
+    resolved from the model at read time. Names of users and companies that
+    were deleted since fall back to the name they had when first logged.
+
+    After spill_to() only the newest max_entries entries stay in memory; older
+    ones are moved to compressed segment files, which reads stream through
+    one segment at a time. A spill only swaps the full block out; its file is
+    written on a background thread, and its entries are read from memory
+    until then.
+
+    Appends are serialized by a lock. Reads stop at the length the log had
+    when they started and take the lock for each batch of in-memory entries,
+    so the log can be read while other threads append.
+    """
+    
+    def __init__(self, model):
+        self.model = model
+        
+        # Directory of spilled segments, or None to keep every entry in memory
+        self.spill_directory: Optional[str] = None
+        
+        # Number of entries kept in memory when spilling
+        self.max_entries = 0
+        
+        # Spilled segments, oldest first, including those still being written
+        # Format: [(file name, entry count)]
+        self._segments: List[Tuple[str, int]] = []
+        self._segment_starts: List[int] = []
+        self._spilled = 0
+        
+        # Spilled blocks whose segment file is not written yet; a block stays
+        # here if its write failed, until the segments property retries it
+        # Format: {file name: (block, entry count)}
+        self._unwritten: Dict[str, Tuple[LogBlock, int]] = {}
+        self._writing = 0
+        
+        # Most recently read segment, as (file name, block)
+        self._cached_segment: Tuple[Optional[str], Optional[LogBlock]] = (None, None)
+        
+        # Most recently parsed timestamp, as consecutive entries often share it
+        self._last_timestamp: Tuple[str, int] = ("", 0)
+        
+        self._hot = LogBlock()
+        self._lock = threading.Lock()
+        self._segment_written = threading.Condition(self._lock)
+    
+    @property
+    def segments(self) -> List[Tuple[str, int]]:
+        """
+        Spilled segments, oldest first, once all their files are written
+        Returns: [(file name, entry count)]
+        """
+        with self._lock:
+            self._wait_for_writes()
+            
+            # Retry the writes that failed in the background, raising if one fails again
+            for file_name, (block, count) in list(self._unwritten.items()):
+                block.save(os.path.join(self.spill_directory, file_name), count)
+                del self._unwritten[file_name]
+            return list(self._segments)
+    
+    def spill_to(self, directory: str, max_entries: int = 100000) -> None:
+        """Keep at most max_entries entries in memory and spill older ones to directory"""
+        os.makedirs(directory, exist_ok=True)
+        with self._lock:
+            self.spill_directory = directory
+            self.max_entries = max_entries
+            self._spill_if_full()
+    
+    def attach_segments(self, segments: Sequence[Tuple[str, int]]) -> None:
+        """Adopt previously spilled segment files as the oldest entries of an empty log"""
+        with self._lock:
+            for file_name, count in segments:
+                self._add_segment(file_name, count)
+    
+    def clear(self) -> None:
+        """Delete all entries, including spilled segment files"""
+        with self._lock:
+            # A file still being written would otherwise be left behind
+            self._wait_for_writes()
+            for file_name, _ in self._segments:
+                try:
+                    os.remove(os.path.join(self.spill_directory, file_name))
+                except OSError:
+                    pass
+            
+            self._segments = []
+            self._segment_starts = []
+            self._spilled = 0
+            self._unwritten = {}
+            self._cached_segment = (None, None)
+            self._hot = LogBlock()
+    
+    def append(self, timestamp: str, user_id: str, company_id: str, object_id: str,
+               granted: bool, reason_code: int, reason_company_id: Optional[str] = None) -> None:
+        """Add an entry; reason_company_id is the conflicting or previously accessed company"""
+        with self._lock:
+            hot = self._hot
+            columns = hot.columns
+            
+            if timestamp == self._last_timestamp[0]:
+                epoch = self._last_timestamp[1]
+            else:
+                epoch = parse_timestamp(timestamp)
+                if epoch is None:
+                    epoch = RAW_TIMESTAMP
+                    hot.raw_timestamps[len(hot)] = timestamp
+                else:
+                    self._last_timestamp = (timestamp, epoch)
+            
+            columns["timestamps"].append(epoch)
+            columns["users"].append(self._intern_user(user_id))
+            columns["companies"].append(self._intern_company(company_id))
+            columns["objects"].append(hot.object_ids.intern(object_id))
+            columns["reason_companies"].append(NO_COMPANY if reason_company_id is None
+                                               else self._intern_company(reason_company_id))
+            columns["granted"].append(granted)
+            columns["reasons"].append(reason_code)
+            
+            if self.spill_directory is not None and len(hot) > self.max_entries:
+                self._spill_if_full()
+    
+    def records(self, include_spilled: bool = True) -> Iterator[Tuple[str, str, str, str, bool, int, Optional[str]]]:
+        """Yield each entry as the arguments that append() was called with"""
+        for block, length, in_memory in self._blocks(include_spilled):
+            yield from self._read(block, range(length), in_memory, self._record)
+    
+    def select(self, user_id: Optional[str] = None, company_id: Optional[str] = None,
+               start: Optional[str] = None, end: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        Get the entries matching all the given filters, oldest first.
+        start and end are inclusive timestamp or date bounds.
+        """
+        return list(self.iter_select(user_id, company_id, start, end))
+    
+    def iter_select(self, user_id: Optional[str] = None, company_id: Optional[str] = None,
+                    start: Optional[str] = None, end: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+        """Stream the entries matching all the given filters, oldest first"""
+        start_epoch = parse_bound(start) if start is not None else None
+        end_epoch = parse_bound(end) if end is not None else None
+        
+        for block, length, in_memory in self._blocks():
+            if in_memory:
+                # The mask reads the appended arrays through NumPy views, which block appends
+                # until they are released, so it is built and dropped under the lock
+                with self._lock:
+                    positions = self._matching_positions(block, length, user_id, company_id,
+                                                         start, end, start_epoch, end_epoch)
+            else:
+                positions = self._matching_positions(block, length, user_id, company_id,
+                                                     start, end, start_epoch, end_epoch)
+            yield from self._read(block, positions, in_memory, self._entry)
+    
+    @staticmethod
+    def _matching_positions(block: LogBlock, length: int, user_id: Optional[str], company_id: Optional[str],
+                            start: Optional[str], end: Optional[str],
+                            start_epoch: Optional[int], end_epoch: Optional[int]) -> List[int]:
+        """Get the positions among the first length entries of a block that match iter_select's filters"""
+        mask = np.ones(length, dtype=bool)
+        for value, table, column in ((user_id, block.user_ids, "users"),
+                                     (company_id, block.company_ids, "companies")):
+            if value is not None:
+                position = table.index.get(value)
+                if position is None:
+                    mask[:] = False
+                else:
+                    mask &= block.column(column)[:length] == position
+        
+        if start is not None or end is not None:
+            timestamps = block.column("timestamps")[:length]
+            in_range = timestamps != RAW_TIMESTAMP
+            if start_epoch is not None:
+                in_range &= timestamps >= start_epoch
+            if end_epoch is not None:
+                in_range &= timestamps <= end_epoch
+            del timestamps
+            
+            # Unparsed timestamps are compared as strings
+            for i, timestamp in block.raw_timestamps.items():
+                if i < length:
+                    in_range[i] = (start is None or timestamp >= start) and (end is None or timestamp <= end)
+            mask &= in_range
+        
+        return np.flatnonzero(mask).tolist()
+    
+    def __len__(self) -> int:
+        with self._lock:
+            return self._spilled + len(self._hot)
+    
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        
+        with self._lock:
+            length = self._spilled + len(self._hot)
+            if index < 0:
+                index += length
+            if not 0 <= index < length:
+                raise IndexError("access log index out of range")
+            
+            if index >= self._spilled:
+                return self._entry(self._hot, index - self._spilled)
+            
+            segment = bisect.bisect_right(self._segment_starts, index) - 1
+            file_name = self._segments[segment][0]
+            position = index - self._segment_starts[segment]
+        return self._entry(self._load_segment(file_name), position)
+    
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        for block, length, in_memory in self._blocks():
+            yield from self._read(block, range(length), in_memory, self._entry)
+    
+    def _blocks(self, include_spilled: bool = True) -> Iterator[Tuple[LogBlock, int, bool]]:
+        """
+        Yield the spilled segments, oldest first, then the in-memory block
+        Returns: (block, number of entries to read, whether it is the in-memory block) tuples
+        """
+        with self._lock:
+            segments = list(self._segments) if include_spilled else []
+            hot, length = self._hot, len(self._hot)
+        for file_name, count in segments:
+            yield self._load_segment(file_name), count, False
+        
+        # The in-memory block is only appended to, and spilling replaces it with a new
+        # block, so its first length entries stay put while it is read
+        yield hot, length, True
+    
+    def _read(self, block: LogBlock, positions: Sequence[int], in_memory: bool,
+              build: Callable[[LogBlock, int], Any]) -> Iterator[Any]:
+        """Build the entries at positions of a block, holding the lock for batches of in-memory ones"""
+        if not in_memory:
+            for i in positions:
+                yield build(block, i)
+            return
+        
+        for batch_start in range(0, len(positions), HOT_READ_BATCH):
+            with self._lock:
+                batch = [build(block, i) for i in positions[batch_start:batch_start + HOT_READ_BATCH]]
+            yield from batch
+    
+    def _load_segment(self, file_name: str) -> LogBlock:
+        """Read a spilled segment, reusing the last one read or the block it is still being written from"""
+        unwritten = self._unwritten.get(file_name)
+        if unwritten is not None:
+            return unwritten[0]
+        
+        cached_name, block = self._cached_segment
+        if cached_name != file_name:
+            block = LogBlock.load(os.path.join(self.spill_directory, file_name))
+            self._cached_segment = (file_name, block)
+        return block
+    
+    def _add_segment(self, file_name: str, count: int) -> None:
+        """Register a spilled segment holding the next count entries"""
+        self._segments.append((file_name, count))
+        self._segment_starts.append(self._spilled)
+        self._spilled += count
+    
+    def _spill_if_full(self) -> None:
+        """Move all but the newest half of max_entries entries to a segment file written in the background"""
+        if len(self._hot) <= self.max_entries:
+            return
+        
+        while self._writing >= MAX_SEGMENT_WRITES:
+            self._segment_written.wait()
+        if len(self._hot) <= self.max_entries:
+            # Another thread spilled while this one waited
+            return
+        
+        count = len(self._hot) - self.max_entries // 2
+        file_name = f"access-{self._spilled:012d}.npz"
+        
+        # The full block is no longer appended to, so the writer and readers can use it
+        # unlocked; the new one starts with ID tables trimmed to the entries it keeps,
+        # so they don't grow across spills
+        block = self._hot
+        self._hot = block.remainder(count)
+        self._unwritten[file_name] = (block, count)
+        self._add_segment(file_name, count)
+        
+        self._writing += 1
+        # Not a daemon, so the interpreter finishes the write before exiting
+        threading.Thread(target=self._write_segment, args=(block, count, self.spill_directory, file_name),
+                         name=f"access-log-{file_name}").start()
+    
+    def _write_segment(self, block: LogBlock, count: int, directory: str, file_name: str) -> None:
+        """Write the segment file of a spilled block, then stop keeping the block in memory"""
+        written = False
+        try:
+            block.save(os.path.join(directory, file_name), count)
+            written = True
+        finally:
+            with self._lock:
+                if written:
+                    del self._unwritten[file_name]
+                self._writing -= 1
+                self._segment_written.notify_all()
+    
+    def _wait_for_writes(self) -> None:
+        """Wait, holding the lock, until no segment file is being written"""
+        while self._writing:
+            self._segment_written.wait()
+    
+    def _entry(self, block: LogBlock, position: int) -> Dict[str, Any]:
+        """Build the log entry dict of a block position"""
+        columns = block.columns
+        user_index = columns["users"][position]
+        company_index = columns["companies"][position]
+        reason_company = columns["reason_companies"][position]
+        if reason_company == NO_COMPANY:
+            reason_company_id = reason_company_name = None
+        else:
+            reason_company_id = block.company_ids.values[reason_company]
+            reason_company_name = self._name(self.model.companies, block.company_ids,
+                                             block.company_names, reason_company)
+        return {
+            "timestamp": self._timestamp(block, position),
+            "user_id": block.user_ids.values[user_index],
+            "user_name": self._name(self.model.users, block.user_ids, block.user_names, user_index),
+            "company_id": block.company_ids.values[company_index],
+            "company_name": self._name(self.model.companies, block.company_ids, block.company_names, company_index),
+            "object_id": block.object_ids.values[columns["objects"][position]],
+            "access_granted": bool(columns["granted"][position]),
+            "reason": self.model.format_reason(int(columns["reasons"][position]),
+                                               reason_company_id, reason_company_name),
+        }
+    
+    def _record(self, block: LogBlock, position: int) -> Tuple[str, str, str, str, bool, int, Optional[str]]:
+        """Get the append() arguments of a block position"""
+        columns = block.columns
+        companies = block.company_ids.values
+        reason_company = int(columns["reason_companies"][position])
+        return (self._timestamp(block, position), block.user_ids.values[columns["users"][position]],
+                companies[columns["companies"][position]], block.object_ids.values[columns["objects"][position]],
+                bool(columns["granted"][position]), int(columns["reasons"][position]),
+                None if reason_company == NO_COMPANY else companies[reason_company])
+    
+    @staticmethod
+    def _timestamp(block: LogBlock, position: int) -> str:
+        """Get the timestamp string of a block position"""
+        epoch = int(block.columns["timestamps"][position])
+        if epoch == RAW_TIMESTAMP:
+            return block.raw_timestamps[position]
+        return format_timestamp(epoch)
+    
+    @staticmethod
+    def _name(current: Dict[str, Dict[str, str]], table: InternTable, logged_names: List[str], index: int) -> str:
+        """Resolve the current name of an interned ID, or the name it was logged with"""
+        info = current.get(table.values[index])
+        return info["name"] if info is not None else logged_names[index]
+    
+    def _intern_user(self, user_id: str) -> int:
+        """Intern a user ID, remembering the user's current name"""
+        hot = self._hot
+        position = hot.user_ids.intern(user_id)
+        if position == len(hot.user_names):
+            hot.user_names.append(self.model.users.get(user_id, {}).get("name", "Unknown"))
+        return position
+    
+    def _intern_company(self, company_id: str) -> int:
+        """Intern a company ID, remembering the company's current name"""
+        hot = self._hot
+        position = hot.company_ids.intern(company_id)
+        if position == len(hot.company_names):
+            hot.company_names.append(self.model.companies.get(company_id, {}).get("name", "Unknown"))
+        return position
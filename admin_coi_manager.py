@@ -6,16 +6,26 @@ Handles Conflict of Interest class management functionality
 import tkinter as tk
 from tkinter import ttk, messagebox, simpledialog
 from utils import create_tooltip, create_scrollable_frame
+from change_events import (COI_CLASS_ADDED, COI_CLASS_DELETED, COMPANY_ADDED, COMPANY_DELETED, COMPANY_MOVED,
+                           COMPANY_RENAMED, MODEL_CLEARED, OBJECT_CHANGED)
 
 class COIManager(ttk.Frame):
-    def __init__(self, parent, model, data_manager):
+    def __init__(self, parent, model, data_manager, events):
         super().__init__(parent)
         self.parent = parent
         self.model = model
         self.data_manager = data_manager
         
+        # COI class whose companies are shown, if any
+        self.shown_coi_class_id = None
+        
         self.pack(fill=tk.BOTH, expand=True)
         self.create_widgets()
+        
+        # Patch the lists as the model changes, whoever changed it
+        events.subscribe_widget(self, self.on_model_changed,
+                                {COI_CLASS_ADDED, COI_CLASS_DELETED, COMPANY_ADDED, COMPANY_DELETED, COMPANY_MOVED,
+                                 COMPANY_RENAMED, MODEL_CLEARED, OBJECT_CHANGED})
     
     def create_widgets(self):
         """Create the widgets for COI class management"""
@@ -165,13 +175,50 @@ class COIManager(ttk.Frame):
         for item in self.coi_tree.get_children():
             self.coi_tree.delete(item)
         
-        # Add all COI classes to the list
+        # Add all COI classes to the list, keyed by COI class ID
         for coi_class_id, companies in self.model.coi_classes.items():
             # Count companies in this COI class
             company_count = len(companies)
             company_text = f"{company_count} companies"
             
-            self.coi_tree.insert('', tk.END, values=(coi_class_id, company_text))
+            self.coi_tree.insert('', tk.END, iid=coi_class_id, values=(coi_class_id, company_text))
+    
+    def on_model_changed(self, events):
+        """Update only the rows of the COI classes and companies that changed"""
+        if any(event.kind == MODEL_CLEARED for event in events):
+            self.refresh_coi_list()
+            self.cancel_edit()
+            return
+        
+        # Classes whose company counts or listed companies changed
+        changed_classes = set()
+        for event in events:
+            if event.kind == OBJECT_CHANGED:
+                company_info = self.model.companies.get(event.company_id)
+                if company_info is not None:
+                    changed_classes.add(company_info['coi_class'])
+            else:
+                changed_classes.update((event.coi_class_id, event.old_coi_class_id))
+        changed_classes.discard(None)
+        
+        for coi_class_id in changed_classes:
+            self.update_coi_row(coi_class_id)
+        if self.shown_coi_class_id in changed_classes:
+            if self.shown_coi_class_id in self.model.coi_classes:
+                self.show_companies(self.shown_coi_class_id)
+            else:
+                self.cancel_edit()
+    
+    def update_coi_row(self, coi_class_id):
+        """Add, update or remove the list row of a COI class"""
+        companies = self.model.coi_classes.get(coi_class_id)
+        if companies is None:
+            if self.coi_tree.exists(coi_class_id):
+                self.coi_tree.delete(coi_class_id)
+        elif self.coi_tree.exists(coi_class_id):
+            self.coi_tree.item(coi_class_id, values=(coi_class_id, f"{len(companies)} companies"))
+        else:
+            self.coi_tree.insert('', tk.END, iid=coi_class_id, values=(coi_class_id, f"{len(companies)} companies"))
     
     def on_coi_select(self, event):
         """Handle COI class selection in the treeview"""
@@ -223,6 +270,8 @@ class COIManager(ttk.Frame):
             
             self.companies_tree.insert('', tk.END, values=(company_id, company_name, f"{object_count} objects"))
         
+        self.shown_coi_class_id = coi_class_id
+        
         # Show the companies frame and content
         self.companies_content.pack(fill=tk.BOTH, expand=True)
         self.companies_frame.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
@@ -244,6 +293,7 @@ class COIManager(ttk.Frame):
         
         # Hide the companies frame
         self.companies_frame.pack_forget()
+        self.shown_coi_class_id = None
     
     def save_coi_class(self):
         """Save the COI class details"""
@@ -267,9 +317,6 @@ class COIManager(ttk.Frame):
             else:
                 messagebox.showerror("Error", f"Failed to add COI Class '{coi_class_id}'")
         
-        # Refresh the COI class list
-        self.refresh_coi_list()
-        
         # Reset the form
         self.cancel_edit()
     
@@ -295,13 +342,10 @@ class COIManager(ttk.Frame):
             return
         
         # Delete the COI class
-        del self.model.coi_classes[coi_class_id]
+        self.model.delete_coi_class(coi_class_id)
         
         messagebox.showinfo("Success", f"COI Class '{coi_class_id}' deleted successfully")
         
-        # Refresh the COI class list
-        self.refresh_coi_list()
-        
         # Reset the form
         self.cancel_edit()
     
@@ -312,6 +356,7 @@ class COIManager(ttk.Frame):
         
         # Hide the companies frame
         self.companies_frame.pack_forget()
+        self.shown_coi_class_id = None
         
         # Show the select label
         self.select_label.pack(padx=20, pady=20)
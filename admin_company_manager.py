@@ -5,17 +5,28 @@ Handles company management functionality
 
 import tkinter as tk
 from tkinter import ttk, messagebox, simpledialog
-from utils import create_tooltip, create_scrollable_frame
+from utils import create_tooltip, create_scrollable_frame, VirtualList
+from chinese_wall_model import REMEDIATION_REVOKE_MOVED
+from change_events import (COI_CLASS_ADDED, COI_CLASS_DELETED, COMPANY_ADDED, COMPANY_DELETED, COMPANY_MOVED,
+                           COMPANY_RENAMED, MODEL_CLEARED, OBJECT_CHANGED)
 
 class CompanyManager(ttk.Frame):
-    def __init__(self, parent, model, data_manager):
+    def __init__(self, parent, model, data_manager, events):
         super().__init__(parent)
         self.parent = parent
         self.model = model
         self.data_manager = data_manager
         
+        # Company whose data objects are shown, if any
+        self.shown_company_id = None
+        
         self.pack(fill=tk.BOTH, expand=True)
         self.create_widgets()
+        
+        # Patch the lists as the model changes, whoever changed it
+        events.subscribe_widget(self, self.on_model_changed,
+                                {COI_CLASS_ADDED, COI_CLASS_DELETED, COMPANY_ADDED, COMPANY_DELETED, COMPANY_MOVED,
+                                 COMPANY_RENAMED, MODEL_CLEARED, OBJECT_CHANGED})
     
     def create_widgets(self):
         """Create the widgets for company management"""
@@ -157,48 +168,51 @@ class CompanyManager(ttk.Frame):
         obj_list_frame = ttk.Frame(self.objects_content)
         obj_list_frame.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
         
-        # Create a treeview for the objects list
-        columns = ('id', 'data')
-        self.objects_tree = ttk.Treeview(obj_list_frame, columns=columns, show='headings')
-        
-        # Define column headings
-        self.objects_tree.heading('id', text='Object ID')
-        self.objects_tree.heading('data', text='Data')
+        # Column headings
+        headings_frame = ttk.Frame(obj_list_frame)
+        headings_frame.pack(fill=tk.X)
+        ttk.Label(headings_frame, text="Object ID", width=20, font=('Arial', 10, 'bold')).pack(side=tk.LEFT, padx=5)
+        ttk.Label(headings_frame, text="Data", font=('Arial', 10, 'bold')).pack(side=tk.LEFT, padx=5)
         
-        # Define column widths
-        self.objects_tree.column('id', width=100)
-        self.objects_tree.column('data', width=300)
+        # Highlight for the selected object
+        style = ttk.Style()
+        style.configure('Selected.TFrame', background="#cce4f7")
+        style.configure('Selected.TLabel', background="#cce4f7")
         
-        # Add a scrollbar
-        obj_scrollbar = ttk.Scrollbar(obj_list_frame, orient=tk.VERTICAL, command=self.objects_tree.yview)
-        self.objects_tree.configure(yscroll=obj_scrollbar.set)
-        
-        # Pack the treeview and scrollbar
-        self.objects_tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
-        obj_scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
-        
-        # Bind selection event for objects
-        self.objects_tree.bind('<<TreeviewSelect>>', self.on_object_select)
+        # Create a virtual list for the objects, which only has widgets for the rows in view
+        self.objects_list = VirtualList(obj_list_frame, self.create_object_row, self.fill_object_row,
+                                        row_height=24, on_select=self.on_object_select,
+                                        on_context_menu=self.show_object_menu)
+        self.objects_list.pack(fill=tk.BOTH, expand=True)
         
         # Add context menu for objects
         self.create_object_context_menu()
     
+    def create_object_row(self, parent):
+        """Create a reusable row of the objects list"""
+        row = ttk.Frame(parent)
+        row.id_label = ttk.Label(row, width=20)
+        row.id_label.pack(side=tk.LEFT, padx=5)
+        row.data_label = ttk.Label(row)
+        row.data_label.pack(side=tk.LEFT, padx=5, fill=tk.X, expand=True)
+        return row
+    
+    def fill_object_row(self, row, item, selected):
+        """Show an (object_id, object_data) item in a row"""
+        object_id, object_data = item
+        row.config(style='Selected.TFrame' if selected else 'TFrame')
+        row.id_label.config(text=object_id, style='Selected.TLabel' if selected else 'TLabel')
+        row.data_label.config(text=object_data, style='Selected.TLabel' if selected else 'TLabel')
+    
     def create_object_context_menu(self):
-        """Create a context menu for the objects treeview"""
+        """Create a context menu for the objects list"""
         self.object_menu = tk.Menu(self, tearoff=0)
         self.object_menu.add_command(label="Edit", command=self.edit_data_object)
         self.object_menu.add_command(label="Delete", command=self.delete_data_object)
-        
-        # Bind right-click to show the menu
-        self.objects_tree.bind("<Button-3>", self.show_object_menu)
     
-    def show_object_menu(self, event):
-        """Show the context menu for objects"""
-        # Select the item under the cursor
-        item = self.objects_tree.identify_row(event.y)
-        if item:
-            self.objects_tree.selection_set(item)
-            self.object_menu.post(event.x_root, event.y_root)
+    def show_object_menu(self, item, event):
+        """Show the context menu for the object right-clicked, which the list has selected"""
+        self.object_menu.post(event.x_root, event.y_root)
     
     def refresh_company_list(self):
         """Refresh the company list"""
@@ -206,14 +220,52 @@ class CompanyManager(ttk.Frame):
         for item in self.company_tree.get_children():
             self.company_tree.delete(item)
         
-        # Add all companies to the list
+        # Add all companies to the list, keyed by company ID
         for company_id, company_info in self.model.companies.items():
-            self.company_tree.insert('', tk.END, values=(
+            self.company_tree.insert('', tk.END, iid=company_id, values=(
                 company_id, 
                 company_info['name'], 
                 company_info['coi_class']
             ))
     
+    def on_model_changed(self, events):
+        """Update only the rows of the companies and objects that changed"""
+        if any(event.kind == MODEL_CLEARED for event in events):
+            self.refresh_company_list()
+            self.coi_combobox.config(values=list(self.model.coi_classes.keys()))
+            self.cancel_edit()
+            return
+        
+        objects_changed = False
+        for event in events:
+            if event.kind in (COI_CLASS_ADDED, COI_CLASS_DELETED):
+                self.coi_combobox.config(values=list(self.model.coi_classes.keys()))
+            elif event.kind == OBJECT_CHANGED:
+                if event.company_id == self.shown_company_id:
+                    objects_changed = True
+            elif event.kind == COMPANY_DELETED:
+                if self.company_tree.exists(event.company_id):
+                    self.company_tree.delete(event.company_id)
+                if event.company_id == self.shown_company_id:
+                    self.cancel_edit()
+            else:
+                self.update_company_row(event.company_id)
+        
+        # Relisting the shown objects reuses the list's row widgets
+        if objects_changed and self.shown_company_id is not None:
+            self.show_data_objects(self.shown_company_id)
+    
+    def update_company_row(self, company_id):
+        """Add or update the list row of a company"""
+        company_info = self.model.companies.get(company_id)
+        if company_info is None:
+            return
+        values = (company_id, company_info['name'], company_info['coi_class'])
+        if self.company_tree.exists(company_id):
+            self.company_tree.item(company_id, values=values)
+        else:
+            self.company_tree.insert('', tk.END, iid=company_id, values=values)
+    
     def on_company_select(self, event):
         """Handle company selection in the treeview"""
         # Get the selected item
@@ -249,23 +301,21 @@ class CompanyManager(ttk.Frame):
     
     def show_data_objects(self, company_id):
         """Show the company's data objects"""
-        # Clear the current objects list
-        for item in self.objects_tree.get_children():
-            self.objects_tree.delete(item)
-        
         # Get the company's objects
         company_objects = self.model.get_company_objects(company_id)
         
-        # Add all objects to the list
-        for object_id, object_data in company_objects.items():
-            self.objects_tree.insert('', tk.END, values=(object_id, object_data))
+        # List them, starting at the top for another company
+        if company_id != self.shown_company_id:
+            self.objects_list.yview(tk.MOVETO, 0)
+        self.objects_list.set_items(company_objects.items())
+        self.shown_company_id = company_id
         
         # Show the objects frame and content
         self.objects_content.pack(fill=tk.BOTH, expand=True)
         self.objects_frame.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
     
-    def on_object_select(self, event):
-        """Handle object selection in the treeview"""
+    def on_object_select(self, item):
+        """Handle object selection in the list"""
         # This is used for the context menu
         pass
     
@@ -290,6 +340,7 @@ class CompanyManager(ttk.Frame):
         
         # Hide the objects frame
         self.objects_frame.pack_forget()
+        self.shown_company_id = None
     
     def save_company(self):
         """Save the company details"""
@@ -305,25 +356,13 @@ class CompanyManager(ttk.Frame):
         
         # Check if this is a new company or an update
         if company_id in self.model.companies:
-            # Update existing company
-            old_coi = self.model.companies[company_id]['coi_class']
-            
-            # If COI class changed, we need to move the company
-            if old_coi != company_coi:
-                # Remove from old COI class
-                if company_id in self.model.coi_classes[old_coi]:
-                    company_objects = self.model.coi_classes[old_coi][company_id]
-                    del self.model.coi_classes[old_coi][company_id]
-                    
-                    # Add to new COI class
-                    if company_id not in self.model.coi_classes[company_coi]:
-                        self.model.coi_classes[company_coi][company_id] = company_objects
-            
-            # Update company info
-            self.model.companies[company_id]['name'] = company_name
-            self.model.companies[company_id]['coi_class'] = company_coi
+            # Update existing company (moves it if the COI class changed)
+            moved = self.model.companies[company_id]["coi_class"] != company_coi
+            self.model.update_company(company_id, company_name, company_coi)
             
             messagebox.showinfo("Success", f"Company '{company_name}' updated successfully")
+            if moved:
+                self.revalidate_moved_company(company_id, company_name)
         else:
             # Add new company
             success = self.data_manager.add_new_company(company_id, company_name, company_coi)
@@ -332,12 +371,29 @@ class CompanyManager(ttk.Frame):
             else:
                 messagebox.showerror("Error", f"Failed to add company '{company_name}'")
         
-        # Refresh the company list
-        self.refresh_company_list()
-        
         # Reset the form
         self.cancel_edit()
     
+    def revalidate_moved_company(self, company_id, company_name):
+        """Report users left holding two companies of the moved company's COI class and offer to fix them"""
+        violations = self.model.revalidate_company(company_id)
+        if not violations:
+            return
+        
+        # List a few violations; the rest are only counted
+        lines = [f"{violation['user_id']}: also holds {', '.join(violation['conflicting_companies'])}"
+                 for violation in violations[:10]]
+        if len(violations) > len(lines):
+            lines.append(f"... and {len(violations) - len(lines)} more")
+        
+        if messagebox.askyesno("Wall Violations",
+                               f"{len(violations)} user(s) who accessed '{company_name}' now hold another "
+                               f"company of its COI class:\n\n" + "\n".join(lines) +
+                               f"\n\nRemove '{company_name}' from their access histories?"):
+            self.model.revalidate_company(company_id, REMEDIATION_REVOKE_MOVED)
+            messagebox.showinfo("Revalidation Complete",
+                                f"'{company_name}' was removed from {len(violations)} access history(ies)")
+    
     def delete_company(self):
         """Delete the selected company"""
         company_id = self.company_id_var.get()
@@ -347,31 +403,18 @@ class CompanyManager(ttk.Frame):
             messagebox.showerror("Error", "No valid company selected")
             return
         
-        # Confirm deletion
+        # Confirm deletion, naming how many user histories it is removed from
+        affected_users = len(self.model.get_company_users(company_id))
         if not messagebox.askyesno("Confirm Delete", 
-                                  f"Are you sure you want to delete company '{company_name}'?"):
+                                  f"Are you sure you want to delete company '{company_name}'?\n"
+                                  f"It will be removed from the access history of {affected_users} user(s)."):
             return
         
-        # Get the COI class
-        coi_class = self.model.companies[company_id]['coi_class']
-        
-        # Delete the company from the COI class
-        if company_id in self.model.coi_classes[coi_class]:
-            del self.model.coi_classes[coi_class][company_id]
-        
-        # Delete the company from the companies dict
-        del self.model.companies[company_id]
-        
-        # Delete the company from all user access histories
-        for user_id in self.model.user_access_history:
-            if company_id in self.model.user_access_history[user_id]:
-                del self.model.user_access_history[user_id][company_id]
+        # Delete the company, its objects and all references in user access histories
+        self.model.delete_company(company_id)
         
         messagebox.showinfo("Success", f"Company '{company_name}' deleted successfully")
         
-        # Refresh the company list
-        self.refresh_company_list()
-        
         # Reset the form
         self.cancel_edit()
     
@@ -382,6 +425,7 @@ class CompanyManager(ttk.Frame):
         
         # Hide the objects frame
         self.objects_frame.pack_forget()
+        self.shown_company_id = None
         
         # Show the select label
         self.select_label.pack(padx=20, pady=20)
@@ -412,8 +456,6 @@ class CompanyManager(ttk.Frame):
         
         if success:
             messagebox.showinfo("Success", f"Data object '{object_id}' added successfully")
-            # Refresh the objects list
-            self.show_data_objects(company_id)
         else:
             messagebox.showerror("Error", f"Failed to add data object '{object_id}'")
     
@@ -426,14 +468,13 @@ class CompanyManager(ttk.Frame):
             return
         
         # Get the selected object
-        selected_items = self.objects_tree.selection()
-        if not selected_items:
+        selected_item = self.objects_list.selection()
+        if selected_item is None:
             messagebox.showerror("Error", "No data object selected")
             return
         
         # Get the object ID from the selected item
-        item = selected_items[0]
-        object_id = self.objects_tree.item(item, 'values')[0]
+        object_id = selected_item[0]
         
         # Get the current data
         company_objects = self.model.get_company_objects(company_id)
@@ -451,13 +492,9 @@ class CompanyManager(ttk.Frame):
             return
         
         # Update the object
-        coi_class = self.model.companies[company_id]['coi_class']
-        self.model.coi_classes[coi_class][company_id][object_id] = new_data
+        self.model.update_object(company_id, object_id, new_data)
         
         messagebox.showinfo("Success", f"Data object '{object_id}' updated successfully")
-        
-        # Refresh the objects list
-        self.show_data_objects(company_id)
     
     def delete_data_object(self):
         """Delete the selected data object"""
@@ -468,14 +505,13 @@ class CompanyManager(ttk.Frame):
             return
         
         # Get the selected object
-        selected_items = self.objects_tree.selection()
-        if not selected_items:
+        selected_item = self.objects_list.selection()
+        if selected_item is None:
             messagebox.showerror("Error", "No data object selected")
             return
         
         # Get the object ID from the selected item
-        item = selected_items[0]
-        object_id = self.objects_tree.item(item, 'values')[0]
+        object_id = selected_item[0]
         
         # Confirm deletion
         if not messagebox.askyesno("Confirm Delete", 
@@ -483,13 +519,7 @@ class CompanyManager(ttk.Frame):
             return
         
         # Delete the object
-        coi_class = self.model.companies[company_id]['coi_class']
-        if object_id in self.model.coi_classes[coi_class][company_id]:
-            del self.model.coi_classes[coi_class][company_id][object_id]
-            
+        if self.model.delete_object(company_id, object_id):
             messagebox.showinfo("Success", f"Data object '{object_id}' deleted successfully")
-            
-            # Refresh the objects list
-            self.show_data_objects(company_id)
         else:
             messagebox.showerror("Error", f"Data object '{object_id}' not found")
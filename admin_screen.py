@@ -11,15 +11,18 @@ from utils import create_tooltip
 from admin_user_manager import UserManager
 from admin_company_manager import CompanyManager
 from admin_coi_manager import COIManager
+from change_events import ACCESS_RECORDED, CATALOG_EVENTS, LOGS_CLEARED, USER_CHANGED
 
 class AdminScreen(ttk.Frame):
-    def __init__(self, parent, model, data_manager, current_user, back_callback):
+    def __init__(self, parent, model, data_manager, current_user, back_callback, events, executor):
         super().__init__(parent)
         self.parent = parent
         self.model = model
         self.data_manager = data_manager
         self.current_user = current_user
         self.back_callback = back_callback
+        self.events = events
+        self.executor = executor
         
         # Check if user has admin privileges
         user_info = self.model.users.get(self.current_user, {})
@@ -53,17 +56,17 @@ class AdminScreen(ttk.Frame):
         # User Management tab
         user_tab = ttk.Frame(notebook)
         notebook.add(user_tab, text="User Management")
-        self.user_manager = UserManager(user_tab, self.model, self.data_manager)
+        self.user_manager = UserManager(user_tab, self.model, self.data_manager, self.events)
         
         # Company Management tab
         company_tab = ttk.Frame(notebook)
         notebook.add(company_tab, text="Company Management")
-        self.company_manager = CompanyManager(company_tab, self.model, self.data_manager)
+        self.company_manager = CompanyManager(company_tab, self.model, self.data_manager, self.events)
         
         # COI Class Management tab
         coi_tab = ttk.Frame(notebook)
         notebook.add(coi_tab, text="COI Class Management")
-        self.coi_manager = COIManager(coi_tab, self.model, self.data_manager)
+        self.coi_manager = COIManager(coi_tab, self.model, self.data_manager, self.events)
         
         # System Information tab
         system_tab = ttk.Frame(notebook)
@@ -80,17 +83,28 @@ class AdminScreen(ttk.Frame):
         stats_frame = ttk.LabelFrame(info_frame, text="System Statistics")
         stats_frame.pack(fill=tk.X, padx=10, pady=10)
         
-        # Count entities
-        num_users = len(self.model.users)
-        num_companies = len(self.model.companies)
-        num_coi_classes = len(self.model.coi_classes)
-        num_access_logs = len(self.model.access_logs)
-        
         # Display statistics
-        ttk.Label(stats_frame, text=f"Total Users: {num_users}").pack(anchor=tk.W, padx=10, pady=5)
-        ttk.Label(stats_frame, text=f"Total Companies: {num_companies}").pack(anchor=tk.W, padx=10, pady=5)
-        ttk.Label(stats_frame, text=f"Total COI Classes: {num_coi_classes}").pack(anchor=tk.W, padx=10, pady=5)
-        ttk.Label(stats_frame, text=f"Total Access Logs: {num_access_logs}").pack(anchor=tk.W, padx=10, pady=5)
+        # Format: {label: StringVar}
+        self.stats_vars = {label: tk.StringVar() for label in
+                           ("Total Users", "Total Companies", "Total COI Classes", "Total Access Logs")}
+        for stats_var in self.stats_vars.values():
+            ttk.Label(stats_frame, textvariable=stats_var).pack(anchor=tk.W, padx=10, pady=5)
+        self.update_system_stats()
+        
+        # Decision cache counters
+        cache_frame = ttk.LabelFrame(info_frame, text="Decision Cache")
+        cache_frame.pack(fill=tk.X, padx=10, pady=10)
+        
+        self.cache_stats_var = tk.StringVar()
+        ttk.Label(cache_frame, textvariable=self.cache_stats_var).pack(side=tk.LEFT, anchor=tk.W, padx=10, pady=5)
+        refresh_button = ttk.Button(cache_frame, text="Refresh", command=self.update_cache_stats)
+        refresh_button.pack(side=tk.RIGHT, padx=10, pady=5)
+        create_tooltip(refresh_button, "Update the decision cache counters")
+        self.update_cache_stats()
+        
+        # Keep the counters current as the model changes
+        self.events.subscribe_widget(self, self.on_model_changed,
+                                     CATALOG_EVENTS | {ACCESS_RECORDED, LOGS_CLEARED, USER_CHANGED})
         
         # System actions
         actions_frame = ttk.LabelFrame(info_frame, text="System Actions")
@@ -114,19 +128,40 @@ class AdminScreen(ttk.Frame):
         reinit_button.pack(padx=10, pady=10, fill=tk.X)
         create_tooltip(reinit_button, "Reset the system to its initial state with sample data")
     
+    def update_system_stats(self):
+        """Show the current entity counts"""
+        counts = (len(self.model.users), len(self.model.companies),
+                  len(self.model.coi_classes), len(self.model.access_logs))
+        for (label, stats_var), count in zip(self.stats_vars.items(), counts):
+            stats_var.set(f"{label}: {count}")
+    
+    def on_model_changed(self, events):
+        """Update the counters after a burst of changes"""
+        self.update_system_stats()
+        self.update_cache_stats()
+    
+    def update_cache_stats(self):
+        """Show the current decision cache counters"""
+        stats = self.model.decision_cache_stats()
+        lookups = stats["hits"] + stats["misses"]
+        hit_rate = stats["hits"] / lookups * 100 if lookups else 0.0
+        self.cache_stats_var.set(f"Hits: {stats['hits']}   Misses: {stats['misses']}   "
+                                 f"Hit Rate: {hit_rate:.1f}%   Entries: {stats['entries']} / {stats['capacity']}")
+    
     def reset_all_histories(self):
         """Reset access history for all users"""
         if messagebox.askyesno("Confirm Reset", 
                               "Are you sure you want to reset ALL user access histories?"):
-            for user_id in self.model.user_access_history:
-                self.model.reset_user_history(user_id)
+            with self.model.batch() as batch:
+                for user_id in self.model.user_access_history:
+                    batch.reset_user_history(user_id)
             messagebox.showinfo("Reset Complete", "All user access histories have been reset.")
     
     def clear_access_logs(self):
         """Clear all access logs"""
         if messagebox.askyesno("Confirm Clear", 
                               "Are you sure you want to clear ALL access logs?"):
-            self.model.access_logs = []
+            self.model.clear_access_logs()
             messagebox.showinfo("Clear Complete", "All access logs have been cleared.")
     
     def reinitialize_data(self):
@@ -134,15 +169,19 @@ class AdminScreen(ttk.Frame):
         if messagebox.askyesno("Confirm Reinitialization", 
                               "Are you sure you want to reinitialize all sample data? " +
                               "This will reset the entire system."):
-            # Reset the model
-            self.model.coi_classes = {}
-            self.model.user_access_history = {}
-            self.model.access_logs = []
-            self.model.companies = {}
-            self.model.users = {}
-            
-            # Reinitialize sample data
-            self.data_manager.initialize_sample_data()
+            def reinitialize(task):
+                # Reset the model
+                task.report_progress(None, "Clearing all data...")
+                self.model.clear()
+                
+                # Reinitialize sample data
+                task.report_progress(None, "Loading sample data...")
+                self.data_manager.initialize_sample_data()
             
-            messagebox.showinfo("Reinitialization Complete", 
-                               "The system has been reinitialized with sample data.")
+            # Run on a worker thread; the screens follow the change events as data is replaced.
+            # It cannot be cancelled, as stopping between the two steps would leave no data.
+            self.executor.run_with_progress(
+                self, "Reinitializing Data", reinitialize, cancellable=False,
+                on_done=lambda result: messagebox.showinfo("Reinitialization Complete", 
+                                                           "The system has been reinitialized with sample data."),
+                on_error=lambda error: messagebox.showerror("Reinitialization Failed", str(error)))
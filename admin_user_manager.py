@@ -6,16 +6,26 @@ Handles user management functionality
 import tkinter as tk
 from tkinter import ttk, messagebox
 from utils import create_tooltip, create_scrollable_frame
+from change_events import (ACCESS_RECORDED, COMPANY_DELETED, COMPANY_MOVED, COMPANY_RENAMED, HISTORY_RESET,
+                           MODEL_CLEARED, USER_CHANGED)
 
 class UserManager(ttk.Frame):
-    def __init__(self, parent, model, data_manager):
+    def __init__(self, parent, model, data_manager, events):
         super().__init__(parent)
         self.parent = parent
         self.model = model
         self.data_manager = data_manager
         
+        # User whose access history is shown, if any
+        self.shown_user_id = None
+        
         self.pack(fill=tk.BOTH, expand=True)
         self.create_widgets()
+        
+        # Patch the list and the shown history as the model changes, whoever changed it
+        events.subscribe_widget(self, self.on_model_changed,
+                                {ACCESS_RECORDED, COMPANY_DELETED, COMPANY_MOVED, COMPANY_RENAMED, HISTORY_RESET,
+                                 MODEL_CLEARED, USER_CHANGED})
     
     def create_widgets(self):
         """Create the widgets for user management"""
@@ -155,9 +165,40 @@ class UserManager(ttk.Frame):
         for item in self.user_tree.get_children():
             self.user_tree.delete(item)
         
-        # Add all users to the list
+        # Add all users to the list, keyed by user ID
         for user_id, user_info in self.model.users.items():
-            self.user_tree.insert('', tk.END, values=(user_id, user_info['name'], user_info['role']))
+            self.user_tree.insert('', tk.END, iid=user_id, values=(user_id, user_info['name'], user_info['role']))
+    
+    def on_model_changed(self, events):
+        """Update only the changed user rows, and the shown history if it changed"""
+        if any(event.kind == MODEL_CLEARED for event in events):
+            self.refresh_user_list()
+            self.cancel_edit()
+            return
+        
+        history_changed = False
+        for event in events:
+            if event.kind == USER_CHANGED:
+                self.update_user_row(event.user_id)
+                if event.user_id == self.shown_user_id and event.user_id not in self.model.users:
+                    self.cancel_edit()
+            elif event.user_id is None or event.user_id == self.shown_user_id:
+                # Company changes alter the names and classes listed in any history
+                history_changed = True
+        
+        if history_changed and self.shown_user_id is not None:
+            self.show_access_history(self.shown_user_id)
+    
+    def update_user_row(self, user_id):
+        """Add, update or remove the list row of a user"""
+        user_info = self.model.users.get(user_id)
+        if user_info is None:
+            if self.user_tree.exists(user_id):
+                self.user_tree.delete(user_id)
+        elif self.user_tree.exists(user_id):
+            self.user_tree.item(user_id, values=(user_id, user_info['name'], user_info['role']))
+        else:
+            self.user_tree.insert('', tk.END, iid=user_id, values=(user_id, user_info['name'], user_info['role']))
     
     def on_user_select(self, event):
         """Handle user selection in the treeview"""
@@ -221,6 +262,8 @@ class UserManager(ttk.Frame):
             ttk.Label(self.history_content, 
                      text="No access history for this user").pack(padx=20, pady=20)
         
+        self.shown_user_id = user_id
+        
         # Show the history frame and content
         self.history_content.pack(fill=tk.BOTH, expand=True)
         self.history_frame.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
@@ -243,6 +286,7 @@ class UserManager(ttk.Frame):
         
         # Hide the history frame
         self.history_frame.pack_forget()
+        self.shown_user_id = None
     
     def save_user(self):
         """Save the user details"""
@@ -259,8 +303,7 @@ class UserManager(ttk.Frame):
         # Check if this is a new user or an update
         if user_id in self.model.users:
             # Update existing user
-            self.model.users[user_id]['name'] = user_name
-            self.model.users[user_id]['role'] = user_role
+            self.model.update_user(user_id, user_name, user_role)
             messagebox.showinfo("Success", f"User '{user_name}' updated successfully")
         else:
             # Add new user
@@ -270,9 +313,6 @@ class UserManager(ttk.Frame):
             else:
                 messagebox.showerror("Error", f"Failed to add user '{user_name}'")
         
-        # Refresh the user list
-        self.refresh_user_list()
-        
         # Reset the form
         self.cancel_edit()
     
@@ -291,15 +331,10 @@ class UserManager(ttk.Frame):
             return
         
         # Delete the user
-        del self.model.users[user_id]
-        if user_id in self.model.user_access_history:
-            del self.model.user_access_history[user_id]
+        self.model.delete_user(user_id)
         
         messagebox.showinfo("Success", f"User '{user_name}' deleted successfully")
         
-        # Refresh the user list
-        self.refresh_user_list()
-        
         # Reset the form
         self.cancel_edit()
     
@@ -310,6 +345,7 @@ class UserManager(ttk.Frame):
         
         # Hide the history frame
         self.history_frame.pack_forget()
+        self.shown_user_id = None
         
         # Show the select label
         self.select_label.pack(padx=20, pady=20)
@@ -335,6 +371,3 @@ class UserManager(ttk.Frame):
         self.model.reset_user_history(user_id)
         
         messagebox.showinfo("Success", f"Access history for '{user_name}' has been reset")
-        
-        # Update the history display
-        self.show_access_history(user_id)
@@ -0,0 +1,706 @@
+"""
+Benchmarks for the Chinese Wall Model
+Run with: python benchmark.py [benchmark ...]
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, Iterable
+
+from chinese_wall_model import ChineseWallModel, GRANTED_REASONS
+from bitset_model import BitsetChineseWallModel
+from sqlite_model import SQLiteChineseWallModel
+from sharded_model import ShardedChineseWallModel
+
+ENGINES = {
+    "dict": ChineseWallModel,
+    "bitset": BitsetChineseWallModel,
+}
+
+def time_per_call(func: Callable[[], Any], repeats: int = 10000) -> float:
+    """Return the average time of a call to func in microseconds"""
+    start = time.perf_counter()
+    for _ in range(repeats):
+        func()
+    return (time.perf_counter() - start) / repeats * 1e6
+
+def bench_can_access(sizes: Iterable[int] = (10, 100, 1000, 10000, 100000)) -> None:
+    """
+    Measure decision latency as the number of accessed companies grows.
+    The granted and denied columns time the uncached COI-index decision; the
+    hit and miss columns time can_access through the decision cache.
+    """
+    print("decision latency by number of accessed companies")
+    print(f"{'accessed':>10} {'granted (us)':>14} {'denied (us)':>14} {'cache hit (us)':>15} {'cache miss (us)':>16}")
+    
+    for size in sizes:
+        model = ChineseWallModel()
+        model.add_user("user", "Benchmark User")
+        
+        # One COI class per accessed company so every access is granted
+        for i in range(size):
+            model.add_coi_class(f"coi{i}", f"COI {i}")
+            model.add_company(f"company{i}", f"Company {i}", f"coi{i}")
+            model.access_object("user", f"company{i}", "object", "2025-01-01 00:00:00")
+        
+        # A rival pair to measure a denied decision
+        model.add_coi_class("rivals", "Rivals")
+        model.add_company("rival1", "Rival 1", "rivals")
+        model.add_company("rival2", "Rival 2", "rivals")
+        model.access_object("user", "rival1", "object", "2025-01-01 00:00:00")
+        
+        granted = time_per_call(lambda: model._decide("user", "company0"))
+        denied = time_per_call(lambda: model._decide("user", "rival2"))
+        
+        # Repeating a pair hits the cache; invalidating the user's entries first makes every call a miss
+        hit = time_per_call(lambda: model.can_access("user", "rival2"))
+        def missed_decision():
+            model._history_changed("user")
+            model.can_access("user", "rival2")
+        miss = time_per_call(missed_decision)
+        print(f"{size:>10} {granted:>14.3f} {denied:>14.3f} {hit:>15.3f} {miss:>16.3f}")
+
+def build_catalog(model: ChineseWallModel, num_companies: int, companies_per_class: int) -> None:
+    """Populate a model with num_companies companies grouped into COI classes"""
+    for i in range(num_companies):
+        coi_class_id = f"coi{i // companies_per_class}"
+        if i % companies_per_class == 0:
+            model.add_coi_class(coi_class_id, coi_class_id)
+        model.add_company(f"company{i}", f"Company {i}", coi_class_id)
+
+def bench_accessible_companies(num_companies: int = 10000, sizes: Iterable[int] = (10, 100, 1000)) -> None:
+    """Measure membership, length and listing of a user's accessible companies as their history grows"""
+    print(f"accessible companies of one user among {num_companies} companies")
+    print(f"{'accessed':>10} {'contains (us)':>14} {'len (us)':>10} {'list (ms)':>10}")
+    
+    for size in sizes:
+        model = ChineseWallModel()
+        build_catalog(model, num_companies, num_companies // max(sizes))
+        model.add_user("user", "Benchmark User")
+        for i in range(size):
+            model.access_object("user", f"company{i * (num_companies // max(sizes))}", "object",
+                                "2025-01-01 00:00:00")
+        
+        accessible = model.get_user_accessible_companies("user")
+        contains = time_per_call(lambda: f"company{num_companies - 1}" in accessible)
+        length = time_per_call(lambda: len(accessible), 1000)
+        listing = time_per_call(lambda: list(accessible), 20) / 1e3
+        print(f"{size:>10} {contains:>14.3f} {length:>10.3f} {listing:>10.3f}")
+
+def bench_company_access(sizes: Iterable[int] = (1000, 5000, 20000), companies_per_class: int = 10) -> None:
+    """Compare the dashboard's per-class filtering and per-card can_access with one get_company_access_by_class"""
+    print(f"deciding every company for one user, {companies_per_class} companies per COI class")
+    print(f"{'companies':>10} {'per card (ms)':>14} {'one call (ms)':>14}")
+    
+    for size in sizes:
+        model = ChineseWallModel()
+        build_catalog(model, size, companies_per_class)
+        model.add_user("user", "Benchmark User")
+        for i in range(0, size, companies_per_class * 10):
+            model.access_object("user", f"company{i}", "object", "2025-01-01 00:00:00")
+        
+        # The dashboard's former loop, without the cache it warms on repeats
+        def per_card():
+            model._catalog_version += 1
+            for coi_class_id in model.coi_classes:
+                for company_id, company_info in model.companies.items():
+                    if company_info["coi_class"] == coi_class_id:
+                        model.can_access("user", company_id)
+        
+        per_card_time = time_per_call(per_card, 1) / 1e3
+        one_call_time = time_per_call(lambda: model.get_company_access_by_class("user"), 3) / 1e3
+        print(f"{size:>10} {per_card_time:>14.1f} {one_call_time:>14.1f}")
+
+def bench_engines(num_companies: int = 100000, num_users: int = 100000,
+                  accesses_per_user: int = 5, decisions: int = 100000) -> None:
+    """Compare memory and decision cost of the dict and bitset engines"""
+    print(f"engines with {num_companies} companies, {num_users} users, "
+          f"{accesses_per_user} accesses per user")
+    print(f"{'engine':>8} {'history MB':>12} {'bytes/access':>13} {'decision (us)':>14}")
+    
+    for engine_name, engine in ENGINES.items():
+        rng = random.Random(42)
+        model = engine()
+        build_catalog(model, num_companies, 100)
+        
+        # Only measure the memory taken by users and their histories, and
+        # separately what each access adds on top of the empty histories
+        tracemalloc.start()
+        user_ids = [f"user{u}" for u in range(num_users)]
+        for user_id in user_ids:
+            model.add_user(user_id, user_id)
+        user_bytes = tracemalloc.get_traced_memory()[0]
+        for user_id in user_ids:
+            for _ in range(accesses_per_user):
+                model.access_object(user_id, f"company{rng.randrange(num_companies)}",
+                                    "object", "2025-01-01 00:00:00")
+        model.clear_access_logs()
+        history_bytes = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        per_access = (history_bytes - user_bytes) / (num_users * accesses_per_user)
+        
+        pairs = [(f"user{rng.randrange(num_users)}", f"company{rng.randrange(num_companies)}")
+                 for _ in range(decisions)]
+        start = time.perf_counter()
+        for user_id, company_id in pairs:
+            model.can_access(user_id, company_id)
+        per_decision = (time.perf_counter() - start) / decisions * 1e6
+        
+        print(f"{engine_name:>8} {history_bytes / 1e6:>12.1f} {per_access:>13.0f} {per_decision:>14.3f}")
+
+def bench_company_users(num_users: int = 1000000, num_companies: int = 10000,
+                        accesses_per_user: int = 2, repeats: int = 10) -> None:
+    """Compare company -> users index lookups, deletes, moves and revalidation with a scan of every history"""
+    print(f"company users with {num_companies} companies, {num_users} users, "
+          f"{accesses_per_user} accesses per user")
+    print(f"{'engine':>8} {'scan (ms)':>10} {'lookup (ms)':>12} {'delete (ms)':>12} {'move (ms)':>10} "
+          f"{'revalidate (ms)':>16} {'check (s)':>10}")
+    
+    for engine_name, engine in ENGINES.items():
+        rng = random.Random(42)
+        model = engine()
+        build_catalog(model, num_companies, 100)
+        with model.lock_all():
+            for u in range(num_users):
+                model.add_user(f"user{u}", f"User {u}")
+        for start in range(0, num_users, 10000):
+            model.access_objects([(f"user{u}", f"company{rng.randrange(num_companies)}",
+                                   "object", "2025-01-01 00:00:00")
+                                  for u in range(start, min(start + 10000, num_users))
+                                  for _ in range(accesses_per_user)])
+        model.clear_access_logs()
+        
+        # Finding the affected users without the index means scanning every history
+        start = time.perf_counter()
+        for i in range(repeats):
+            [user_id for user_id, history in model.user_access_history.items() if f"company{i}" in history]
+        scan = (time.perf_counter() - start) / repeats * 1e3
+        
+        lookup = time_per_call(lambda: model.get_company_users("company0"), repeats) / 1e3
+        
+        start = time.perf_counter()
+        for i in range(repeats):
+            model.delete_company(f"company{i}")
+        delete = (time.perf_counter() - start) / repeats * 1e3
+        
+        start = time.perf_counter()
+        for i in range(repeats, 2 * repeats):
+            model.update_company(f"company{i}", f"Company {i}", f"coi{(num_companies - 1) // 100}")
+        move = (time.perf_counter() - start) / repeats * 1e3
+        
+        start = time.perf_counter()
+        for i in range(repeats, 2 * repeats):
+            model.revalidate_company(f"company{i}")
+        revalidate = (time.perf_counter() - start) / repeats * 1e3
+        
+        start = time.perf_counter()
+        problems = model.check_company_users()
+        check = time.perf_counter() - start
+        assert not problems, problems[:10]
+        
+        print(f"{engine_name:>8} {scan:>10.1f} {lookup:>12.3f} {delete:>12.3f} {move:>10.3f} "
+              f"{revalidate:>16.3f} {check:>10.1f}")
+
+def bench_batch(num_users: int = 100000, num_companies: int = 1000, accesses_per_user: int = 10,
+                moves: int = 500) -> None:
+    """Compare moving companies one update_company call at a time with one batch"""
+    print(f"{moves} company moves with {num_companies} companies, {num_users} users, "
+          f"{accesses_per_user} accesses per user")
+    print(f"{'engine':>8} {'one by one (ms)':>16} {'batch (ms)':>11}")
+    
+    for engine_name, engine in ENGINES.items():
+        timings = []
+        for batched in (False, True):
+            rng = random.Random(42)
+            model = engine()
+            build_catalog(model, num_companies, 10)
+            with model.lock_all():
+                for u in range(num_users):
+                    model.add_user(f"user{u}", f"User {u}")
+            for start in range(0, num_users, 10000):
+                model.access_objects([(f"user{u}", f"company{rng.randrange(num_companies)}",
+                                       "object", "2025-01-01 00:00:00")
+                                      for u in range(start, min(start + 10000, num_users))
+                                      for _ in range(accesses_per_user)])
+            model.clear_access_logs()
+            
+            # Move each company to the next COI class
+            changes = [(f"company{i}", f"Company {i}", f"coi{(i // 10 + 1) % (num_companies // 10)}")
+                       for i in range(moves)]
+            start = time.perf_counter()
+            if batched:
+                with model.batch() as batch:
+                    for change in changes:
+                        batch.update_company(*change)
+            else:
+                for change in changes:
+                    model.update_company(*change)
+            timings.append((time.perf_counter() - start) * 1e3)
+        print(f"{engine_name:>8} {timings[0]:>16.1f} {timings[1]:>11.1f}")
+
+def bench_can_access_many(num_companies: int = 10000, num_users: int = 1000,
+                          accesses_per_user: int = 20) -> None:
+    """Compare per-pair can_access calls with one can_access_many call"""
+    rng = random.Random(42)
+    model = ChineseWallModel()
+    build_catalog(model, num_companies, 100)
+    user_ids = [f"user{u}" for u in range(num_users)]
+    company_ids = list(model.companies)
+    for user_id in user_ids:
+        model.add_user(user_id, user_id)
+        for _ in range(accesses_per_user):
+            model.access_object(user_id, rng.choice(company_ids), "object", "2025-01-01 00:00:00")
+    
+    print(f"can_access over {num_users} users x {num_companies} companies")
+    
+    start = time.perf_counter()
+    for user_id in user_ids:
+        for company_id in company_ids:
+            model.can_access(user_id, company_id)
+    print(f"{'per pair':>10} {time.perf_counter() - start:>10.3f} s")
+    
+    start = time.perf_counter()
+    model.can_access_many(user_ids, company_ids, with_reasons=True)
+    print(f"{'batched':>10} {time.perf_counter() - start:>10.3f} s")
+
+def bench_bulk_load(num_objects: int = 1000000, num_companies: int = 10000,
+                    class_counts: Iterable[int] = (10, 1000, 10000)) -> None:
+    """Measure object loading throughput as the number of COI classes grows"""
+    print(f"loading {num_objects} objects into {num_companies} companies")
+    print(f"{'classes':>10} {'add_object/s':>14} {'add_objects/s':>14}")
+    
+    objects = [(f"company{i % num_companies}", f"object{i}", "data") for i in range(num_objects)]
+    for num_classes in class_counts:
+        rates = []
+        for bulk in (False, True):
+            model = ChineseWallModel()
+            build_catalog(model, num_companies, max(1, num_companies // num_classes))
+            start = time.perf_counter()
+            if bulk:
+                model.add_objects(objects)
+            else:
+                for company_id, object_id, object_data in objects:
+                    model.add_object(company_id, object_id, object_data)
+            rates.append(num_objects / (time.perf_counter() - start))
+        print(f"{num_classes:>10} {rates[0]:>14,.0f} {rates[1]:>14,.0f}")
+
+def bench_storage(num_companies: int = 10000, num_users: int = 10000,
+                  accesses: int = 200000, queries: int = 1000) -> None:
+    """Compare decision throughput and report queries of in-memory and SQLite storage"""
+    print(f"storage with {num_companies} companies, {num_users} users, {accesses} accesses")
+    print(f"{'engine':>8} {'access_object/s':>16} {'batched/s':>10} {'user report (ms)':>17}")
+    
+    with tempfile.TemporaryDirectory() as directory:
+        storages = {
+            "dict": ChineseWallModel,
+            "sqlite": lambda: SQLiteChineseWallModel(os.path.join(directory, "benchmark.db")),
+        }
+        for storage_name, storage in storages.items():
+            rng = random.Random(42)
+            model = storage()
+            build_catalog(model, num_companies, 100)
+            for u in range(num_users):
+                model.add_user(f"user{u}", f"User {u}")
+            
+            start = time.perf_counter()
+            for i in range(accesses):
+                model.access_object(f"user{rng.randrange(num_users)}", f"company{rng.randrange(num_companies)}",
+                                    "object", f"2025-01-01 00:{i // 60 % 60:02d}:{i % 60:02d}")
+            rate = accesses / (time.perf_counter() - start)
+            
+            # Batches of 100, as the decision server coalesces them; SQLite commits once per batch
+            batch = [(f"user{rng.randrange(num_users)}", f"company{rng.randrange(num_companies)}",
+                      "object", "2025-01-01 01:00:00") for _ in range(accesses)]
+            start = time.perf_counter()
+            for i in range(0, accesses, 100):
+                model.access_objects(batch[i:i + 100])
+            batched_rate = accesses / (time.perf_counter() - start)
+            
+            start = time.perf_counter()
+            for _ in range(queries):
+                model.query_access_logs(user_id=f"user{rng.randrange(num_users)}")
+            per_query = (time.perf_counter() - start) / queries * 1e3
+            
+            print(f"{storage_name:>8} {rate:>16,.0f} {batched_rate:>10,.0f} {per_query:>17.3f}")
+            if storage_name == "sqlite":
+                model.close()
+
+def bench_access_log(num_entries: int = 1000000, num_users: int = 1000, num_companies: int = 1000) -> None:
+    """Compare the memory of the columnar access log with a list of log dicts"""
+    rng = random.Random(42)
+    model = ChineseWallModel()
+    build_catalog(model, num_companies, 10)
+    for u in range(num_users):
+        model.add_user(f"user{u}", f"User {u}")
+    entries = [(f"2025-01-01 {i // 3600 % 24:02d}:{i // 60 % 60:02d}:{i % 60:02d}",
+                f"user{rng.randrange(num_users)}", f"company{rng.randrange(num_companies)}",
+                f"object{rng.randrange(100)}") for i in range(num_entries)]
+    
+    def fill(store_name: str) -> list:
+        """Log every entry in one of the stores"""
+        model.clear_access_logs()
+        dict_logs = []
+        for timestamp, user_id, company_id, object_id in entries:
+            if store_name == "dicts":
+                # The entry ChineseWallModel.access_object used to store
+                access_granted, reason = model.can_access(user_id, company_id)
+                dict_logs.append({
+                    "timestamp": timestamp,
+                    "user_id": user_id,
+                    "user_name": model.users[user_id]["name"],
+                    "company_id": company_id,
+                    "company_name": model.companies[company_id]["name"],
+                    "object_id": object_id,
+                    "access_granted": access_granted,
+                    "reason": reason,
+                })
+            else:
+                reason_code, reason_company_id = model._decide(user_id, company_id)
+                model._append_access_log(timestamp, user_id, company_id, object_id,
+                                         reason_code in GRANTED_REASONS, reason_code, reason_company_id)
+        return dict_logs
+    
+    print(f"access log with {num_entries} entries")
+    print(f"{'store':>8} {'MB':>10} {'bytes/entry':>12} {'append/s':>12}")
+    
+    for store_name in ("dicts", "columnar"):
+        start = time.perf_counter()
+        fill(store_name)
+        rate = num_entries / (time.perf_counter() - start)
+        
+        tracemalloc.start()
+        dict_logs = fill(store_name)
+        log_bytes = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        del dict_logs
+        print(f"{store_name:>8} {log_bytes / 1e6:>10.1f} {log_bytes / num_entries:>12.1f} {rate:>12,.0f}")
+
+def bench_access_log_spill(num_entries: int = 1000000, max_entries: int = 100000,
+                           num_users: int = 1000, num_companies: int = 1000) -> None:
+    """Track access log memory under a sustained event rate, with and without spilling"""
+    print(f"access log memory while logging {num_entries} entries (MB)")
+    checkpoints = [num_entries * step // 5 for step in range(1, 6)]
+    print(f"{'store':>10} " + " ".join(f"{checkpoint:>9}" for checkpoint in checkpoints)
+          + f" {'scan s':>8} {'worst access ms':>16}")
+    
+    for store_name in ("memory", "spilled"):
+        rng = random.Random(42)
+        model = ChineseWallModel()
+        build_catalog(model, num_companies, 10)
+        for u in range(num_users):
+            model.add_user(f"user{u}", f"User {u}")
+        
+        with tempfile.TemporaryDirectory() as directory:
+            tracemalloc.start()
+            if store_name == "spilled":
+                model.access_logs.spill_to(directory, max_entries)
+            
+            # The slowest access shows any pause a spill causes
+            usage = []
+            worst = 0.0
+            for i in range(num_entries):
+                timestamp = f"2025-01-01 {i // 3600 % 24:02d}:{i // 60 % 60:02d}:{i % 60:02d}"
+                access_start = time.perf_counter()
+                model.access_object(f"user{rng.randrange(num_users)}", f"company{rng.randrange(num_companies)}",
+                                    f"object{rng.randrange(100)}", timestamp)
+                worst = max(worst, time.perf_counter() - access_start)
+                if i + 1 in checkpoints:
+                    usage.append(tracemalloc.get_traced_memory()[0] / 1e6)
+            tracemalloc.stop()
+            
+            # Stream over both tiers, as the report screens do
+            start = time.perf_counter()
+            sum(1 for _ in model.iter_access_logs(user_id="user0"))
+            elapsed = time.perf_counter() - start
+            
+            print(f"{store_name:>10} " + " ".join(f"{mb:>9.1f}" for mb in usage)
+                  + f" {elapsed:>8.2f} {worst * 1e3:>16.1f}")
+            model.clear_access_logs()
+
+def holding_violations(model: ChineseWallModel) -> list:
+    """Find users whose history holds two companies of one COI class"""
+    violations = []
+    with model.lock_all():
+        for user_id, history in model.user_access_history.items():
+            coi_classes = [model.companies[company_id]["coi_class"] for company_id in history]
+            if len(coi_classes) != len(set(coi_classes)):
+                violations.append((user_id, sorted(history)))
+    return violations
+
+def bench_threads(num_threads: int = 8, operations: int = 20000, num_users: int = 50,
+                  num_companies: int = 40, companies_per_class: int = 4) -> None:
+    """Stress one model from many threads and check that the wall is never breached"""
+    print(f"{num_threads} threads x {operations} operations on {num_users} users")
+    print(f"{'engine':>8} {'threads':>8} {'ops/s':>10} {'log entries':>12} {'violations':>11}")
+    
+    # Switch threads far more often than usual to provoke interleavings
+    switch_interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    try:
+        for engine_name, engine in list(ENGINES.items()) + [("sqlite", SQLiteChineseWallModel)]:
+            for threads in (1, num_threads):
+                model = engine()
+                build_catalog(model, num_companies, companies_per_class)
+                for u in range(num_users):
+                    model.add_user(f"user{u}", f"User {u}")
+                
+                logged = [0] * threads
+                violations = []
+                start_barrier = threading.Barrier(threads + 1)
+                
+                def worker(index: int) -> None:
+                    rng = random.Random(index)
+                    start_barrier.wait()
+                    for i in range(operations // threads):
+                        user_id = f"user{rng.randrange(num_users)}"
+                        company_id = f"company{rng.randrange(num_companies)}"
+                        choice = rng.random()
+                        if choice < 0.6:
+                            model.access_object(user_id, company_id, "object", "2025-01-01 00:00:00")
+                            logged[index] += 1
+                        elif choice < 0.8:
+                            # A batch for two users across several companies
+                            accesses = [(f"user{rng.randrange(num_users)}", f"company{rng.randrange(num_companies)}",
+                                         "object", "2025-01-01 00:00:00") for _ in range(5)]
+                            model.access_objects(accesses)
+                            logged[index] += len(accesses)
+                        elif choice < 0.96:
+                            model.can_access(user_id, company_id)
+                        elif choice < 0.98:
+                            model.revoke_access(user_id, company_id)
+                        else:
+                            model.reset_user_history(user_id)
+                
+                workers = [threading.Thread(target=worker, args=(index,)) for index in range(threads)]
+                for thread in workers:
+                    thread.start()
+                start_barrier.wait()
+                start = time.perf_counter()
+                
+                # Check the invariant while the workers run, and once at the end
+                while any(thread.is_alive() for thread in workers):
+                    violations.extend(holding_violations(model))
+                    time.sleep(0.01)
+                for thread in workers:
+                    thread.join()
+                elapsed = time.perf_counter() - start
+                violations.extend(holding_violations(model))
+                
+                print(f"{engine_name:>8} {threads:>8} {operations / elapsed:>10,.0f} "
+                      f"{len(model.access_logs):>12} {len(violations):>11}")
+                assert not violations, f"users holding rival companies: {violations[:5]}"
+                assert len(model.access_logs) == sum(logged), "access log entries were lost"
+                index_problems = model.check_company_users()
+                assert index_problems == [], f"company -> users index out of sync: {index_problems[:5]}"
+    finally:
+        sys.setswitchinterval(switch_interval)
+
+def bench_shards(num_users: int = 10000, num_companies: int = 1000, num_accesses: int = 400000,
+                 batch_size: int = 10000, shard_counts: Iterable[int] = (1, 2, 4, 8)) -> None:
+    """Compare batched access throughput of one in-process model with the process-sharded model"""
+    print(f"access_objects throughput, batches of {batch_size}, {os.cpu_count()} CPUs")
+    print(f"{'model':>10} {'shards':>8} {'accesses/s':>12} {'speedup':>9}")
+    
+    rng = random.Random(42)
+    accesses = [(f"user{rng.randrange(num_users)}", f"company{rng.randrange(num_companies)}",
+                 "object", "2025-01-01 00:00:00") for _ in range(num_accesses)]
+    batches = [accesses[i:i + batch_size] for i in range(0, num_accesses, batch_size)]
+    
+    expected = None
+    baseline = None
+    for shards in (0,) + tuple(shard_counts):
+        model = ChineseWallModel() if shards == 0 else ShardedChineseWallModel(shards)
+        try:
+            build_catalog(model, num_companies, 10)
+            for u in range(num_users):
+                model.add_user(f"user{u}", f"User {u}")
+            
+            start = time.perf_counter()
+            results = [result for batch in batches for result in model.access_objects(batch)]
+            rate = num_accesses / (time.perf_counter() - start)
+        finally:
+            if shards:
+                model.close()
+        
+        # Every engine must reach the same decisions
+        if expected is None:
+            expected, baseline = results, rate
+        assert results == expected, f"{shards} shards decided differently"
+        print(f"{'in-process' if shards == 0 else 'sharded':>10} {shards or '-':>8} {rate:>12,.0f} "
+              f"{rate / baseline:>8.2f}x")
+
+def process_memory(pid: int) -> Dict[str, float]:
+    """Read the resident and proportional set sizes of a process in MB (Linux only)"""
+    sizes = {}
+    with open(f"/proc/{pid}/smaps_rollup") as smaps:
+        for line in smaps:
+            name, _, value = line.partition(":")
+            if name in ("Rss", "Pss"):
+                sizes[name] = int(value.split()[0]) / 1024
+    return sizes
+
+def bench_shared_catalog(num_companies: int = 200000, num_users: int = 1000, shards: int = 4,
+                         num_accesses: int = 100000, batch_size: int = 10000) -> None:
+    """Compare worker memory, catalog load time and throughput of replicated and shared catalogs"""
+    if not os.path.exists(f"/proc/{os.getpid()}/smaps_rollup"):
+        print("shared_catalog needs /proc/<pid>/smaps_rollup (Linux)")
+        return
+    
+    print(f"{shards} workers, {num_companies} companies")
+    print(f"{'catalog':>10} {'load s':>8} {'worker RSS MB':>14} {'worker PSS MB':>14} {'accesses/s':>12}")
+    
+    rng = random.Random(42)
+    accesses = [(f"user{rng.randrange(num_users)}", f"company{rng.randrange(num_companies)}",
+                 "object", "2025-01-01 00:00:00") for _ in range(num_accesses)]
+    for shared in (False, True):
+        model = ShardedChineseWallModel(shards, shared_catalog=shared)
+        try:
+            start = time.perf_counter()
+            build_catalog(model, num_companies, 10)
+            for u in range(num_users):
+                model.add_user(f"user{u}", f"User {u}")
+            
+            # The first request publishes a shared catalog
+            model.can_access("user0", "company0")
+            load_time = time.perf_counter() - start
+            
+            start = time.perf_counter()
+            for i in range(0, num_accesses, batch_size):
+                model.access_objects(accesses[i:i + batch_size])
+            rate = num_accesses / (time.perf_counter() - start)
+            
+            memory = [process_memory(shard.process.pid) for shard in model._shards]
+            rss = sum(sizes["Rss"] for sizes in memory) / shards
+            pss = sum(sizes["Pss"] for sizes in memory) / shards
+        finally:
+            model.close()
+        print(f"{'shared' if shared else 'replicated':>10} {load_time:>8.2f} {rss:>14.1f} {pss:>14.1f} {rate:>12,.0f}")
+
+def bench_decision_cache(num_companies: int = 10000, num_users: int = 1000, refreshes: int = 5) -> None:
+    """Compare the first and repeated dashboard-style can_access sweeps with the decision cache"""
+    print(f"decision cache with {num_companies} companies, {num_users} users, {refreshes} refreshes")
+    print(f"{'engine':>8} {'cold (us)':>10} {'warm (us)':>10} {'hit rate':>9}")
+    
+    with tempfile.TemporaryDirectory() as directory:
+        storages = {
+            "dict": ChineseWallModel,
+            "sqlite": lambda: SQLiteChineseWallModel(os.path.join(directory, "benchmark.db")),
+        }
+        for storage_name, storage in storages.items():
+            rng = random.Random(42)
+            model = storage()
+            build_catalog(model, num_companies, 100)
+            for u in range(num_users):
+                model.add_user(f"user{u}", f"User {u}")
+                for _ in range(5):
+                    model.access_object(f"user{u}", f"company{rng.randrange(num_companies)}",
+                                        "object", "2025-01-01 00:00:00")
+            
+            # Each user looks at the same page of companies on every refresh
+            pairs = [(f"user{u}", f"company{rng.randrange(num_companies)}")
+                     for u in range(num_users) for _ in range(20)]
+            timings = []
+            for _ in range(refreshes + 1):
+                start = time.perf_counter()
+                for user_id, company_id in pairs:
+                    model.can_access(user_id, company_id)
+                timings.append((time.perf_counter() - start) / len(pairs) * 1e6)
+            
+            stats = model.decision_cache_stats()
+            hit_rate = stats["hits"] / max(stats["hits"] + stats["misses"], 1)
+            print(f"{storage_name:>8} {timings[0]:>10.2f} {sum(timings[1:]) / refreshes:>10.2f} {hit_rate:>9.1%}")
+            if storage_name == "sqlite":
+                model.close()
+
+def bench_dashboard(sizes: Iterable[int] = (100, 1000, 5000), companies_per_class: int = 10,
+                    accesses: int = 20) -> None:
+    """Time a full dashboard redraw and the incremental update after an access, and count widgets (needs a display)"""
+    import tkinter as tk
+    from change_events import ChangeEventBus
+    from data_manager import DataManager
+    from main_dashboard import MainDashboard
+    
+    try:
+        root = tk.Tk()
+    except tk.TclError as error:
+        print(f"dashboard benchmark skipped: {error}")
+        return
+    root.withdraw()
+    
+    print(f"dashboard update after one access, {companies_per_class} companies per COI class")
+    print(f"{'companies':>10} {'full refresh (ms)':>18} {'incremental (ms)':>17} {'widgets':>8}")
+    
+    for size in sizes:
+        model = ChineseWallModel()
+        build_catalog(model, size, companies_per_class)
+        model.add_objects((f"company{i}", f"object{j}", "data") for i in range(size) for j in range(3))
+        model.add_user("user", "Benchmark User")
+        
+        # Flushed by hand below rather than when Tk goes idle
+        events = ChangeEventBus(model)
+        dashboard = MainDashboard(root, model, DataManager(model), "user",
+                                  None, None, None, None, events)
+        root.update_idletasks()
+        
+        # Each access opens a new COI class, restricting its other companies
+        incremental = []
+        for i in range(min(accesses, size // companies_per_class)):
+            model.access_object("user", f"company{i * companies_per_class}", "object0", "2025-01-01 00:00:00")
+            start = time.perf_counter()
+            events.flush()
+            root.update_idletasks()
+            incremental.append(time.perf_counter() - start)
+        
+        start = time.perf_counter()
+        dashboard.refresh()
+        root.update_idletasks()
+        full = time.perf_counter() - start
+        
+        widgets, pending = 0, [dashboard]
+        while pending:
+            widgets += 1
+            pending.extend(pending.pop().winfo_children())
+        
+        print(f"{size:>10} {full * 1e3:>18.1f} {sum(incremental) / len(incremental) * 1e3:>17.2f} {widgets:>8}")
+        dashboard.destroy()
+        events.close()
+    root.destroy()
+
+BENCHMARKS: Dict[str, Callable[[], None]] = {
+    "can_access": bench_can_access,
+    "engines": bench_engines,
+    "can_access_many": bench_can_access_many,
+    "accessible_companies": bench_accessible_companies,
+    "company_access": bench_company_access,
+    "bulk_load": bench_bulk_load,
+    "storage": bench_storage,
+    "company_users": bench_company_users,
+    "batch": bench_batch,
+    "access_log": bench_access_log,
+    "access_log_spill": bench_access_log_spill,
+    "threads": bench_threads,
+    "shards": bench_shards,
+    "shared_catalog": bench_shared_catalog,
+    "decision_cache": bench_decision_cache,
+    "dashboard": bench_dashboard,
+}
+
+def main():
+    """Main entry point for the benchmarks"""
+    parser = argparse.ArgumentParser(description="Chinese Wall Model benchmarks")
+    parser.add_argument("benchmarks", nargs="*", choices=sorted(BENCHMARKS),
+                        help="benchmarks to run (default: all)")
+    args = parser.parse_args()
+    
+    for name in args.benchmarks or BENCHMARKS:
+        BENCHMARKS[name]()
+        print()
+
+if __name__ == "__main__":
+    main()
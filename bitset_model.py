@@ -0,0 +1,300 @@
+"""
+Bitset-backed Chinese Wall Model Implementation
+Interns user, company and COI class IDs to dense integers and stores each
+user's access history as a bitset of the COI classes they have accessed.
+"""
+
+from array import array
+from typing import AbstractSet, Dict, Iterable, Iterator, List, Mapping, Optional, Set
+
+from chinese_wall_model import ChineseWallModel, exclusive
+
+# Number of bits reserved for the COI index in a (user, COI class) key
+COI_KEY_BITS = 32
+
+def iter_bits(bits: int) -> Iterator[int]:
+    """Yield the indexes of the set bits of an integer, lowest first"""
+    while bits:
+        lowest = bits & -bits
+        yield lowest.bit_length() - 1
+        bits ^= lowest
+
+class UserHistoryView(Mapping):
+    """Read-only {company_id: True} view of a single user's access history"""
+    
+    def __init__(self, model: "BitsetChineseWallModel", user_index: int):
+        self.model = model
+        self.user_index = user_index
+    
+    def __getitem__(self, company_id: str) -> bool:
+        company_index = self.model._company_index.get(company_id)
+        if company_index is None or not self.model._has_accessed(self.user_index, company_index):
+            raise KeyError(company_id)
+        return True
+    
+    def __iter__(self) -> Iterator[str]:
+        # In access order, like the histories of the other engines
+        company_ids = self.model._company_ids
+        for company_index in self.model._access_order[self.user_index]:
+            yield company_ids[company_index]
+    
+    def __len__(self) -> int:
+        return len(self.model._access_order[self.user_index])
+
+class AccessHistoryView(Mapping):
+    """Read-only {user_id: {company_id: True}} view over all user histories"""
+    
+    def __init__(self, model: "BitsetChineseWallModel"):
+        self.model = model
+    
+    def __getitem__(self, user_id: str) -> UserHistoryView:
+        return UserHistoryView(self.model, self.model._user_index[user_id])
+    
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.model._user_index)
+    
+    def __len__(self) -> int:
+        return len(self.model._user_index)
+
+class BitsetChineseWallModel(ChineseWallModel):
+    """
+    Drop-in ChineseWallModel engine using integer interning and bitsets.
+
+    Each user has a bitset with one bit per COI class they have accessed, so
+    the common "no conflict" decision is a single AND against the bit of the
+    requested company's COI class, looked up in a precomputed company->COI
+    table. The company held in an accessed class is kept in one flat table
+    keyed by (user index, COI index) packed into an int.
+    user_access_history is exposed as a read-only view over these tables.
+    """
+    
+    def __init__(self):
+        super().__init__()
+        self._reset_histories()
+    
+    def _reset_histories(self) -> None:
+        """Create empty interning tables and histories"""
+        # Format: {id: dense index}
+        self._user_index: Dict[str, int] = {}
+        self._company_index: Dict[str, int] = {}
+        self._coi_index: Dict[str, int] = {}
+        
+        # Format: [company_id or None for deleted companies], indexed by company index
+        self._company_ids: List[Optional[str]] = []
+        
+        # Format: [user_id or None for deleted users], indexed by user index
+        self._user_ids: List[Optional[str]] = []
+        
+        # Format: [coi index], indexed by company index
+        self._company_coi = array("i")
+        
+        # Format: [bitset of accessed coi indexes], indexed by user index
+        self._coi_bits: List[int] = []
+        
+        # Format: {(user index << COI_KEY_BITS) | coi index: company index}
+        self._held: Dict[int, int] = {}
+        
+        # Companies held in addition to _held, which only happens when a company
+        # is moved into a COI class the user had already accessed
+        # Format: {(user index << COI_KEY_BITS) | coi index: {company index}}
+        self._extra_held: Dict[int, Set[int]] = {}
+        
+        # Users whose history includes each company
+        # Format: {company index: {user index}}
+        self._company_users_index: Dict[int, Set[int]] = {}
+        
+        # Company indexes of each user's history in access order, so the company held
+        # in a class is the earliest accessed one, as in the dict engine
+        # Format: [array of company indexes], indexed by user index
+        self._access_order: List[array] = []
+        
+        self.user_access_history = AccessHistoryView(self)
+    
+    @exclusive
+    def add_coi_class(self, coi_class_id: str, name: str) -> bool:
+        """Add a new conflict of interest class"""
+        if coi_class_id in self.coi_classes:
+            return False
+        
+        if coi_class_id not in self._coi_index:
+            self._coi_index[coi_class_id] = len(self._coi_index)
+        return super().add_coi_class(coi_class_id, name)
+    
+    @exclusive
+    def add_company(self, company_id: str, name: str, coi_class_id: str) -> bool:
+        """Add a new company to a conflict of interest class"""
+        if company_id in self.companies or coi_class_id not in self.coi_classes:
+            return False
+        
+        self._company_index[company_id] = len(self._company_ids)
+        self._company_ids.append(company_id)
+        self._company_coi.append(self._coi_index[coi_class_id])
+        return super().add_company(company_id, name, coi_class_id)
+    
+    def _init_user_history(self, user_id: str) -> None:
+        """Intern a new user with an empty history bitset"""
+        self._user_index[user_id] = len(self._coi_bits)
+        self._user_ids.append(user_id)
+        self._coi_bits.append(0)
+        self._access_order.append(array("i"))
+    
+    def _has_accessed(self, user_index: int, company_index: int) -> bool:
+        """Check whether a user's history contains a company"""
+        coi_index = self._company_coi[company_index]
+        if not (self._coi_bits[user_index] >> coi_index) & 1:
+            return False
+        
+        key = (user_index << COI_KEY_BITS) | coi_index
+        return self._held[key] == company_index or company_index in self._extra_held.get(key, ())
+    
+    def _accessed_company_in_class(self, user_id: str, coi_class_id: str,
+                                   company_id: Optional[str] = None) -> Optional[str]:
+        """
+        Return the company the user has accessed in a COI class, if any.
+        company_id is returned itself when the user has already accessed it.
+        """
+        user_index = self._user_index.get(user_id)
+        if user_index is None:
+            return None
+        
+        coi_index = self._coi_index[coi_class_id]
+        if not (self._coi_bits[user_index] >> coi_index) & 1:
+            return None
+        
+        key = (user_index << COI_KEY_BITS) | coi_index
+        held = self._held[key]
+        if company_id is not None:
+            company_index = self._company_index[company_id]
+            if held == company_index or company_index in self._extra_held.get(key, ()):
+                return company_id
+        return self._company_ids[held]
+    
+    def _held_coi_classes(self, user_id: str) -> AbstractSet[str]:
+        """Get the COI classes in which a user has accessed a company"""
+        user_index = self._user_index.get(user_id)
+        if user_index is None:
+            return set()
+        
+        company_ids, companies = self._company_ids, self.companies
+        return {companies[company_ids[self._held[(user_index << COI_KEY_BITS) | coi_index]]]["coi_class"]
+                for coi_index in iter_bits(self._coi_bits[user_index])}
+    
+    def _position(self, user_index: int, company_index: int) -> int:
+        """Get where a company is in a user's access order"""
+        return self._access_order[user_index].index(company_index)
+    
+    def _hold(self, user_index: int, company_index: int, moved: bool = False) -> None:
+        """Add a company index to a user's history tables; a moved company keeps its access position"""
+        if not moved:
+            self._access_order[user_index].append(company_index)
+        
+        coi_index = self._company_coi[company_index]
+        key = (user_index << COI_KEY_BITS) | coi_index
+        
+        if not (self._coi_bits[user_index] >> coi_index) & 1:
+            self._coi_bits[user_index] |= 1 << coi_index
+            self._held[key] = company_index
+        elif self._held[key] != company_index:
+            held = self._held[key]
+            extra = self._extra_held.setdefault(key, set())
+            if self._position(user_index, company_index) < self._position(user_index, held):
+                # A company moved into the class was accessed before the held one
+                self._held[key] = company_index
+                extra.add(held)
+            else:
+                extra.add(company_index)
+        with self._index_lock:
+            self._company_users_index.setdefault(company_index, set()).add(user_index)
+    
+    def _release(self, user_index: int, company_index: int, coi_index: int, keep_position: bool = False) -> None:
+        """Remove a company index from a user's history tables; a company being moved keeps its access position"""
+        if not keep_position:
+            self._access_order[user_index].remove(company_index)
+        
+        key = (user_index << COI_KEY_BITS) | coi_index
+        extra = self._extra_held.get(key)
+        
+        if self._held.get(key) == company_index:
+            if extra:
+                # Promote the earliest accessed of the other companies held in the class
+                promoted = min(extra, key=lambda extra_index: self._position(user_index, extra_index))
+                extra.discard(promoted)
+                self._held[key] = promoted
+            else:
+                del self._held[key]
+                self._coi_bits[user_index] &= ~(1 << coi_index)
+        elif extra:
+            extra.discard(company_index)
+        
+        if extra is not None and not extra:
+            del self._extra_held[key]
+        self._unindex(user_index, company_index)
+    
+    def _unindex(self, user_index: int, company_index: int) -> None:
+        """Remove a user from a company's entry in the company -> users index"""
+        with self._index_lock:
+            users = self._company_users_index.get(company_index)
+            if users is not None:
+                users.discard(user_index)
+                if not users:
+                    del self._company_users_index[company_index]
+    
+    def _users_holding(self, company_index: int) -> List[int]:
+        """Find the users whose history contains a company"""
+        return list(self._company_users_index.get(company_index, ()))
+    
+    def _company_users(self, company_id: str) -> Iterable[str]:
+        """Get the users whose access history includes a company"""
+        company_index = self._company_index.get(company_id)
+        if company_index is None:
+            return ()
+        user_ids = self._user_ids
+        return [user_ids[user_index] for user_index in self._company_users_index.get(company_index, ())]
+    
+    def _record_access(self, user_id: str, company_id: str) -> None:
+        """Add a company to a user's access history"""
+        user_index = self._user_index.get(user_id)
+        if user_index is not None:
+            company_index = self._company_index[company_id]
+            if not self._has_accessed(user_index, company_index):
+                self._hold(user_index, company_index)
+    
+    def _clear_user_history(self, user_id: str) -> None:
+        """Empty a user's access history"""
+        user_index = self._user_index[user_id]
+        for coi_index in iter_bits(self._coi_bits[user_index]):
+            key = (user_index << COI_KEY_BITS) | coi_index
+            for company_index in (self._held.pop(key), *self._extra_held.pop(key, ())):
+                self._unindex(user_index, company_index)
+        self._coi_bits[user_index] = 0
+        self._access_order[user_index] = array("i")
+    
+    def _forget_access(self, user_id: str, company_id: str) -> None:
+        """Remove one company from a user's access history"""
+        company_index = self._company_index[company_id]
+        self._release(self._user_index[user_id], company_index, self._company_coi[company_index])
+    
+    def _drop_user_history(self, user_id: str) -> None:
+        """Forget the access history of a deleted user"""
+        self._clear_user_history(user_id)
+        self._user_ids[self._user_index.pop(user_id)] = None
+    
+    def _reindex_moved_company(self, company_id: str, old_coi_class_id: str) -> None:
+        """Re-file a moved company under its new COI class in affected histories"""
+        company_index = self._company_index[company_id]
+        old_coi_index = self._coi_index[old_coi_class_id]
+        holders = self._users_holding(company_index)
+        
+        self._company_coi[company_index] = self._coi_index[self.companies[company_id]["coi_class"]]
+        for user_index in holders:
+            self._release(user_index, company_index, old_coi_index, keep_position=True)
+            self._hold(user_index, company_index, moved=True)
+    
+    def _remove_company_from_histories(self, company_id: str, coi_class_id: str) -> None:
+        """Remove a deleted company from every user's access history"""
+        # Company indexes are never reused
+        company_index = self._company_index.pop(company_id)
+        coi_index = self._coi_index[coi_class_id]
+        for user_index in self._users_holding(company_index):
+            self._release(user_index, company_index, coi_index)
+        self._company_ids[company_index] = None
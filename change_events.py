@@ -0,0 +1,206 @@
+"""
+Change events for the Chinese Wall Model
+Turns model mutations into typed change events and delivers them to GUI
+subscribers, coalesced so a burst of changes is handled once.
+"""
+
+import threading
+from typing import Any, Callable, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from chinese_wall_model import ChineseWallModel
+
+# Kinds of change events, with the fields each one sets
+ACCESS_RECORDED = "access_recorded"     # user_id, company_id, object_id
+HISTORY_RESET = "history_reset"         # user_id, and company_id when one company was revoked
+COMPANY_ADDED = "company_added"         # company_id, coi_class_id
+COMPANY_RENAMED = "company_renamed"     # company_id, coi_class_id
+COMPANY_MOVED = "company_moved"         # company_id, coi_class_id, old_coi_class_id
+COMPANY_DELETED = "company_deleted"     # company_id, coi_class_id
+COI_CLASS_ADDED = "coi_class_added"     # coi_class_id
+COI_CLASS_DELETED = "coi_class_deleted" # coi_class_id
+OBJECT_CHANGED = "object_changed"       # company_id, object_id (added, edited or deleted)
+USER_CHANGED = "user_changed"           # user_id (added, edited or deleted)
+LOGS_CLEARED = "logs_cleared"
+MODEL_CLEARED = "model_cleared"
+
+# Events that change which companies a user may access
+CATALOG_EVENTS = frozenset({COMPANY_ADDED, COMPANY_RENAMED, COMPANY_MOVED, COMPANY_DELETED,
+                            COI_CLASS_ADDED, COI_CLASS_DELETED, MODEL_CLEARED})
+
+# How often, in milliseconds, the Tk bus checks for events queued by other threads
+POLL_INTERVAL_MS = 100
+
+class ChangeEvent(NamedTuple):
+    """A change to the model; fields a kind does not use are None"""
+    kind: str
+    user_id: Optional[str] = None
+    company_id: Optional[str] = None
+    coi_class_id: Optional[str] = None
+    object_id: Optional[str] = None
+    old_coi_class_id: Optional[str] = None
+
+# Format: callback([ChangeEvent])
+Subscriber = Callable[[List[ChangeEvent]], None]
+
+class ChangeEventBus:
+    """
+    Publishes a model's mutations as ChangeEvents.
+
+    Events are queued as mutations happen, on any thread, and handed out by
+    flush(): each subscriber gets one call with the new events it asked for,
+    duplicates removed. Subclasses decide when to flush.
+    """
+    
+    def __init__(self, model: ChineseWallModel):
+        self.model = model
+        
+        # COI class of each company, so moves can name the class they left
+        # Format: {company_id: coi_class_id}
+        with model.lock_all():
+            self._company_classes: Dict[str, str] = {company_id: company_info["coi_class"]
+                                                     for company_id, company_info in model.companies.items()}
+        
+        # Format: [(callback, kinds or None for every kind)]
+        self._subscribers: List[Tuple[Subscriber, Optional[frozenset]]] = []
+        
+        # Events waiting for the next flush
+        self._pending: List[ChangeEvent] = []
+        self._lock = threading.Lock()
+        
+        model.add_mutation_listener(self._on_mutation)
+    
+    def subscribe(self, callback: Subscriber, kinds: Optional[Iterable[str]] = None) -> None:
+        """Deliver the events of the given kinds (default: all) to callback"""
+        self._subscribers.append((callback, frozenset(kinds) if kinds is not None else None))
+    
+    def subscribe_widget(self, widget, callback: Subscriber, kinds: Optional[Iterable[str]] = None) -> None:
+        """Subscribe callback until widget is destroyed"""
+        self.subscribe(callback, kinds)
+        
+        def on_destroy(event):
+            if event.widget is widget:
+                self.unsubscribe(callback)
+        widget.bind("<Destroy>", on_destroy, add="+")
+    
+    def unsubscribe(self, callback: Subscriber) -> None:
+        """Stop delivering events to callback"""
+        self._subscribers = [(subscriber, kinds) for subscriber, kinds in self._subscribers
+                             if subscriber != callback]
+    
+    def close(self) -> None:
+        """Stop listening to the model"""
+        self.model.remove_mutation_listener(self._on_mutation)
+    
+    def flush(self) -> int:
+        """
+        Deliver the queued events to the subscribers
+        Returns: int - number of distinct events delivered
+        """
+        with self._lock:
+            events, self._pending = list(dict.fromkeys(self._pending)), []
+        if not events:
+            return 0
+        
+        # Copied so callbacks can subscribe and unsubscribe
+        for callback, kinds in list(self._subscribers):
+            wanted = events if kinds is None else [event for event in events if event.kind in kinds]
+            if wanted:
+                callback(wanted)
+        return len(events)
+    
+    def _schedule(self) -> None:
+        """Called once events are queued; the base bus waits for an explicit flush()"""
+    
+    def _on_mutation(self, operation: str, args: Tuple[Any, ...]) -> None:
+        """Queue the events of a model mutation"""
+        events = self._events_for(operation, args)
+        if events:
+            with self._lock:
+                self._pending.extend(events)
+            self._schedule()
+    
+    def _events_for(self, operation: str, args: Tuple[Any, ...]) -> List[ChangeEvent]:
+        """Translate a mutation record into change events"""
+        if operation == "apply_batch":
+            return [event for batch_operation, batch_args in args[0]
+                    for event in self._events_for(batch_operation, tuple(batch_args))]
+        if operation == "access_object":
+            user_id, company_id, object_id, _ = args
+            return [ChangeEvent(ACCESS_RECORDED, user_id=user_id, company_id=company_id, object_id=object_id)]
+        if operation == "access_objects":
+            return [ChangeEvent(ACCESS_RECORDED, user_id=user_id, company_id=company_id, object_id=object_id)
+                    for user_id, company_id, object_id, _ in args[0]]
+        if operation == "reset_user_history":
+            return [ChangeEvent(HISTORY_RESET, user_id=args[0])]
+        if operation == "revoke_access":
+            return [ChangeEvent(HISTORY_RESET, user_id=args[0], company_id=args[1])]
+        if operation in ("add_user", "update_user", "delete_user"):
+            return [ChangeEvent(USER_CHANGED, user_id=args[0])]
+        if operation in ("add_object", "update_object", "delete_object"):
+            return [ChangeEvent(OBJECT_CHANGED, company_id=args[0], object_id=args[1])]
+        if operation == "add_objects":
+            return [ChangeEvent(OBJECT_CHANGED, company_id=company_id, object_id=object_id)
+                    for company_id, object_id, _ in args[0]]
+        if operation == "add_coi_class":
+            return [ChangeEvent(COI_CLASS_ADDED, coi_class_id=args[0])]
+        if operation == "delete_coi_class":
+            return [ChangeEvent(COI_CLASS_DELETED, coi_class_id=args[0])]
+        if operation == "add_company":
+            company_id, _, coi_class_id = args
+            self._company_classes[company_id] = coi_class_id
+            return [ChangeEvent(COMPANY_ADDED, company_id=company_id, coi_class_id=coi_class_id)]
+        if operation == "update_company":
+            company_id, _, coi_class_id = args
+            old_coi_class_id = self._company_classes.get(company_id, coi_class_id)
+            self._company_classes[company_id] = coi_class_id
+            if old_coi_class_id != coi_class_id:
+                return [ChangeEvent(COMPANY_MOVED, company_id=company_id, coi_class_id=coi_class_id,
+                                    old_coi_class_id=old_coi_class_id)]
+            return [ChangeEvent(COMPANY_RENAMED, company_id=company_id, coi_class_id=coi_class_id)]
+        if operation == "delete_company":
+            coi_class_id = self._company_classes.pop(args[0], None)
+            return [ChangeEvent(COMPANY_DELETED, company_id=args[0], coi_class_id=coi_class_id)]
+        if operation == "clear_access_logs":
+            return [ChangeEvent(LOGS_CLEARED)]
+        if operation == "clear":
+            self._company_classes = {}
+            return [ChangeEvent(MODEL_CLEARED)]
+        return []
+
+class TkChangeEventBus(ChangeEventBus):
+    """
+    ChangeEventBus that delivers events on the Tk thread.
+
+    Changes made on the Tk thread are flushed when Tk next goes idle, so all
+    the changes of one event handler reach subscribers in a single call and
+    cause a single redraw. Changes made on other threads are picked up by a
+    poll every POLL_INTERVAL_MS, as Tk may only be called from its own thread.
+    """
+    
+    def __init__(self, root, model: ChineseWallModel):
+        super().__init__(model)
+        self.root = root
+        self._tk_thread = threading.current_thread()
+        self._flush_scheduled = False
+        self._poll_id = self.root.after(POLL_INTERVAL_MS, self._poll)
+    
+    def close(self) -> None:
+        """Stop listening to the model and polling"""
+        super().close()
+        self.root.after_cancel(self._poll_id)
+    
+    def _schedule(self) -> None:
+        """Flush at the next idle point when called on the Tk thread"""
+        if threading.current_thread() is self._tk_thread and not self._flush_scheduled:
+            self._flush_scheduled = True
+            self.root.after_idle(self._flush_when_idle)
+    
+    def _flush_when_idle(self) -> None:
+        self._flush_scheduled = False
+        self.flush()
+    
+    def _poll(self) -> None:
+        """Flush events queued by other threads"""
+        if not self._flush_scheduled:
+            self.flush()
+        self._poll_id = self.root.after(POLL_INTERVAL_MS, self._poll)
@@ -3,9 +3,149 @@ Chinese Wall Model Implementation
 This module contains the core logic for the Chinese Wall security model.
 """
 
-from typing import Dict, List, Tuple, Any, Set, Optional
+import functools
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import (Dict, List, Tuple, Any, Set, Optional, Iterable, Sequence, Union, Callable, Iterator,
+                    AbstractSet)
+import numpy as np
+
+from access_log import AccessLog
+
+# Reason codes for access decisions
+REASON_NO_CONFLICT = 0
+REASON_PREVIOUSLY_ACCESSED = 1
+REASON_CONFLICT = 2
+REASON_UNKNOWN_USER = 3
+REASON_UNKNOWN_COMPANY = 4
+
+# Codes for which access is granted
+GRANTED_REASONS = (REASON_NO_CONFLICT, REASON_PREVIOUSLY_ACCESSED)
+
+# Remediation policies for users found holding several companies of one COI class
+REMEDIATION_REPORT = "report"                   # change nothing
+REMEDIATION_REVOKE_MOVED = "revoke_moved"       # remove the moved company from their history
+REMEDIATION_REVOKE_EXISTING = "revoke_existing" # remove the other companies of the class
+REMEDIATION_RESET = "reset_history"             # reset their whole history
+REMEDIATION_POLICIES = (REMEDIATION_REPORT, REMEDIATION_REVOKE_MOVED,
+                        REMEDIATION_REVOKE_EXISTING, REMEDIATION_RESET)
+
+# Mutations that can be staged in a batch
+BATCH_OPERATIONS = frozenset({
+    "add_coi_class", "delete_coi_class",
+    "add_company", "update_company", "delete_company",
+    "add_object", "add_objects", "update_object", "delete_object",
+    "add_user", "update_user", "delete_user", "reset_user_history", "revoke_access",
+})
+
+# Number of locks users are spread over
+LOCK_STRIPES = 64
+
+# Most can_access results kept in the decision cache
+DECISION_CACHE_SIZE = 65536
+
+def exclusive(method: Callable) -> Callable:
+    """Run a model method while holding every user lock, excluding all other model calls"""
+    @functools.wraps(method)
+    def locked(self, *args, **kwargs):
+        with self.lock_all():
+            return method(self, *args, **kwargs)
+    return locked
+
+def per_user(method: Callable) -> Callable:
+    """Run a model method whose first argument is a user_id while holding that user's lock"""
+    @functools.wraps(method)
+    def locked(self, user_id, *args, **kwargs):
+        with self._user_locks[hash(user_id) % self.lock_stripes]:
+            return method(self, user_id, *args, **kwargs)
+    return locked
+
+class ModelBatch:
+    """
+    Mutations staged by ChineseWallModel.batch(). Calling a batchable model
+    method on it records the call, to be applied when the with block exits.
+    """
+    
+    def __init__(self):
+        # Format: [(operation, args)]
+        self.operations: List[Tuple[str, Tuple[Any, ...]]] = []
+        
+        # What each model method returned, set once the batch is applied
+        self.results: Optional[List[Any]] = None
+    
+    def __getattr__(self, operation: str) -> Callable[..., None]:
+        if operation not in BATCH_OPERATIONS:
+            raise AttributeError(f"'{operation}' cannot be batched")
+        
+        def stage(*args: Any) -> None:
+            self.operations.append((operation, args))
+        return stage
+
+class AccessibleCompaniesView(AbstractSet):
+    """
+    Live read-only set of the companies a user can access: every company outside
+    the COI classes they have accessed, plus the companies they accessed
+    """
+    
+    def __init__(self, model: "ChineseWallModel", user_id: str):
+        self.model = model
+        self.user_id = user_id
+    
+    def __contains__(self, company_id: object) -> bool:
+        model = self.model
+        with model._user_lock(self.user_id):
+            company_info = model.companies.get(company_id)
+            if company_info is None:
+                return False
+            held = model._accessed_company_in_class(self.user_id, company_info["coi_class"], company_id)
+            return held is None or held == company_id
+    
+    def __iter__(self) -> Iterator[str]:
+        # Iterate over a snapshot, as catalog changes cannot run while the user is locked
+        return iter(self.snapshot())
+    
+    def __len__(self) -> int:
+        model = self.model
+        with model._user_lock(self.user_id):
+            walled = sum(len(model.coi_classes.get(coi_class_id, {}))
+                         for coi_class_id in model._held_coi_classes(self.user_id))
+            return len(model.companies) - walled + len(model.user_access_history.get(self.user_id, {}))
+    
+    def snapshot(self) -> List[str]:
+        """Get the accessible companies as a list, previously accessed ones first"""
+        model = self.model
+        with model._user_lock(self.user_id):
+            held = model._held_coi_classes(self.user_id)
+            accessible = list(model.user_access_history.get(self.user_id, {}))
+            if not held:
+                return list(model.companies)
+            accessible.extend(company_id for company_id, company_info in model.companies.items()
+                              if company_info["coi_class"] not in held)
+            return accessible
 
 class ChineseWallModel:
+    """
+    Chinese Wall access control over COI classes, companies and users.
+
+    The model is thread-safe. Users are spread over lock_stripes locks: a
+    decision and its history update run atomically under the user's lock, so
+    unrelated users proceed in parallel. Catalog and admin changes take every
+    lock (see exclusive), and lock_all() does the same for callers that need
+    a consistent view of the whole model. Locks are always taken in stripe
+    order. The company -> users index is shared by all users, so updates to
+    it made under one user's lock also take a dedicated index lock.
+    
+    can_access results are kept in a bounded LRU decision cache. Entries are
+    stamped with the user's history version and the catalog version, which
+    are bumped by every change that can alter a decision, so stale entries
+    are never served. Each stripe has its own cache, used under its lock.
+    """
+    
+    # Number of locks users are spread over; engines that cannot run
+    # decisions concurrently use 1
+    lock_stripes = LOCK_STRIPES
+    
     def __init__(self):
         # Dictionary to store conflict of interest classes
         # Format: {coi_class_id: {company_id: {object_id: object_data}}}
@@ -15,150 +155,802 @@ class ChineseWallModel:
         # Format: {user_id: {company_id: True}}
         self.user_access_history: Dict[str, Dict[str, bool]] = {}
         
-        # Dictionary to store access logs
-        # Format: [{timestamp, user_id, company_id, object_id, access_granted}]
-        self.access_logs: List[Dict[str, Any]] = []
+        # Index of the company each user has accessed in each COI class
+        # Format: {user_id: {coi_class_id: company_id}}
+        self.user_coi_index: Dict[str, Dict[str, str]] = {}
+        
+        # Index of the users whose access history includes each company
+        # Format: {company_id: {user_id}}
+        self.company_user_index: Dict[str, Set[str]] = {}
+        
+        # Columnar store of access logs, read as a sequence of dicts
+        # Format: [{timestamp, user_id, user_name, company_id, company_name, object_id, access_granted, reason}]
+        self.access_logs: Sequence[Dict[str, Any]] = AccessLog(self)
         
         # Dictionary to store company information
         # Format: {company_id: {"name": name, "coi_class": coi_class_id}}
         self.companies: Dict[str, Dict[str, str]] = {}
         
+        # Index of each company's objects, sharing the dicts stored in coi_classes
+        # Format: {company_id: {object_id: object_data}}
+        self.company_objects: Dict[str, Dict[str, str]] = {}
+        
         # Dictionary to store user information
         # Format: {user_id: {"name": name, "role": role}}
         self.users: Dict[str, Dict[str, str]] = {}
+        
+        # Callbacks notified of every successful mutation (used for persistence)
+        # Format: [callback(operation, args)]
+        self._mutation_listeners: List[Callable[[str, Tuple[Any, ...]], None]] = []
+        
+        # Reentrant so locked methods can call each other
+        self._user_locks = [threading.RLock() for _ in range(self.lock_stripes)]
+        
+        # Taken after a user lock to update the company -> users index; readers
+        # hold every user lock instead, which already excludes all writers
+        self._index_lock = threading.Lock()
+        
+        # Decision cache of each lock stripe, least recently used first
+        # Format: [OrderedDict{(user_id, company_id): (user version, catalog version, (access_granted, reason))}]
+        self._decision_caches: List[OrderedDict] = [OrderedDict() for _ in range(self.lock_stripes)]
+        self._stripe_cache_size = max(1, DECISION_CACHE_SIZE // self.lock_stripes)
+        
+        # Decision cache hits and misses of each lock stripe
+        # Format: [[hits, misses]]
+        self._cache_counters = [[0, 0] for _ in range(self.lock_stripes)]
+        
+        # Version of each user's history and of the catalog, bumped whenever
+        # a decision about them may change; users are never removed so a
+        # re-added user cannot match entries of the deleted one
+        # Format: {user_id: version}
+        self._user_versions: Dict[str, int] = {}
+        self._catalog_version = 0
+        
+        # Mutations recorded, and users whose COI index needs rebuilding,
+        # while a batch is applied; None outside of apply_batch
+        # Format: [(operation, args)], {user_id}
+        self._batch_mutations: Optional[List[Tuple[str, Tuple[Any, ...]]]] = None
+        self._stale_user_indexes: Optional[Set[str]] = None
+    
+    def _user_lock(self, user_id: str) -> threading.RLock:
+        """Get the lock guarding a user's history"""
+        return self._user_locks[hash(user_id) % self.lock_stripes]
+    
+    @contextmanager
+    def lock_all(self) -> Iterator[None]:
+        """Hold every user lock, so no other thread can use the model"""
+        for lock in self._user_locks:
+            lock.acquire()
+        try:
+            yield
+        finally:
+            for lock in reversed(self._user_locks):
+                lock.release()
+    
+    @contextmanager
+    def _lock_users(self, user_ids: Iterable[str]) -> Iterator[None]:
+        """Hold the locks of several users"""
+        stripes = sorted({hash(user_id) % self.lock_stripes for user_id in user_ids})
+        for stripe in stripes:
+            self._user_locks[stripe].acquire()
+        try:
+            yield
+        finally:
+            for stripe in reversed(stripes):
+                self._user_locks[stripe].release()
+    
+    def add_mutation_listener(self, listener: Callable[[str, Tuple[Any, ...]], None]) -> None:
+        """
+        Register a callback invoked as listener(operation, args) after each mutation.
+        operation is the name of the public model method and args its arguments,
+        so calling getattr(model, operation)(*args) replays the mutation.
+        """
+        self._mutation_listeners.append(listener)
     
+    def remove_mutation_listener(self, listener: Callable[[str, Tuple[Any, ...]], None]) -> None:
+        """Unregister a mutation callback"""
+        if listener in self._mutation_listeners:
+            self._mutation_listeners.remove(listener)
+    
+    def _record_mutation(self, operation: str, *args: Any) -> None:
+        """Notify the mutation listeners, or keep the mutation for the batch being applied"""
+        if self._batch_mutations is not None:
+            self._batch_mutations.append((operation, args))
+            return
+        for listener in self._mutation_listeners:
+            listener(operation, args)
+    
+    @contextmanager
+    def batch(self) -> Iterator[ModelBatch]:
+        """
+        Stage mutations on the yielded ModelBatch and apply them together when the
+        with block exits (see apply_batch); nothing is applied if the block raises
+        """
+        staged = ModelBatch()
+        yield staged
+        staged.results = self.apply_batch(staged.operations)
+    
+    @exclusive
+    def apply_batch(self, operations: Iterable[Sequence[Any]]) -> List[Any]:
+        """
+        Apply (operation, args) mutations in order while holding every lock, so no
+        other thread sees part of them. COI indexes of affected users are rebuilt
+        once at the end, and the listeners get a single "apply_batch" mutation
+        listing the changes that took effect.
+        Returns: [result] - what each model method returned
+        """
+        operations = [(operation, tuple(args)) for operation, args in operations]
+        for operation, _ in operations:
+            if operation not in BATCH_OPERATIONS:
+                raise ValueError(f"Operation '{operation}' cannot be batched")
+        
+        applied: List[Tuple[str, Tuple[Any, ...]]] = []
+        self._batch_mutations, self._stale_user_indexes = applied, set()
+        try:
+            return [getattr(self, operation)(*args) for operation, args in operations]
+        finally:
+            stale = self._stale_user_indexes
+            self._batch_mutations = self._stale_user_indexes = None
+            for user_id in stale:
+                if user_id in self.user_access_history:
+                    self._rebuild_user_coi_index(user_id)
+            if applied:
+                self._record_mutation("apply_batch", applied)
+    
+    @exclusive
     def add_coi_class(self, coi_class_id: str, name: str) -> bool:
         """Add a new conflict of interest class"""
         if coi_class_id not in self.coi_classes:
             self.coi_classes[coi_class_id] = {}
+            self._record_mutation("add_coi_class", coi_class_id, name)
             return True
         return False
     
+    @exclusive
+    def delete_coi_class(self, coi_class_id: str) -> bool:
+        """Delete an empty conflict of interest class"""
+        if coi_class_id not in self.coi_classes or self.coi_classes[coi_class_id]:
+            return False
+        
+        del self.coi_classes[coi_class_id]
+        self._record_mutation("delete_coi_class", coi_class_id)
+        return True
+    
+    @exclusive
     def add_company(self, company_id: str, name: str, coi_class_id: str) -> bool:
         """Add a new company to a conflict of interest class"""
         if coi_class_id not in self.coi_classes:
             return False
         
-        if company_id not in self.coi_classes[coi_class_id]:
-            self.coi_classes[coi_class_id][company_id] = {}
+        if company_id not in self.companies:
+            company_objects: Dict[str, str] = {}
+            self.coi_classes[coi_class_id][company_id] = company_objects
+            self.company_objects[company_id] = company_objects
             self.companies[company_id] = {"name": name, "coi_class": coi_class_id}
+            self._catalog_version += 1
+            self._record_mutation("add_company", company_id, name, coi_class_id)
             return True
         return False
     
+    @exclusive
     def add_object(self, company_id: str, object_id: str, object_data: str) -> bool:
         """Add a new object to a company dataset"""
-        for coi_class_id, companies in self.coi_classes.items():
-            if company_id in companies:
-                self.coi_classes[coi_class_id][company_id][object_id] = object_data
-                return True
-        return False
+        company_objects = self.company_objects.get(company_id)
+        if company_objects is None:
+            return False
+        company_objects[object_id] = object_data
+        self._record_mutation("add_object", company_id, object_id, object_data)
+        return True
+    
+    @exclusive
+    def add_objects(self, objects: Iterable[Tuple[str, str, str]]) -> int:
+        """
+        Bulk-load (company_id, object_id, object_data) tuples
+        Returns: int - number of objects stored; objects of unknown companies are skipped
+        """
+        company_objects = self.company_objects
+        stored = []
+        for company_id, object_id, object_data in objects:
+            objects_of_company = company_objects.get(company_id)
+            if objects_of_company is not None:
+                objects_of_company[object_id] = object_data
+                stored.append((company_id, object_id, object_data))
+        
+        if stored:
+            self._record_mutation("add_objects", stored)
+        return len(stored)
+    
+    @exclusive
+    def update_object(self, company_id: str, object_id: str, object_data: str) -> bool:
+        """Replace the data of an existing object"""
+        company_objects = self.company_objects.get(company_id)
+        if company_objects is None or object_id not in company_objects:
+            return False
+        company_objects[object_id] = object_data
+        self._record_mutation("update_object", company_id, object_id, object_data)
+        return True
     
+    @exclusive
+    def delete_object(self, company_id: str, object_id: str) -> bool:
+        """Delete an object from a company dataset"""
+        company_objects = self.company_objects.get(company_id)
+        if company_objects is None or object_id not in company_objects:
+            return False
+        del company_objects[object_id]
+        self._record_mutation("delete_object", company_id, object_id)
+        return True
+    
+    @exclusive
     def add_user(self, user_id: str, name: str, role: str = "standard") -> bool:
         """Add a new user to the system"""
         if user_id not in self.users:
             self.users[user_id] = {"name": name, "role": role}
-            self.user_access_history[user_id] = {}
+            self._init_user_history(user_id)
+            self._history_changed(user_id)
+            self._record_mutation("add_user", user_id, name, role)
             return True
         return False
     
+    @exclusive
+    def update_user(self, user_id: str, name: str, role: str) -> bool:
+        """Change a user's name and role"""
+        if user_id not in self.users:
+            return False
+        
+        self.users[user_id]["name"] = name
+        self.users[user_id]["role"] = role
+        self._record_mutation("update_user", user_id, name, role)
+        return True
+    
     def can_access(self, user_id: str, company_id: str, object_id: Optional[str] = None) -> Tuple[bool, str]:
         """
         Check if a user can access a company's data based on Chinese Wall rules
         Returns: (bool, str) - (access_granted, reason)
         """
+        # The user's lock is taken inline rather than with @per_user on this hot path
+        stripe = hash(user_id) % self.lock_stripes
+        with self._user_locks[stripe]:
+            cache = self._decision_caches[stripe]
+            key = (user_id, company_id)
+            user_version = self._user_versions.get(user_id, 0)
+            entry = cache.get(key)
+            if entry is not None and entry[0] == user_version and entry[1] == self._catalog_version:
+                cache.move_to_end(key)
+                self._cache_counters[stripe][0] += 1
+                return entry[2]
+            
+            self._cache_counters[stripe][1] += 1
+            reason_code, accessed_company_id = self._decide(user_id, company_id)
+            result = (reason_code in GRANTED_REASONS, self.format_reason(reason_code, accessed_company_id))
+            cache[key] = (user_version, self._catalog_version, result)
+            if len(cache) > self._stripe_cache_size:
+                cache.popitem(last=False)
+        return result
+    
+    def _decide(self, user_id: str, company_id: str) -> Tuple[int, Optional[str]]:
+        """
+        Apply the Chinese Wall rules to a (user, company) pair
+        Returns: (int, str) - (reason code, conflicting or previously accessed company)
+        """
         # Check if user exists
         if user_id not in self.users:
-            return False, "User does not exist"
+            return REASON_UNKNOWN_USER, None
         
         # Check if company exists
-        if company_id not in self.companies:
-            return False, "Company does not exist"
+        company_info = self.companies.get(company_id)
+        if company_info is None:
+            return REASON_UNKNOWN_COMPANY, None
         
         # Get the COI class of the requested company
-        requested_coi_class = self.companies[company_id]["coi_class"]
+        requested_coi_class = company_info["coi_class"]
+        
+        # Look up the company the user has accessed in the same COI class
+        accessed_company_id = self._accessed_company_in_class(user_id, requested_coi_class, company_id)
+        
+        if accessed_company_id is None:
+            # No conflicts found, access is allowed
+            return REASON_NO_CONFLICT, None
+        
+        if accessed_company_id == company_id:
+            # User has already accessed this company, so access is allowed
+            return REASON_PREVIOUSLY_ACCESSED, company_id
+        
+        # User has accessed a different company in the same COI class
+        return REASON_CONFLICT, accessed_company_id
+    
+    def format_reason(self, reason_code: int, company_id: Optional[str] = None,
+                      company_name: Optional[str] = None) -> str:
+        """Turn a reason code into the message shown to users"""
+        if reason_code == REASON_NO_CONFLICT:
+            return "Access granted - no conflicts"
+        if reason_code == REASON_PREVIOUSLY_ACCESSED:
+            return "Access granted - previously accessed company"
+        if reason_code == REASON_CONFLICT:
+            if company_name is None:
+                company_name = self.companies.get(company_id, {}).get("name", company_id)
+            return f"Access denied - conflict with previously accessed company: {company_name}"
+        if reason_code == REASON_UNKNOWN_USER:
+            return "User does not exist"
+        return "Company does not exist"
+    
+    @exclusive
+    def can_access_many(self, user_ids: Sequence[str], company_ids: Sequence[str],
+                        with_reasons: bool = False) -> Union[np.ndarray, Tuple[np.ndarray, np.ndarray]]:
+        """
+        Check access for every (user, company) pair in one call
+        Returns: bool matrix of shape (len(user_ids), len(company_ids)), plus an
+        int8 matrix of reason codes when with_reasons is True
+        """
+        coi_positions = {coi_class_id: i for i, coi_class_id in enumerate(self.coi_classes)}
+        company_positions = {company_id: j for j, company_id in enumerate(company_ids)}
+        no_company = -1
         
-        # Check if user has accessed any company in the same COI class
-        for accessed_company_id in self.user_access_history.get(user_id, {}):
-            if accessed_company_id == company_id:
-                # User has already accessed this company, so access is allowed
-                return True, "Access granted - previously accessed company"
+        # COI column of each requested company; unknown companies use an extra empty column
+        empty_column = len(coi_positions)
+        company_coi = np.full(len(company_ids), empty_column, dtype=np.int64)
+        company_known = np.zeros(len(company_ids), dtype=bool)
+        for j, company_id in enumerate(company_ids):
+            company_info = self.companies.get(company_id)
+            if company_info is not None:
+                company_coi[j] = coi_positions[company_info["coi_class"]]
+                company_known[j] = True
+        
+        # Accessed-COI matrix: the company each user holds in each COI class,
+        # numbered by position in company_ids (or past it for other companies)
+        accessed = np.full((len(user_ids), empty_column + 1), no_company, dtype=np.int64)
+        previously_accessed = np.zeros((len(user_ids), len(company_ids)), dtype=bool)
+        user_known = np.zeros(len(user_ids), dtype=bool)
+        other_companies: Dict[str, int] = {}
+        
+        for i, user_id in enumerate(user_ids):
+            if user_id not in self.users:
+                continue
+            user_known[i] = True
             
-            accessed_company_coi_class = self.companies[accessed_company_id]["coi_class"]
-            if accessed_company_coi_class == requested_coi_class and accessed_company_id != company_id:
-                # User has accessed a different company in the same COI class
-                return False, f"Access denied - conflict with previously accessed company: {self.companies[accessed_company_id]['name']}"
+            for company_id in self.user_access_history.get(user_id, {}):
+                position = company_positions.get(company_id)
+                if position is None:
+                    position = other_companies.setdefault(company_id, len(company_ids) + len(other_companies))
+                else:
+                    previously_accessed[i, position] = True
+                
+                column = coi_positions[self.companies[company_id]["coi_class"]]
+                if accessed[i, column] == no_company:
+                    accessed[i, column] = position
+        
+        # Vectorized decision over the whole users x companies grid
+        held = accessed[:, company_coi]
+        conflict = (held != no_company) & ~previously_accessed
+        valid = user_known[:, None] & company_known[None, :]
+        granted = valid & ~conflict
         
-        # No conflicts found, access is allowed
-        return True, "Access granted - no conflicts"
+        if not with_reasons:
+            return granted
+        
+        reasons = np.full(granted.shape, REASON_NO_CONFLICT, dtype=np.int8)
+        reasons[previously_accessed] = REASON_PREVIOUSLY_ACCESSED
+        reasons[conflict] = REASON_CONFLICT
+        reasons[:, ~company_known] = REASON_UNKNOWN_COMPANY
+        reasons[~user_known, :] = REASON_UNKNOWN_USER
+        return granted, reasons
     
     def access_object(self, user_id: str, company_id: str, object_id: str, timestamp: str) -> Tuple[bool, str]:
         """
         Attempt to access an object and record the access
         Returns: (bool, str) - (access_granted, reason)
         """
-        access_granted, reason = self.can_access(user_id, company_id)
-        
-        # Record the access attempt
-        log_entry = {
-            "timestamp": timestamp,
-            "user_id": user_id,
-            "user_name": self.users.get(user_id, {}).get("name", "Unknown"),
-            "company_id": company_id,
-            "company_name": self.companies.get(company_id, {}).get("name", "Unknown"),
-            "object_id": object_id,
-            "access_granted": access_granted,
-            "reason": reason
-        }
-        self.access_logs.append(log_entry)
+        # Check and record atomically under the user's lock, taken inline on this hot path
+        with self._user_locks[hash(user_id) % self.lock_stripes]:
+            reason_code, reason_company_id = self._decide(user_id, company_id)
+            access_granted = reason_code in GRANTED_REASONS
+            
+            # Record the access attempt
+            self._append_access_log(timestamp, user_id, company_id, object_id,
+                                    access_granted, reason_code, reason_company_id)
+            
+            # If access is granted, update the user's access history
+            if access_granted:
+                self._record_access(user_id, company_id)
+                if reason_code == REASON_NO_CONFLICT:
+                    self._history_changed(user_id)
+            
+            self._record_mutation("access_object", user_id, company_id, object_id, timestamp)
+        return access_granted, self.format_reason(reason_code, reason_company_id)
+    
+    def access_objects(self, accesses: Iterable[Tuple[str, str, str, str]]) -> List[Tuple[bool, str]]:
+        """
+        Attempt a batch of (user_id, company_id, object_id, timestamp) accesses in order.
+        Repeated (user, company) pairs are decided and recorded once; every access is logged.
+        Returns: [(bool, str)] - (access_granted, reason) of each access, as access_object would
+        """
+        # Format: {(user_id, company_id): (reason code, reason company, reason text)}
+        decisions: Dict[Tuple[str, str], Tuple[int, Optional[str], str]] = {}
+        results = []
+        batch = []
         
-        # If access is granted, update the user's access history
-        if access_granted:
-            if user_id not in self.user_access_history:
-                self.user_access_history[user_id] = {}
-            self.user_access_history[user_id][company_id] = True
+        # All users of the batch stay locked so it runs atomically
+        accesses = list(accesses)
+        with self._lock_users(access[0] for access in accesses):
+            for user_id, company_id, object_id, timestamp in accesses:
+                decision = decisions.get((user_id, company_id))
+                if decision is None:
+                    reason_code, reason_company_id = self._decide(user_id, company_id)
+                    if reason_code in GRANTED_REASONS:
+                        self._record_access(user_id, company_id)
+                        if reason_code == REASON_NO_CONFLICT:
+                            self._history_changed(user_id)
+                        
+                        # Later accesses in the batch see the company as previously accessed
+                        decisions[(user_id, company_id)] = (REASON_PREVIOUSLY_ACCESSED, company_id,
+                                                            self.format_reason(REASON_PREVIOUSLY_ACCESSED))
+                        reason = self.format_reason(reason_code, reason_company_id)
+                    else:
+                        # Denials stand until the batch ends, as it never removes history
+                        reason = self.format_reason(reason_code, reason_company_id)
+                        decisions[(user_id, company_id)] = (reason_code, reason_company_id, reason)
+                else:
+                    reason_code, reason_company_id, reason = decision
+                
+                access_granted = reason_code in GRANTED_REASONS
+                self._append_access_log(timestamp, user_id, company_id, object_id,
+                                        access_granted, reason_code, reason_company_id)
+                results.append((access_granted, reason))
+                batch.append((user_id, company_id, object_id, timestamp))
+            
+            if batch:
+                self._record_mutation("access_objects", batch)
+        return results
+    
+    def _accessed_company_in_class(self, user_id: str, coi_class_id: str,
+                                   company_id: Optional[str] = None) -> Optional[str]:
+        """
+        Return the company the user has accessed in a COI class, if any.
+        company_id is returned itself when the user has already accessed it.
+        """
+        if company_id is not None and company_id in self.user_access_history.get(user_id, {}):
+            return company_id
+        return self.user_coi_index.get(user_id, {}).get(coi_class_id)
+    
+    def _record_access(self, user_id: str, company_id: str) -> None:
+        """Add a company to a user's access history"""
+        if user_id not in self.user_access_history:
+            self.user_access_history[user_id] = {}
+        self.user_access_history[user_id][company_id] = True
         
-        return access_granted, reason
+        coi_class_id = self.companies[company_id]["coi_class"]
+        self.user_coi_index.setdefault(user_id, {}).setdefault(coi_class_id, company_id)
+        with self._index_lock:
+            self.company_user_index.setdefault(company_id, set()).add(user_id)
     
     def get_company_objects(self, company_id: str) -> Dict[str, str]:
         """Get all objects for a specific company"""
-        for coi_class_id, companies in self.coi_classes.items():
-            if company_id in companies:
-                return companies[company_id]
-        return {}
-    
-    def get_user_accessible_companies(self, user_id: str) -> List[str]:
-        """Get all companies a user can access based on their history"""
-        accessible_companies = []
-        
-        # If user has no access history, they can access any company
-        if user_id not in self.user_access_history or not self.user_access_history[user_id]:
-            return list(self.companies.keys())
-        
-        # Get the COI classes the user has already accessed
-        accessed_coi_classes: Set[str] = set()
-        for company_id in self.user_access_history[user_id]:
-            accessed_coi_classes.add(self.companies[company_id]["coi_class"])
-            # User can always access companies they've already accessed
-            accessible_companies.append(company_id)
-        
-        # Add companies from COI classes the user hasn't accessed yet
+        return self.company_objects.get(company_id, {})
+    
+    def get_user_accessible_companies(self, user_id: str) -> AccessibleCompaniesView:
+        """
+        Get a live set of the companies a user can access based on their history.
+        Membership is one decision; it follows the user's accesses and catalog changes.
+        """
+        return AccessibleCompaniesView(self, user_id)
+    
+    @per_user
+    def get_company_access_by_class(self, user_id: str) -> Dict[str, List[Tuple[str, str, bool, str]]]:
+        """
+        Decide every company for one user in a single pass over the catalog.
+        Only companies in COI classes the user holds need a history lookup.
+        Returns: {coi_class_id: [(company_id, company_name, access_granted, reason)]} in catalog order
+        """
+        by_class: Dict[str, List[Tuple[str, str, bool, str]]] = {coi_class_id: [] for coi_class_id in self.coi_classes}
+        if user_id not in self.users:
+            reason = self.format_reason(REASON_UNKNOWN_USER)
+            for company_id, company_info in self.companies.items():
+                by_class[company_info["coi_class"]].append((company_id, company_info["name"], False, reason))
+            return by_class
+        
+        granted_reason = self.format_reason(REASON_NO_CONFLICT)
+        held = set(self._held_coi_classes(user_id))
         for company_id, company_info in self.companies.items():
-            if company_info["coi_class"] not in accessed_coi_classes and company_id not in accessible_companies:
-                accessible_companies.append(company_id)
+            coi_class_id = company_info["coi_class"]
+            if coi_class_id not in held:
+                by_class[coi_class_id].append((company_id, company_info["name"], True, granted_reason))
+                continue
+            
+            accessed_company_id = self._accessed_company_in_class(user_id, coi_class_id, company_id)
+            reason_code = REASON_PREVIOUSLY_ACCESSED if accessed_company_id == company_id else REASON_CONFLICT
+            by_class[coi_class_id].append((company_id, company_info["name"], reason_code in GRANTED_REASONS,
+                                           self.format_reason(reason_code, accessed_company_id)))
+        return by_class
+    
+    @exclusive
+    def get_company_users(self, company_id: str) -> List[str]:
+        """Get the users whose access history includes a company, i.e. who are walled in by it"""
+        return list(self._company_users(company_id))
+    
+    @exclusive
+    def check_company_users(self) -> List[str]:
+        """
+        Compare the company -> users index with the user access histories
+        Returns: [str] - a description of each mismatch; empty when consistent
+        """
+        expected: Dict[str, Set[str]] = {}
+        for user_id, history in self.user_access_history.items():
+            for company_id in history:
+                expected.setdefault(company_id, set()).add(user_id)
         
-        return accessible_companies
+        problems = []
+        for company_id in set(expected) | set(self.companies):
+            indexed = set(self._company_users(company_id))
+            wanted = expected.get(company_id, set())
+            for user_id in sorted(wanted - indexed):
+                problems.append(f"{company_id}: user {user_id} accessed it but is not indexed")
+            for user_id in sorted(indexed - wanted):
+                problems.append(f"{company_id}: user {user_id} is indexed but never accessed it")
+        return problems
     
     def generate_report(self) -> List[Dict[str, Any]]:
         """Generate a report of all access logs"""
         return self.access_logs
     
+    def query_access_logs(self, user_id: Optional[str] = None, company_id: Optional[str] = None,
+                          start: Optional[str] = None, end: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        Get the access logs matching all the given filters, oldest first.
+        start and end are inclusive "YYYY-MM-DD HH:MM:SS" timestamp bounds.
+        """
+        return list(self.iter_access_logs(user_id, company_id, start, end))
+    
+    def iter_access_logs(self, user_id: Optional[str] = None, company_id: Optional[str] = None,
+                         start: Optional[str] = None, end: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+        """Stream the access logs matching all the given filters, oldest first"""
+        return self.access_logs.iter_select(user_id, company_id, start, end)
+    
+    @per_user
     def reset_user_history(self, user_id: str) -> bool:
         """Reset a user's access history"""
         if user_id in self.user_access_history:
-            self.user_access_history[user_id] = {}
+            self._clear_user_history(user_id)
+            self._history_changed(user_id)
+            self._record_mutation("reset_user_history", user_id)
             return True
         return False
     
+    @per_user
+    def revoke_access(self, user_id: str, company_id: str) -> bool:
+        """Remove one company from a user's access history"""
+        if company_id not in self.user_access_history.get(user_id, {}):
+            return False
+        
+        self._forget_access(user_id, company_id)
+        self._history_changed(user_id)
+        self._record_mutation("revoke_access", user_id, company_id)
+        return True
+    
+    @exclusive
+    def find_wall_violations(self, company_id: str) -> List[Dict[str, Any]]:
+        """
+        Find the users holding a company together with others of its COI class,
+        as a move into a class they had already accessed leaves them.
+        Only the users in the company -> users index are examined.
+        Returns: [{"user_id", "company_id", "coi_class", "conflicting_companies"}]
+        """
+        company_info = self.companies.get(company_id)
+        if company_info is None:
+            return []
+        
+        coi_class_id = company_info["coi_class"]
+        violations = []
+        for user_id in self._company_users(company_id):
+            conflicting = [other_id for other_id in self.user_access_history.get(user_id, {})
+                           if other_id != company_id
+                           and self.companies.get(other_id, {}).get("coi_class") == coi_class_id]
+            if conflicting:
+                violations.append({
+                    "user_id": user_id,
+                    "company_id": company_id,
+                    "coi_class": coi_class_id,
+                    "conflicting_companies": conflicting,
+                })
+        return violations
+    
+    @exclusive
+    def revalidate_company(self, company_id: str, policy: str = REMEDIATION_REPORT) -> List[Dict[str, Any]]:
+        """
+        Re-examine the users who have accessed a company, typically after it moved to
+        another COI class, and apply a remediation policy to those now in violation
+        Returns: the find_wall_violations report, each entry with the "action" taken
+        """
+        if policy not in REMEDIATION_POLICIES:
+            raise ValueError(f"Unknown remediation policy '{policy}'")
+        
+        violations = self.find_wall_violations(company_id)
+        for violation in violations:
+            user_id = violation["user_id"]
+            if policy == REMEDIATION_REVOKE_MOVED:
+                self.revoke_access(user_id, company_id)
+                violation["action"] = f"revoked {company_id}"
+            elif policy == REMEDIATION_REVOKE_EXISTING:
+                for other_id in violation["conflicting_companies"]:
+                    self.revoke_access(user_id, other_id)
+                violation["action"] = f"revoked {', '.join(violation['conflicting_companies'])}"
+            elif policy == REMEDIATION_RESET:
+                self.reset_user_history(user_id)
+                violation["action"] = "history reset"
+            else:
+                violation["action"] = "none"
+        return violations
+    
+    @exclusive
+    def update_company(self, company_id: str, name: str, coi_class_id: str) -> bool:
+        """Rename a company and/or move it to another conflict of interest class"""
+        if company_id not in self.companies or coi_class_id not in self.coi_classes:
+            return False
+        
+        old_coi_class_id = self.companies[company_id]["coi_class"]
+        self.companies[company_id]["name"] = name
+        
+        if old_coi_class_id != coi_class_id:
+            # Move the company's objects to the new COI class
+            self.coi_classes[old_coi_class_id].pop(company_id, None)
+            self.coi_classes[coi_class_id][company_id] = self.company_objects[company_id]
+            self.companies[company_id]["coi_class"] = coi_class_id
+            
+            self._reindex_moved_company(company_id, old_coi_class_id)
+        
+        # Renames change the reasons given, moves the decisions
+        self._catalog_version += 1
+        self._record_mutation("update_company", company_id, name, coi_class_id)
+        return True
+    
+    @exclusive
+    def delete_company(self, company_id: str) -> bool:
+        """Delete a company, its objects and every reference to it in user histories"""
+        if company_id not in self.companies:
+            return False
+        
+        coi_class_id = self.companies[company_id]["coi_class"]
+        self.coi_classes.get(coi_class_id, {}).pop(company_id, None)
+        self.company_objects.pop(company_id, None)
+        del self.companies[company_id]
+        
+        self._remove_company_from_histories(company_id, coi_class_id)
+        self._catalog_version += 1
+        self._record_mutation("delete_company", company_id)
+        return True
+    
+    @exclusive
+    def delete_user(self, user_id: str) -> bool:
+        """Delete a user together with their access history"""
+        if user_id not in self.users:
+            return False
+        
+        del self.users[user_id]
+        self._drop_user_history(user_id)
+        self._history_changed(user_id)
+        self._record_mutation("delete_user", user_id)
+        return True
+    
+    def _history_changed(self, user_id: str) -> None:
+        """Invalidate the cached decisions about a user"""
+        self._user_versions[user_id] = self._user_versions.get(user_id, 0) + 1
+    
+    def decision_cache_stats(self) -> Dict[str, int]:
+        """Get the decision cache's hits, misses, entries and capacity"""
+        return {
+            "hits": sum(hits for hits, _ in self._cache_counters),
+            "misses": sum(misses for _, misses in self._cache_counters),
+            "entries": sum(len(cache) for cache in self._decision_caches),
+            "capacity": self._stripe_cache_size * self.lock_stripes,
+        }
+    
+    def close(self) -> None:
+        """Release resources held by the engine; the in-memory engine holds none"""
+    
+    @exclusive
+    def clear_access_logs(self) -> None:
+        """Delete all access log entries"""
+        self._reset_access_logs()
+        self._record_mutation("clear_access_logs")
+    
+    @exclusive
+    def clear(self) -> None:
+        """Remove all COI classes, companies, users, histories and logs"""
+        self.coi_classes = {}
+        self.companies = {}
+        self.company_objects = {}
+        self.users = {}
+        self._reset_histories()
+        self._reset_access_logs()
+        self._catalog_version += 1
+        self._record_mutation("clear")
+    
+    def _append_access_log(self, timestamp: str, user_id: str, company_id: str, object_id: str,
+                           access_granted: bool, reason_code: int, reason_company_id: Optional[str]) -> None:
+        """Store an access log entry"""
+        self.access_logs.append(timestamp, user_id, company_id, object_id,
+                                access_granted, reason_code, reason_company_id)
+    
+    def _reset_access_logs(self) -> None:
+        """Delete all stored access log entries"""
+        self.access_logs.clear()
+    
+    def _init_user_history(self, user_id: str) -> None:
+        """Create an empty access history for a new user"""
+        self.user_access_history[user_id] = {}
+        self.user_coi_index[user_id] = {}
+    
+    def _clear_user_history(self, user_id: str) -> None:
+        """Empty a user's access history"""
+        self._unindex_user(user_id)
+        self.user_access_history[user_id] = {}
+        self.user_coi_index[user_id] = {}
+    
+    def _drop_user_history(self, user_id: str) -> None:
+        """Forget the access history of a deleted user"""
+        self._unindex_user(user_id)
+        self.user_access_history.pop(user_id, None)
+        self.user_coi_index.pop(user_id, None)
+    
+    def _forget_access(self, user_id: str, company_id: str) -> None:
+        """Remove one company from a user's access history"""
+        del self.user_access_history[user_id][company_id]
+        with self._index_lock:
+            users = self.company_user_index.get(company_id)
+            if users is not None:
+                users.discard(user_id)
+                if not users:
+                    del self.company_user_index[company_id]
+        self._reindex_user(user_id)
+    
+    def _unindex_user(self, user_id: str) -> None:
+        """Remove a user from the company -> users index entries of their history"""
+        with self._index_lock:
+            for company_id in self.user_access_history.get(user_id, {}):
+                users = self.company_user_index.get(company_id)
+                if users is not None:
+                    users.discard(user_id)
+                    if not users:
+                        del self.company_user_index[company_id]
+    
+    def _reset_histories(self) -> None:
+        """Forget the access histories of all users"""
+        self.user_access_history = {}
+        self.user_coi_index = {}
+        self.company_user_index = {}
+    
+    def _company_users(self, company_id: str) -> Iterable[str]:
+        """Get the users whose access history includes a company"""
+        return self.company_user_index.get(company_id, ())
+    
+    def _reindex_moved_company(self, company_id: str, old_coi_class_id: str) -> None:
+        """Re-index the users who have accessed a company moved out of old_coi_class_id"""
+        for user_id in self.company_user_index.get(company_id, ()):
+            self._reindex_user(user_id)
+    
+    def _remove_company_from_histories(self, company_id: str, coi_class_id: str) -> None:
+        """Remove a deleted company from every user's access history"""
+        for user_id in self.company_user_index.pop(company_id, ()):
+            del self.user_access_history[user_id][company_id]
+            self._reindex_user(user_id)
+    
+    def _held_coi_classes(self, user_id: str) -> AbstractSet[str]:
+        """Get the COI classes in which a user has accessed a company"""
+        return self.user_coi_index.get(user_id, {}).keys()
+    
+    def _reindex_user(self, user_id: str) -> None:
+        """Rebuild a user's COI class index now, or once at the end of the batch being applied"""
+        if self._stale_user_indexes is not None:
+            self._stale_user_indexes.add(user_id)
+        else:
+            self._rebuild_user_coi_index(user_id)
+    
+    def _rebuild_user_coi_index(self, user_id: str) -> None:
+        """Recompute a user's COI class index from their access history"""
+        index: Dict[str, str] = {}
+        for company_id in self.user_access_history.get(user_id, {}):
+            index.setdefault(self.companies[company_id]["coi_class"], company_id)
+        self.user_coi_index[user_id] = index
+    
+    @exclusive
     def get_coi_structure(self) -> List[Dict[str, Any]]:
         """Get the structure of COI classes and companies for visualization"""
         structure = []
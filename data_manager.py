@@ -13,72 +13,74 @@ class DataManager:
     
     def initialize_sample_data(self) -> None:
         """Initialize the model with sample data for demonstration"""
-        # Create Conflict of Interest Classes
-        self.model.add_coi_class("banking", "Banking")
-        self.model.add_coi_class("oil", "Oil Companies")
-        self.model.add_coi_class("tech", "Technology Companies")
-        
-        # Add companies to Banking COI class
-        self.model.add_company("bank1", "Global Bank", "banking")
-        self.model.add_company("bank2", "National Finance", "banking")
-        self.model.add_company("bank3", "Bank Of Zambia", "banking")
-        
-        # Add companies to Oil COI class
-        self.model.add_company("oil1", "Petrol Giant", "oil")
-        self.model.add_company("oil2", "Oceanic Oil", "oil")
-        self.model.add_company("oil3", "Energy Solutions", "oil")
-        
-        # Add companies to Tech COI class
-        self.model.add_company("tech1", "MegaSoft", "tech")
-        self.model.add_company("tech2", "Fruit Computers", "tech")
-        self.model.add_company("tech3", "Search Engine Inc", "tech")
-        
-        # Add objects (data) to companies
-        # Banking data
-        self.model.add_object("bank1", "financial_report", "Annual financial report showing 12% growth")
-        self.model.add_object("bank1", "merger_plans", "Confidential plans for merger with smaller banks")
-        self.model.add_object("bank1", "customer_data", "Encrypted database of customer information")
-        
-        self.model.add_object("bank2", "investment_strategy", "Long-term investment strategy document")
-        self.model.add_object("bank2", "risk_assessment", "Risk assessment for Q3 2024")
-        self.model.add_object("bank2", "board_minutes", "Minutes from board meeting on March 1, 2024")
-        
-        self.model.add_object("bank3", "loan_portfolio", "Analysis of current loan portfolio")
-        self.model.add_object("bank3", "expansion_plans", "Plans to open 5 new branches in 2025")
-        self.model.add_object("bank3", "interest_rates", "Internal document on interest rate adjustments")
-        
-        # Oil company data
-        self.model.add_object("oil1", "drilling_report", "Report on new drilling sites in the Pacific")
-        self.model.add_object("oil1", "environmental_study", "Environmental impact study for Arctic operations")
-        self.model.add_object("oil1", "production_forecast", "Oil production forecast for next 5 years")
-        
-        self.model.add_object("oil2", "acquisition_targets", "List of potential acquisition targets")
-        self.model.add_object("oil2", "refinery_specs", "Technical specifications for new refinery")
-        self.model.add_object("oil2", "supply_contracts", "Details of supply contracts with Asian markets")
-        
-        self.model.add_object("oil3", "renewable_investment", "Investment plans for renewable energy division")
-        self.model.add_object("oil3", "executive_compensation", "Executive compensation packages")
-        self.model.add_object("oil3", "strategic_pivot", "Strategic pivot to green energy technologies")
-        
-        # Tech company data
-        self.model.add_object("tech1", "product_roadmap", "Product roadmap for next 3 years")
-        self.model.add_object("tech1", "research_budget", "R&D budget allocation for AI initiatives")
-        self.model.add_object("tech1", "competitor_analysis", "Analysis of market competitors")
-        
-        self.model.add_object("tech2", "device_specs", "Specifications for upcoming device releases")
-        self.model.add_object("tech2", "supply_chain", "Supply chain optimization strategy")
-        self.model.add_object("tech2", "patent_applications", "Recent patent applications for display technology")
-        
-        self.model.add_object("tech3", "algorithm_update", "Documentation for search algorithm update")
-        self.model.add_object("tech3", "ad_platform", "New advertising platform specifications")
-        self.model.add_object("tech3", "user_data_policy", "Internal policy on user data handling")
-        
-        # Add users
-        self.model.add_user("user1", "Nkusechela Siame", "consultant")
-        self.model.add_user("user2", "Mweetwa Nketani", "analyst")
-        self.model.add_user("user3", "Tshaka Zulu", "manager")
-        self.model.add_user("user4", "Emmanuel Mwale", "auditor")
-        self.model.add_user("admin", "Tiness Kamwale", "administrator")
+        # Apply the whole data set as one batch, so it is loaded and logged in one step
+        with self.model.batch() as batch:
+            # Create Conflict of Interest Classes
+            batch.add_coi_class("banking", "Banking")
+            batch.add_coi_class("oil", "Oil Companies")
+            batch.add_coi_class("tech", "Technology Companies")
+            
+            # Add companies to Banking COI class
+            batch.add_company("bank1", "Global Bank", "banking")
+            batch.add_company("bank2", "National Finance", "banking")
+            batch.add_company("bank3", "Bank Of Zambia", "banking")
+            
+            # Add companies to Oil COI class
+            batch.add_company("oil1", "Petrol Giant", "oil")
+            batch.add_company("oil2", "Oceanic Oil", "oil")
+            batch.add_company("oil3", "Energy Solutions", "oil")
+            
+            # Add companies to Tech COI class
+            batch.add_company("tech1", "MegaSoft", "tech")
+            batch.add_company("tech2", "Fruit Computers", "tech")
+            batch.add_company("tech3", "Search Engine Inc", "tech")
+            
+            # Add objects (data) to companies
+            # Banking data
+            batch.add_object("bank1", "financial_report", "Annual financial report showing 12% growth")
+            batch.add_object("bank1", "merger_plans", "Confidential plans for merger with smaller banks")
+            batch.add_object("bank1", "customer_data", "Encrypted database of customer information")
+            
+            batch.add_object("bank2", "investment_strategy", "Long-term investment strategy document")
+            batch.add_object("bank2", "risk_assessment", "Risk assessment for Q3 2024")
+            batch.add_object("bank2", "board_minutes", "Minutes from board meeting on March 1, 2024")
+            
+            batch.add_object("bank3", "loan_portfolio", "Analysis of current loan portfolio")
+            batch.add_object("bank3", "expansion_plans", "Plans to open 5 new branches in 2025")
+            batch.add_object("bank3", "interest_rates", "Internal document on interest rate adjustments")
+            
+            # Oil company data
+            batch.add_object("oil1", "drilling_report", "Report on new drilling sites in the Pacific")
+            batch.add_object("oil1", "environmental_study", "Environmental impact study for Arctic operations")
+            batch.add_object("oil1", "production_forecast", "Oil production forecast for next 5 years")
+            
+            batch.add_object("oil2", "acquisition_targets", "List of potential acquisition targets")
+            batch.add_object("oil2", "refinery_specs", "Technical specifications for new refinery")
+            batch.add_object("oil2", "supply_contracts", "Details of supply contracts with Asian markets")
+            
+            batch.add_object("oil3", "renewable_investment", "Investment plans for renewable energy division")
+            batch.add_object("oil3", "executive_compensation", "Executive compensation packages")
+            batch.add_object("oil3", "strategic_pivot", "Strategic pivot to green energy technologies")
+            
+            # Tech company data
+            batch.add_object("tech1", "product_roadmap", "Product roadmap for next 3 years")
+            batch.add_object("tech1", "research_budget", "R&D budget allocation for AI initiatives")
+            batch.add_object("tech1", "competitor_analysis", "Analysis of market competitors")
+            
+            batch.add_object("tech2", "device_specs", "Specifications for upcoming device releases")
+            batch.add_object("tech2", "supply_chain", "Supply chain optimization strategy")
+            batch.add_object("tech2", "patent_applications", "Recent patent applications for display technology")
+            
+            batch.add_object("tech3", "algorithm_update", "Documentation for search algorithm update")
+            batch.add_object("tech3", "ad_platform", "New advertising platform specifications")
+            batch.add_object("tech3", "user_data_policy", "Internal policy on user data handling")
+            
+            # Add users
+            batch.add_user("user1", "Nkusechela Siame", "consultant")
+            batch.add_user("user2", "Mweetwa Nketani", "analyst")
+            batch.add_user("user3", "Tshaka Zulu", "manager")
+            batch.add_user("user4", "Emmanuel Mwale", "auditor")
+            batch.add_user("admin", "Tiness Kamwale", "administrator")
     
     def add_new_company(self, company_id: str, name: str, coi_class_id: str) -> bool:
         """Add a new company to the system"""
@@ -0,0 +1,472 @@
+"""
+Headless Decision Server for the Chinese Wall Model
+Serves access decisions and report queries as JSON over a local asyncio HTTP server.
+Run with: python decision_server.py [--port PORT | --unix-socket PATH] [--workers N] [--shards N]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from itertools import groupby
+from operator import itemgetter
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from urllib.parse import parse_qsl, urlsplit
+
+from access_log import TIMESTAMP_FORMAT
+from chinese_wall_model import ChineseWallModel
+from data_manager import DataManager
+from persistence import PersistentStore
+from sharded_model import ShardedChineseWallModel
+from sqlite_model import SQLiteChineseWallModel
+
+# Largest accepted request head and body, in bytes
+MAX_HEADER_BYTES = 64 * 1024
+MAX_BODY_BYTES = 1024 * 1024
+
+# Pipelined requests a connection may have in flight before reading pauses
+PIPELINE_DEPTH = 128
+
+# Most decision requests evaluated in one batch
+MAX_BATCH = 1024
+
+STATUS_TEXT = {
+    200: "OK",
+    400: "Bad Request",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    413: "Payload Too Large",
+    500: "Internal Server Error",
+}
+
+class BadRequest(Exception):
+    """A request that cannot be served, with the HTTP status to answer it with"""
+    
+    def __init__(self, message: str, status: int = 400):
+        super().__init__(message)
+        self.status = status
+
+def required(params: Dict[str, Any], name: str) -> str:
+    """Get a required string parameter"""
+    value = params.get(name)
+    if not isinstance(value, str) or not value:
+        raise BadRequest(f"Missing parameter '{name}'")
+    return value
+
+def optional(params: Dict[str, Any], name: str) -> Optional[str]:
+    """Get an optional string parameter"""
+    value = params.get(name)
+    if value is not None and not isinstance(value, str):
+        raise BadRequest(f"Parameter '{name}' must be a string")
+    return value
+
+class DecisionBatcher:
+    """
+    Coalesces concurrent can_access and access_object requests into batches.
+
+    A request arriving while no batch is running is evaluated at once; those
+    arriving meanwhile queue up and are evaluated together when it finishes,
+    in one worker call. Within a batch, identical (user, company) checks are
+    decided once, and access runs go through ChineseWallModel.access_objects,
+    which takes the users' locks once, decides and records each pair once but
+    still logs every object access. Requests are evaluated in arrival order.
+    """
+    
+    def __init__(self, model: ChineseWallModel, executor: ThreadPoolExecutor):
+        self.model = model
+        self.executor = executor
+        
+        # Counters of evaluated batches and the requests in them
+        self.batches = 0
+        self.requests = 0
+        
+        # Requests waiting for the next batch
+        # Format: [(kind, args, future)], kind is "check" or "access"
+        self._pending: List[Tuple[str, Tuple[str, ...], asyncio.Future]] = []
+        self._running = False
+    
+    def submit(self, kind: str, args: Tuple[str, ...]) -> "asyncio.Future":
+        """Queue a "check" (user_id, company_id) or "access" (user_id, company_id, object_id, timestamp)"""
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((kind, args, future))
+        if not self._running:
+            self._running = True
+            asyncio.ensure_future(self._run_batches())
+        return future
+    
+    async def _run_batches(self) -> None:
+        """Evaluate queued requests batch by batch until none are left"""
+        loop = asyncio.get_running_loop()
+        try:
+            while self._pending:
+                batch = self._pending[:MAX_BATCH]
+                del self._pending[:MAX_BATCH]
+                
+                results = await loop.run_in_executor(
+                    self.executor, self._evaluate, [(kind, args) for kind, args, _ in batch])
+                for (_, _, future), result in zip(batch, results):
+                    if not future.done():
+                        future.set_result(result)
+        finally:
+            self._running = False
+    
+    def _evaluate(self, batch: List[Tuple[str, Tuple[str, ...]]]) -> List[Tuple[int, Any]]:
+        """Evaluate a batch on a worker thread, returning (status, payload) for each request"""
+        results: List[Tuple[int, Any]] = []
+        self.batches += 1
+        self.requests += len(batch)
+        
+        # Consecutive requests of one kind are evaluated together
+        for kind, group in groupby(batch, key=itemgetter(0)):
+            run = [args for _, args in group]
+            run_start = len(results)
+            try:
+                if kind == "access":
+                    results.extend((200, {"granted": granted, "reason": reason})
+                                   for granted, reason in self.model.access_objects(run))
+                else:
+                    checks: Dict[Tuple[str, ...], Tuple[int, Any]] = {}
+                    for pair in run:
+                        result = checks.get(pair)
+                        if result is None:
+                            allowed, reason = self.model.can_access(*pair)
+                            result = checks[pair] = (200, {"allowed": allowed, "reason": reason})
+                        results.append(result)
+            except Exception as error:
+                del results[run_start:]
+                results.extend([(500, {"error": f"{type(error).__name__}: {error}"})] * len(run))
+        return results
+
+class DecisionServer:
+    """
+    Asyncio HTTP/1.1 server answering JSON requests against a ChineseWallModel.
+
+    Connections are kept alive and may pipeline requests: the next request is
+    read while the previous one is being served, and responses are written in
+    request order. Model calls run on a pool of worker threads so slow report
+    queries do not stall other connections or decisions; the model's per-user
+    locks keep them consistent. Decision requests are coalesced into batches
+    by a DecisionBatcher.
+
+    Endpoints:
+        POST /can_access            {user_id, company_id}
+        POST /access_object         {user_id, company_id, object_id, timestamp?}
+        POST /access_objects        {accesses: [{user_id, company_id, object_id, timestamp?}]}
+        GET  /accessible_companies  ?user_id=
+        GET  /access_logs           ?user_id=&company_id=&start=&end=
+        GET  /summary               ?user_id=&company_id=&start=&end=
+        GET  /health
+    """
+    
+    def __init__(self, model: ChineseWallModel, workers: int = 4, keep_alive_timeout: float = 15.0):
+        self.model = model
+        self.workers = workers
+        self.keep_alive_timeout = keep_alive_timeout
+        
+        # Decision endpoints, evaluated by the batcher
+        # Format: {(method, path): parser(params) -> (kind, args)}
+        self.decision_routes: Dict[Tuple[str, str], Callable[[Dict[str, Any]], Tuple[str, Tuple[str, ...]]]] = {
+            ("POST", "/can_access"): self.parse_can_access,
+            ("POST", "/access_object"): self.parse_access_object,
+        }
+        
+        # Format: {(method, path): handler(params) -> JSON-serializable result}
+        self.routes: Dict[Tuple[str, str], Callable[[Dict[str, Any]], Any]] = {
+            ("POST", "/access_objects"): self.handle_access_objects,
+            ("GET", "/accessible_companies"): self.handle_accessible_companies,
+            ("GET", "/access_logs"): self.handle_access_logs,
+            ("GET", "/summary"): self.handle_summary,
+            ("GET", "/health"): self.handle_health,
+        }
+        
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._batcher: Optional[DecisionBatcher] = None
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._unix_path: Optional[str] = None
+    
+    async def start(self, host: str = "127.0.0.1", port: int = 8080, unix_path: Optional[str] = None) -> None:
+        """Start listening on a TCP port, or on a Unix socket if unix_path is given"""
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="decision-worker")
+        self._batcher = DecisionBatcher(self.model, self._executor)
+        self._unix_path = unix_path
+        if unix_path is not None:
+            self._server = await asyncio.start_unix_server(self._serve_connection, path=unix_path,
+                                                           limit=MAX_HEADER_BYTES)
+        else:
+            self._server = await asyncio.start_server(self._serve_connection, host, port, limit=MAX_HEADER_BYTES)
+    
+    @property
+    def port(self) -> Optional[int]:
+        """The TCP port being listened on, or None for a Unix socket"""
+        address = self._server.sockets[0].getsockname()
+        return address[1] if isinstance(address, tuple) else None
+    
+    async def serve_forever(self) -> None:
+        """Serve until cancelled"""
+        async with self._server:
+            await self._server.serve_forever()
+    
+    async def stop(self) -> None:
+        """Stop accepting connections and wait for the workers to finish"""
+        if self._server is None:
+            return
+        self._server.close()
+        await self._server.wait_closed()
+        self._executor.shutdown(wait=True)
+        if self._unix_path is not None and os.path.exists(self._unix_path):
+            os.remove(self._unix_path)
+    
+    def parse_can_access(self, params: Dict[str, Any]) -> Tuple[str, Tuple[str, ...]]:
+        """Check an access without recording it"""
+        return "check", (required(params, "user_id"), required(params, "company_id"))
+    
+    def parse_access_object(self, params: Dict[str, Any]) -> Tuple[str, Tuple[str, ...]]:
+        """Decide and record an object access"""
+        return "access", self._access_args(params)
+    
+    def handle_access_objects(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        """Decide and record a batch of object accesses in order"""
+        accesses = params.get("accesses")
+        if not isinstance(accesses, list) or not all(isinstance(access, dict) for access in accesses):
+            raise BadRequest("Parameter 'accesses' must be a list of objects")
+        results = self.model.access_objects([self._access_args(access) for access in accesses])
+        return {"results": [{"granted": granted, "reason": reason} for granted, reason in results]}
+    
+    def handle_accessible_companies(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        """List the companies a user may access"""
+        user_id = required(params, "user_id")
+        if user_id not in self.model.users:
+            raise BadRequest(f"Unknown user '{user_id}'", 404)
+        return {"companies": list(self.model.get_user_accessible_companies(user_id))}
+    
+    def handle_access_logs(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        """Get the access log entries matching the given filters"""
+        return {"logs": self.model.query_access_logs(*self._log_filters(params))}
+    
+    def handle_summary(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        """Count granted and denied accesses matching the given filters"""
+        total = granted = 0
+        for log in self.model.iter_access_logs(*self._log_filters(params)):
+            total += 1
+            if log["access_granted"]:
+                granted += 1
+        return {"total": total, "granted": granted, "denied": total - granted}
+    
+    def handle_health(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        """Report that the server is up"""
+        return {"status": "ok", "users": len(self.model.users), "companies": len(self.model.companies),
+                "decision_cache": self.model.decision_cache_stats(),
+                "decision_batches": self._batcher.batches, "decision_requests": self._batcher.requests}
+    
+    @staticmethod
+    def _access_args(params: Dict[str, Any]) -> Tuple[str, str, str, str]:
+        """Get the (user_id, company_id, object_id, timestamp) of an access request"""
+        timestamp = optional(params, "timestamp") or datetime.now().strftime(TIMESTAMP_FORMAT)
+        return (required(params, "user_id"), required(params, "company_id"),
+                required(params, "object_id"), timestamp)
+    
+    @staticmethod
+    def _log_filters(params: Dict[str, Any]) -> Tuple[Optional[str], ...]:
+        """Get the (user_id, company_id, start, end) log filters of a request"""
+        filters = tuple(optional(params, name) for name in ("user_id", "company_id", "start", "end"))
+        for bound in filters[2:]:
+            if bound is not None:
+                try:
+                    datetime.fromisoformat(bound)
+                except ValueError:
+                    raise BadRequest(f"Invalid timestamp bound '{bound}'")
+        return filters
+    
+    async def _serve_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """Read requests from a connection and answer them in order"""
+        # Responses of pipelined requests still being served, in request order;
+        # bounded so a client cannot queue unlimited work
+        responses: asyncio.Queue = asyncio.Queue(maxsize=PIPELINE_DEPTH)
+        sender = asyncio.ensure_future(self._send_responses(responses, writer))
+        try:
+            while True:
+                try:
+                    request = await asyncio.wait_for(self._read_request(reader), self.keep_alive_timeout)
+                except (asyncio.TimeoutError, asyncio.IncompleteReadError, ConnectionError):
+                    break
+                except BadRequest as error:
+                    # The stream position is unknown after a malformed request
+                    await responses.put((self._completed((error.status, {"error": str(error)})), False))
+                    break
+                if request is None:
+                    break
+                
+                method, target, keep_alive, body = request
+                await responses.put((self._dispatch(method, target, body), keep_alive))
+                if not keep_alive:
+                    break
+        finally:
+            await responses.put(None)
+            await sender
+            writer.close()
+    
+    async def _send_responses(self, responses: asyncio.Queue, writer: asyncio.StreamWriter) -> None:
+        """Write responses as they complete, in request order, until None is queued"""
+        connected = True
+        while True:
+            item = await responses.get()
+            if item is None:
+                return
+            
+            # Requests are still served after the client goes away, but not answered
+            result, keep_alive = item
+            status, payload = await result
+            if not connected:
+                continue
+            
+            body = json.dumps(payload).encode("utf-8")
+            writer.write(f"HTTP/1.1 {status} {STATUS_TEXT[status]}\r\n"
+                         f"Content-Type: application/json\r\n"
+                         f"Content-Length: {len(body)}\r\n"
+                         f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode("latin-1") + body)
+            
+            # Flush once the pipeline is drained, so pipelined responses share writes
+            if responses.empty():
+                try:
+                    await writer.drain()
+                except ConnectionError:
+                    connected = False
+    
+    async def _read_request(self, reader: asyncio.StreamReader) -> Optional[Tuple[str, str, bool, bytes]]:
+        """
+        Read one request from a connection
+        Returns: (method, target, keep_alive, body), or None at end of stream
+        """
+        try:
+            head = await reader.readuntil(b"\r\n\r\n")
+        except asyncio.IncompleteReadError as error:
+            if not error.partial.strip():
+                return None
+            raise
+        except asyncio.LimitOverrunError:
+            raise BadRequest("Request head too large", 413)
+        
+        lines = head.decode("latin-1").split("\r\n")
+        try:
+            method, target, version = lines[0].split(" ")
+        except ValueError:
+            raise BadRequest("Malformed request line")
+        
+        headers = {}
+        for line in lines[1:]:
+            if line:
+                name, _, value = line.partition(":")
+                headers[name.strip().lower()] = value.strip()
+        
+        connection = headers.get("connection", "").lower()
+        keep_alive = connection != "close" if version == "HTTP/1.1" else connection == "keep-alive"
+        
+        try:
+            length = int(headers.get("content-length", "0"))
+        except ValueError:
+            raise BadRequest("Invalid Content-Length")
+        if length < 0 or length > MAX_BODY_BYTES:
+            raise BadRequest("Request body too large", 413)
+        body = await reader.readexactly(length) if length else b""
+        return method, target, keep_alive, body
+    
+    def _dispatch(self, method: str, target: str, body: bytes) -> "asyncio.Future":
+        """Start serving a request, returning a future of (status, payload)"""
+        url = urlsplit(target)
+        parser = self.decision_routes.get((method, url.path))
+        handler = self.routes.get((method, url.path))
+        if parser is None and handler is None:
+            if any(path == url.path for _, path in list(self.routes) + list(self.decision_routes)):
+                return self._completed((405, {"error": f"Method {method} not allowed"}))
+            return self._completed((404, {"error": f"Unknown path '{url.path}'"}))
+        
+        params: Dict[str, Any] = dict(parse_qsl(url.query))
+        if body:
+            try:
+                data = json.loads(body)
+            except ValueError:
+                return self._completed((400, {"error": "Request body is not valid JSON"}))
+            if not isinstance(data, dict):
+                return self._completed((400, {"error": "Request body must be a JSON object"}))
+            params.update(data)
+        
+        if parser is not None:
+            try:
+                kind, args = parser(params)
+            except BadRequest as error:
+                return self._completed((error.status, {"error": str(error)}))
+            return self._batcher.submit(kind, args)
+        return asyncio.get_running_loop().run_in_executor(self._executor, self._call, handler, params)
+    
+    def _call(self, handler: Callable[[Dict[str, Any]], Any], params: Dict[str, Any]) -> Tuple[int, Any]:
+        """Run an endpoint handler on a worker thread"""
+        try:
+            return 200, handler(params)
+        except BadRequest as error:
+            return error.status, {"error": str(error)}
+        except Exception as error:
+            return 500, {"error": f"{type(error).__name__}: {error}"}
+    
+    @staticmethod
+    def _completed(result: Tuple[int, Any]) -> "asyncio.Future":
+        """Wrap an immediate result in a future"""
+        future = asyncio.get_running_loop().create_future()
+        future.set_result(result)
+        return future
+
+def load_model(data_dir: str, database_path: Optional[str] = None, shards: int = 0
+               ) -> Tuple[ChineseWallModel, Optional[PersistentStore]]:
+    """Open the model the same way the GUI does, loading sample data if there is none"""
+    if database_path:
+        model = SQLiteChineseWallModel(database_path)
+        store = None
+        has_data = bool(model.users)
+    else:
+        model = ShardedChineseWallModel(shards) if shards else ChineseWallModel()
+        model.access_logs.spill_to(os.path.join(data_dir, "access_logs"))
+        store = PersistentStore(model, data_dir)
+        has_data = store.open()
+    if not has_data:
+        DataManager(model).initialize_sample_data()
+    return model, store
+
+async def run(args: argparse.Namespace) -> None:
+    """Serve until interrupted"""
+    model, store = load_model(args.data_dir, args.database, args.shards)
+    server = DecisionServer(model, workers=args.workers)
+    try:
+        await server.start(args.host, args.port, args.unix_socket)
+        print(f"Serving on {args.unix_socket or f'http://{args.host}:{server.port}'} "
+              f"with {args.workers} workers")
+        await server.serve_forever()
+    finally:
+        await server.stop()
+        if store is not None:
+            store.close()
+        model.close()
+
+def main():
+    """Main entry point for the decision server"""
+    parser = argparse.ArgumentParser(description="Chinese Wall Model decision server")
+    parser.add_argument("--host", default="127.0.0.1", help="address to listen on (default: 127.0.0.1)")
+    parser.add_argument("--port", type=int, default=8080, help="TCP port to listen on (default: 8080)")
+    parser.add_argument("--unix-socket", help="listen on this Unix socket instead of TCP")
+    parser.add_argument("--workers", type=int, default=4, help="worker threads for model calls (default: 4)")
+    parser.add_argument("--data-dir", default=os.environ.get(
+        "CHINESE_WALL_DATA_DIR", os.path.join(os.path.expanduser("~"), ".chinese_wall")),
+        help="directory of the write-ahead log and snapshots")
+    parser.add_argument("--database", default=os.environ.get("CHINESE_WALL_DATABASE"),
+                        help="run on this SQLite database instead of the in-memory engine")
+    parser.add_argument("--shards", type=int, default=int(os.environ.get("CHINESE_WALL_SHARDS", "0")),
+                        help="partition users over this many worker processes (default: 0, in-process)")
+    args = parser.parse_args()
+    
+    try:
+        asyncio.run(run(args))
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
@@ -5,9 +5,11 @@ Main GUI Application for Chinese Wall Model Demonstration
 import tkinter as tk
 from tkinter import ttk, messagebox
 import matplotlib
+import os
 import traceback
 import sys
 import time
+from collections import OrderedDict
 from typing import Optional, Callable, Any
 from PIL import Image, ImageTk
 
@@ -15,14 +17,31 @@ matplotlib.use('TkAgg')  # Set the backend for matplotlib
 
 from chinese_wall_model import ChineseWallModel
 from data_manager import DataManager
+from persistence import PersistentStore
+from sharded_model import ShardedChineseWallModel
+from sqlite_model import SQLiteChineseWallModel
+from change_events import TkChangeEventBus
 from report_generator import ReportGenerator
-from utils import center_window, create_tooltip, explain_chinese_wall
+from utils import center_window, create_tooltip, explain_chinese_wall, BackgroundExecutor
 from login_screen import LoginScreen
 from main_dashboard import MainDashboard
 from report_screen import ReportScreen
 from admin_screen import AdminScreen
 from help_screen import HelpScreen
 
+# Directory holding the write-ahead log and snapshots
+DATA_DIR = os.environ.get("CHINESE_WALL_DATA_DIR",
+                          os.path.join(os.path.expanduser("~"), ".chinese_wall"))
+
+# SQLite database to run the model on instead of the in-memory engine, if set
+DATABASE_PATH = os.environ.get("CHINESE_WALL_DATABASE")
+
+# Number of worker processes to partition users over, or 0 to run in-process
+SHARDS = int(os.environ.get("CHINESE_WALL_SHARDS", "0"))
+
+# Number of screens kept alive, hidden, while another one is shown
+MAX_CACHED_SCREENS = 3
+
 class SplashScreen:
     def __init__(self, root):
         self.root = root
@@ -99,7 +118,12 @@ class ChineseWallApp:
         try:
             # Set up the model and related components
             splash.update_progress(20, "Initializing model...")
-            self.model = ChineseWallModel()
+            if DATABASE_PATH:
+                self.model = SQLiteChineseWallModel(DATABASE_PATH)
+            elif SHARDS:
+                self.model = ShardedChineseWallModel(SHARDS)
+            else:
+                self.model = ChineseWallModel()
             
             splash.update_progress(40, "Setting up data manager...")
             self.data_manager = DataManager(self.model)
@@ -107,9 +131,25 @@ class ChineseWallApp:
             splash.update_progress(60, "Setting up report generator...")
             self.report_generator = ReportGenerator(self.model)
             
-            # Initialize sample data
-            splash.update_progress(80, "Loading sample data...")
-            self.data_manager.initialize_sample_data()
+            # Restore saved state, or start from the sample data
+            splash.update_progress(80, "Loading data...")
+            if DATABASE_PATH:
+                self.store = None
+                has_data = bool(self.model.users)
+            else:
+                # Keep a bounded tail of the access log in memory
+                self.model.access_logs.spill_to(os.path.join(DATA_DIR, "access_logs"))
+                self.store = PersistentStore(self.model, DATA_DIR)
+                has_data = self.store.open()
+            if not has_data:
+                self.data_manager.initialize_sample_data()
+            self.root.protocol("WM_DELETE_WINDOW", self.on_close)
+            
+            # Deliver model changes to the screens once per idle cycle
+            self.events = TkChangeEventBus(self.root, self.model)
+            
+            # Run long operations off the Tk thread
+            self.executor = BackgroundExecutor(self.root)
             
             # Set up styles
             splash.update_progress(90, "Setting up UI...")
@@ -122,6 +162,11 @@ class ChineseWallApp:
             self.current_user = None
             self.current_frame = None
             
+            # Screens of the logged in user, hidden rather than destroyed when another one is
+            # shown; they keep themselves up to date from change events. Least recently shown first.
+            # Format: {screen name: frame}
+            self.screens = OrderedDict()
+            
             # Create status bar
             self.create_status_bar()
             
@@ -132,7 +177,7 @@ class ChineseWallApp:
             
             # Start with the login screen
             self.show_login_screen()
-            
+        
         except Exception as e:
             splash.destroy()
             self.handle_exception("Initialization Error", e)
@@ -402,7 +447,7 @@ class ChineseWallApp:
                            foreground=light_text_color,
                            background='#e0e0e0',
                            padding=2)
-            
+        
         except Exception as e:
             self.handle_exception("Style Setup Error", e)
     
@@ -444,15 +489,63 @@ class ChineseWallApp:
         self.time_var.set(f"{current_date} {current_time}")
         self.root.after(1000, self.update_time)
     
+    def on_close(self):
+        """Save pending changes and close the application"""
+        self.executor.shutdown()
+        self.events.close()
+        if self.store is not None:
+            self.store.close()
+        self.model.close()
+        self.root.destroy()
+    
     def update_status(self, message):
         """Update the status bar message"""
         self.status_message.set(message)
     
+    def show_screen(self, name: str, create_screen: Callable[[], ttk.Frame]) -> None:
+        """Show a cached screen, or create it, hiding the current one"""
+        self.hide_current_frame()
+        
+        screen = self.screens.pop(name, None)
+        if screen is None:
+            screen = create_screen()
+            if self.current_frame is not None:
+                # The screen navigated elsewhere while being created, as the admin screen does for other users
+                screen.destroy()
+                return
+        else:
+            screen.pack(fill=tk.BOTH, expand=True)
+            if hasattr(screen, "on_show"):
+                screen.on_show()
+        self.screens[name] = screen
+        self.current_frame = screen
+        
+        # Destroy the screens shown least recently
+        while len(self.screens) > MAX_CACHED_SCREENS:
+            _, oldest = self.screens.popitem(last=False)
+            oldest.destroy()
+    
+    def hide_current_frame(self) -> None:
+        """Hide the current screen if it is cached, otherwise destroy it"""
+        if self.current_frame is None:
+            return
+        if self.current_frame in self.screens.values():
+            self.current_frame.pack_forget()
+        else:
+            self.current_frame.destroy()
+        self.current_frame = None
+    
+    def clear_screens(self) -> None:
+        """Destroy the cached screens, which belong to the user logging out"""
+        self.hide_current_frame()
+        for screen in self.screens.values():
+            screen.destroy()
+        self.screens.clear()
+    
     def show_login_screen(self) -> None:
         """Display the login screen"""
         try:
-            if self.current_frame:
-                self.current_frame.destroy()
+            self.clear_screens()
             
             self.update_status("Please log in")
             self.user_info.set("Not logged in")
@@ -464,14 +557,11 @@ class ChineseWallApp:
     def show_main_dashboard(self) -> None:
         """Display the main dashboard"""
         try:
-            if self.current_frame:
-                self.current_frame.destroy()
-            
             self.update_status("Main Dashboard")
             user_info = self.model.users.get(self.current_user, {})
             self.user_info.set(f"Logged in as: {user_info.get('name', self.current_user)}")
             
-            self.current_frame = MainDashboard(
+            self.show_screen("dashboard", lambda: MainDashboard(
                 self.root, 
                 self.model, 
                 self.data_manager, 
@@ -479,59 +569,55 @@ class ChineseWallApp:
                 self.logout_callback,
                 self.show_report_screen,
                 self.show_admin_screen,
-                self.show_help_screen
-            )
+                self.show_help_screen,
+                self.events
+            ))
         except Exception as e:
             self.handle_exception("Dashboard Error", e)
     
     def show_report_screen(self) -> None:
         """Display the report screen"""
         try:
-            if self.current_frame:
-                self.current_frame.destroy()
-            
             self.update_status("Viewing Reports")
             
-            self.current_frame = ReportScreen(
+            self.show_screen("reports", lambda: ReportScreen(
                 self.root, 
                 self.model, 
                 self.report_generator, 
                 self.current_user,
-                self.back_to_dashboard
-            )
+                self.back_to_dashboard,
+                self.events,
+                self.executor
+            ))
         except Exception as e:
             self.handle_exception("Report Screen Error", e)
     
     def show_admin_screen(self) -> None:
         """Display the admin screen"""
         try:
-            if self.current_frame:
-                self.current_frame.destroy()
-            
             self.update_status("Administrator Panel")
             
-            self.current_frame = AdminScreen(
+            self.show_screen("admin", lambda: AdminScreen(
                 self.root, 
                 self.model, 
                 self.data_manager, 
                 self.current_user,
-                self.back_to_dashboard
-            )
+                self.back_to_dashboard,
+                self.events,
+                self.executor
+            ))
         except Exception as e:
             self.handle_exception("Admin Screen Error", e)
     
     def show_help_screen(self) -> None:
         """Display the help screen"""
         try:
-            if self.current_frame:
-                self.current_frame.destroy()
-            
             self.update_status("Help & Information")
             
-            self.current_frame = HelpScreen(
+            self.show_screen("help", lambda: HelpScreen(
                 self.root,
                 self
-            )
+            ))
         except Exception as e:
             self.handle_exception("Help Screen Error", e)
     
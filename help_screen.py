@@ -5,7 +5,7 @@ Provides educational content about the Chinese Wall Model
 
 import tkinter as tk
 from tkinter import ttk, scrolledtext
-from utils import create_tooltip, center_window
+from utils import create_tooltip, center_window, LazyNotebook
 
 class HelpScreen(ttk.Frame):
     def __init__(self, parent, controller):
@@ -13,6 +13,7 @@ class HelpScreen(ttk.Frame):
         self.parent = parent
         self.controller = controller
         
+        self.pack(fill=tk.BOTH, expand=True)
         self.create_widgets()
     
     def create_widgets(self):
@@ -30,25 +31,22 @@ class HelpScreen(ttk.Frame):
         
         # Back button
         back_button = ttk.Button(header_frame, text="Back to Dashboard", 
-                                command=lambda: self.controller.show_frame("MainDashboard"))
+                                command=self.controller.back_to_dashboard)
         back_button.pack(side=tk.RIGHT)
         
         # Create a notebook for different help sections
-        self.notebook = ttk.Notebook(main_frame)
+        self.notebook = LazyNotebook(main_frame)
         self.notebook.pack(fill=tk.BOTH, expand=True, pady=10)
         
-        # Create tabs for different help sections
-        self.create_overview_tab()
-        self.create_concepts_tab()
-        self.create_tutorial_tab()
-        self.create_faq_tab()
-        self.create_about_tab()
+        # Create tabs for different help sections, each filled when first shown
+        self.notebook.add_lazy("Overview", self.create_overview_tab)
+        self.notebook.add_lazy("Key Concepts", self.create_concepts_tab)
+        self.notebook.add_lazy("Tutorial", self.create_tutorial_tab)
+        self.notebook.add_lazy("FAQ", self.create_faq_tab)
+        self.notebook.add_lazy("About", self.create_about_tab)
     
-    def create_overview_tab(self):
-        """Create the overview tab"""
-        overview_frame = ttk.Frame(self.notebook)
-        self.notebook.add(overview_frame, text="Overview")
-        
+    def create_overview_tab(self, overview_frame):
+        """Fill the overview tab"""
         # Overview content
         content = scrolledtext.ScrolledText(overview_frame, wrap=tk.WORD, 
                                            font=('Arial', 11), padx=10, pady=10)
@@ -104,11 +102,8 @@ By interacting with this application, you'll gain a deeper understanding of how
         content.insert(tk.END, overview_text)
         content.config(state=tk.DISABLED)
     
-    def create_concepts_tab(self):
-        """Create the concepts tab"""
-        concepts_frame = ttk.Frame(self.notebook)
-        self.notebook.add(concepts_frame, text="Key Concepts")
-        
+    def create_concepts_tab(self, concepts_frame):
+        """Fill the concepts tab"""
         # Concepts content
         content = scrolledtext.ScrolledText(concepts_frame, wrap=tk.WORD, 
                                            font=('Arial', 11), padx=10, pady=10)
@@ -185,11 +180,8 @@ By understanding these concepts, you'll be better equipped to navigate the appli
         content.insert(tk.END, concepts_text)
         content.config(state=tk.DISABLED)
     
-    def create_tutorial_tab(self):
-        """Create the tutorial tab"""
-        tutorial_frame = ttk.Frame(self.notebook)
-        self.notebook.add(tutorial_frame, text="Tutorial")
-        
+    def create_tutorial_tab(self, tutorial_frame):
+        """Fill the tutorial tab"""
         # Tutorial content
         content = scrolledtext.ScrolledText(tutorial_frame, wrap=tk.WORD, 
                                            font=('Arial', 11), padx=10, pady=10)
@@ -288,11 +280,8 @@ By following this tutorial, you'll gain hands-on experience with the Chinese Wal
         content.insert(tk.END, tutorial_text)
         content.config(state=tk.DISABLED)
     
-    def create_faq_tab(self):
-        """Create the FAQ tab"""
-        faq_frame = ttk.Frame(self.notebook)
-        self.notebook.add(faq_frame, text="FAQ")
-        
+    def create_faq_tab(self, faq_frame):
+        """Fill the FAQ tab"""
         # FAQ content
         content = scrolledtext.ScrolledText(faq_frame, wrap=tk.WORD, 
                                            font=('Arial', 11), padx=10, pady=10)
@@ -358,11 +347,8 @@ By following this tutorial, you'll gain hands-on experience with the Chinese Wal
         content.insert(tk.END, faq_text)
         content.config(state=tk.DISABLED)
     
-    def create_about_tab(self):
-        """Create the about tab"""
-        about_frame = ttk.Frame(self.notebook)
-        self.notebook.add(about_frame, text="About")
-        
+    def create_about_tab(self, about_frame):
+        """Fill the about tab"""
         # About content
         content = scrolledtext.ScrolledText(about_frame, wrap=tk.WORD, 
                                            font=('Arial', 11), padx=10, pady=10)
@@ -0,0 +1,149 @@
+"""
+Load Test for the Decision Server
+Drives a running decision_server.py with keep-alive, pipelined requests and
+reports latency percentiles, throughput and request coalescing.
+Run with: python load_test.py [--url http://127.0.0.1:8080 | --unix-socket PATH]
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import time
+from typing import List, Optional, Tuple
+from urllib.parse import urlsplit
+
+# Share of requests that record an access; the rest are can_access checks
+ACCESS_OBJECT_SHARE = 0.2
+
+def percentile(sorted_values: List[float], fraction: float) -> float:
+    """Get a percentile of an ascending list by the nearest-rank method"""
+    index = min(len(sorted_values) - 1, max(0, int(round(fraction * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+def build_request(host: str, path: str, payload: Optional[dict] = None) -> bytes:
+    """Encode a keep-alive HTTP/1.1 request"""
+    if payload is None:
+        return f"GET {path} HTTP/1.1\r\nHost: {host}\r\n\r\n".encode("latin-1")
+    body = json.dumps(payload).encode("utf-8")
+    return (f"POST {path} HTTP/1.1\r\nHost: {host}\r\nContent-Type: application/json\r\n"
+            f"Content-Length: {len(body)}\r\n\r\n").encode("latin-1") + body
+
+async def read_response(reader: asyncio.StreamReader) -> Tuple[int, bytes]:
+    """Read one response, returning (status, body)"""
+    head = await reader.readuntil(b"\r\n\r\n")
+    lines = head.decode("latin-1").split("\r\n")
+    status = int(lines[0].split(" ")[1])
+    length = 0
+    for line in lines[1:]:
+        name, _, value = line.partition(":")
+        if name.strip().lower() == "content-length":
+            length = int(value)
+    return status, await reader.readexactly(length)
+
+async def open_connection(args: argparse.Namespace):
+    """Connect to the server under test"""
+    if args.unix_socket:
+        return await asyncio.open_unix_connection(args.unix_socket)
+    url = urlsplit(args.url)
+    return await asyncio.open_connection(url.hostname, url.port or 80)
+
+async def run_connection(args: argparse.Namespace, host: str, users: List[str], companies: List[str],
+                         deadline: float, latencies: List[float], errors: List[int], seed: int) -> None:
+    """Keep args.pipeline requests in flight on one connection until the deadline"""
+    rng = random.Random(seed)
+    reader, writer = await open_connection(args)
+    
+    # Send times of requests awaiting a response, in order
+    in_flight: asyncio.Queue = asyncio.Queue()
+    slots = asyncio.Semaphore(args.pipeline)
+    
+    async def send() -> None:
+        while time.perf_counter() < deadline:
+            await slots.acquire()
+            payload = {"user_id": rng.choice(users), "company_id": rng.choice(companies)}
+            if args.batch_size:
+                # A consultant opening a folder: many documents of one company at once
+                payload = {"accesses": [dict(payload, object_id=f"document{i}") for i in range(args.batch_size)]}
+                request = build_request(host, "/access_objects", payload)
+            elif rng.random() < ACCESS_OBJECT_SHARE:
+                payload["object_id"] = "load-test"
+                request = build_request(host, "/access_object", payload)
+            else:
+                request = build_request(host, "/can_access", payload)
+            writer.write(request)
+            in_flight.put_nowait(time.perf_counter())
+            await writer.drain()
+        in_flight.put_nowait(None)
+    
+    async def receive() -> None:
+        while True:
+            sent_at = await in_flight.get()
+            if sent_at is None:
+                return
+            status, _ = await read_response(reader)
+            latencies.append(time.perf_counter() - sent_at)
+            if status != 200:
+                errors.append(status)
+            slots.release()
+    
+    await asyncio.gather(send(), receive())
+    writer.close()
+
+async def fetch_health(args: argparse.Namespace, host: str) -> dict:
+    """Get the server's health counters"""
+    reader, writer = await open_connection(args)
+    writer.write(build_request(host, "/health"))
+    _, body = await read_response(reader)
+    writer.close()
+    return json.loads(body)
+
+async def run(args: argparse.Namespace) -> None:
+    """Run the load test and print the results"""
+    host = "localhost" if args.unix_socket else urlsplit(args.url).netloc
+    users = args.users.split(",")
+    companies = args.companies.split(",")
+    before = await fetch_health(args, host)
+    
+    latencies: List[float] = []
+    errors: List[int] = []
+    start = time.perf_counter()
+    deadline = start + args.duration
+    await asyncio.gather(*(run_connection(args, host, users, companies, deadline, latencies, errors, seed)
+                           for seed in range(args.connections)))
+    elapsed = time.perf_counter() - start
+    
+    latencies.sort()
+    print(f"{args.connections} connections, pipeline depth {args.pipeline}, {elapsed:.1f} s")
+    print(f"{'requests':>10} {'errors':>8} {'req/s':>10} {'p50 ms':>8} {'p99 ms':>8} {'max ms':>8}")
+    print(f"{len(latencies):>10} {len(errors):>8} {len(latencies) / elapsed:>10,.0f} "
+          f"{percentile(latencies, 0.50) * 1e3:>8.2f} {percentile(latencies, 0.99) * 1e3:>8.2f} "
+          f"{latencies[-1] * 1e3:>8.2f}")
+    
+    after = await fetch_health(args, host)
+    if args.batch_size:
+        print(f"{len(latencies) * args.batch_size / elapsed:,.0f} accesses/s in batches of {args.batch_size}")
+    else:
+        batches = after["decision_batches"] - before["decision_batches"]
+        requests = after["decision_requests"] - before["decision_requests"]
+        print(f"{requests / max(batches, 1):.1f} decision requests per coalesced batch")
+
+def main():
+    """Main entry point for the load test"""
+    parser = argparse.ArgumentParser(description="Load test for the decision server")
+    parser.add_argument("--url", default="http://127.0.0.1:8080", help="server address")
+    parser.add_argument("--unix-socket", help="connect to this Unix socket instead")
+    parser.add_argument("--connections", type=int, default=16, help="concurrent connections (default: 16)")
+    parser.add_argument("--pipeline", type=int, default=8, help="requests in flight per connection (default: 8)")
+    parser.add_argument("--duration", type=float, default=10.0, help="test length in seconds (default: 10)")
+    parser.add_argument("--batch-size", type=int, default=0,
+                        help="send POST /access_objects with this many documents of one company per request")
+    parser.add_argument("--users", default="user1,user2,user3,user4,admin",
+                        help="comma-separated user IDs to query (default: the sample users)")
+    parser.add_argument("--companies", default="bank1,bank2,bank3,oil1,oil2,oil3,tech1,tech2,tech3",
+                        help="comma-separated company IDs to query (default: the sample companies)")
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+if __name__ == "__main__":
+    main()
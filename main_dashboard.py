@@ -4,11 +4,15 @@ Main Dashboard for Chinese Wall Model Demonstration
 
 import tkinter as tk
 from tkinter import ttk, messagebox
-from utils import create_tooltip, create_scrollable_frame, create_section_header, format_access_result
+from utils import create_tooltip, create_section_header, format_access_result, VirtualList, LazyNotebook
+from change_events import ACCESS_RECORDED, CATALOG_EVENTS, HISTORY_RESET, OBJECT_CHANGED, USER_CHANGED
+
+# How many COI tabs keep their company list once another tab is shown
+MAX_BUILT_TABS = 8
 
 class MainDashboard(ttk.Frame):
     def __init__(self, parent, model, data_manager, current_user, 
-                 logout_callback, show_report_screen, show_admin_screen, show_help_screen):
+                 logout_callback, show_report_screen, show_admin_screen, show_help_screen, events):
         super().__init__(parent)
         self.parent = parent
         self.model = model
@@ -21,6 +25,10 @@ class MainDashboard(ttk.Frame):
         
         self.pack(fill=tk.BOTH, expand=True)
         self.create_widgets()
+        
+        # Redraw once per burst of changes that affect this user's view
+        events.subscribe_widget(self, self.on_model_changed,
+                                CATALOG_EVENTS | {ACCESS_RECORDED, HISTORY_RESET, OBJECT_CHANGED, USER_CHANGED})
     
     def create_widgets(self):
         """Create the widgets for the main dashboard"""
@@ -50,26 +58,32 @@ class MainDashboard(ttk.Frame):
                                 font=('Arial', 16, 'bold'))
         header_label.pack(side=tk.LEFT)
         
-        # Notebook for organizing companies by COI class
-        notebook = ttk.Notebook(parent)
+        # What each company's row shows, so accesses update only the rows they affect
+        # Format: {company_id: {"name": name, "coi_class": coi_class_id, "shown": (can_access, reason)}}
+        self.company_rows = {}
+        
+        # Companies of each COI tab, in catalog order, and the list showing them once the tab is built
+        # Format: {coi_class_id: [company_id]}, {coi_class_id: VirtualList}
+        self.class_companies = {}
+        self.class_lists = {}
+        
+        # Notebook for organizing companies by COI class; a tab's list is built when the tab is
+        # first shown, and the lists of the tabs shown least recently are dropped
+        notebook = LazyNotebook(parent, max_built=MAX_BUILT_TABS)
         notebook.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
         
+        # Decide every company for the user in one model call, grouped by COI class
+        company_access = self.model.get_company_access_by_class(self.current_user)
+        
         # Create a tab for each COI class
-        for coi_class_id in self.model.coi_classes:
-            tab = ttk.Frame(notebook)
-            notebook.add(tab, text=f"{coi_class_id.capitalize()} Sector")
-            
-            # Create scrollable frame for company cards
-            scrollable_frame = create_scrollable_frame(tab)
-            
-            # Get companies in this COI class
-            companies_in_class = {company_id: company_info 
-                                 for company_id, company_info in self.model.companies.items() 
-                                 if company_info['coi_class'] == coi_class_id}
-            
-            # Create a card for each company
-            for company_id, company_info in companies_in_class.items():
-                self.create_company_card(scrollable_frame, company_id, company_info)
+        for coi_class_id, companies_in_class in company_access.items():
+            self.class_companies[coi_class_id] = []
+            for company_id, company_name, can_access, reason in companies_in_class:
+                self.class_companies[coi_class_id].append(company_id)
+                self.company_rows[company_id] = {"name": company_name, "coi_class": coi_class_id,
+                                                 "shown": (True, None) if can_access else (False, reason)}
+            notebook.add_lazy(f"{coi_class_id.capitalize()} Sector",
+                              lambda tab, coi_class_id=coi_class_id: self.create_class_tab(tab, coi_class_id))
         
         # Access log section
         log_frame = ttk.LabelFrame(parent, text="Recent Access Log")
@@ -103,15 +117,10 @@ class MainDashboard(ttk.Frame):
         history_frame = ttk.LabelFrame(parent, text="Access History")
         history_frame.pack(fill=tk.X, padx=5, pady=5)
         
-        # Get user's access history
-        access_history = self.model.user_access_history.get(self.current_user, {})
-        
-        if access_history:
-            for company_id in access_history:
-                company_name = self.model.companies[company_id]['name']
-                ttk.Label(history_frame, text=f"• {company_name}").pack(anchor=tk.W, padx=10, pady=2)
-        else:
-            ttk.Label(history_frame, text="No access history").pack(anchor=tk.W, padx=10, pady=2)
+        # Filled in by update_access_history
+        self.history_list = ttk.Frame(history_frame)
+        self.history_list.pack(fill=tk.X)
+        self.update_access_history()
         
         # Reset history button
         reset_button = ttk.Button(history_frame, text="Reset Access History", 
@@ -148,49 +157,70 @@ class MainDashboard(ttk.Frame):
                                   command=self.logout_callback)
         logout_button.pack(fill=tk.X, padx=10, pady=5)
     
-    def create_company_card(self, parent, company_id, company_info):
-        """Create a card for a company with its data objects"""
-        card_frame = ttk.LabelFrame(parent, text=company_info['name'])
-        card_frame.pack(fill=tk.X, padx=10, pady=10, ipadx=5, ipady=5)
-        
-        # Company information
-        info_frame = ttk.Frame(card_frame)
-        info_frame.pack(fill=tk.X, padx=5, pady=5)
-        
-        ttk.Label(info_frame, text=f"ID: {company_id}").pack(anchor=tk.W)
-        ttk.Label(info_frame, text=f"Sector: {company_info['coi_class'].capitalize()}").pack(anchor=tk.W)
-        
-        # Check if user can access this company
-        can_access, reason = self.model.can_access(self.current_user, company_id)
-        
-        # Access status
-        status_label = ttk.Label(info_frame, 
-                                text=f"Status: {'Accessible' if can_access else 'Restricted'}")
-        status_label.pack(anchor=tk.W)
-        
-        # Data objects section
-        if can_access:
-            objects_frame = ttk.LabelFrame(card_frame, text="Available Data")
-            objects_frame.pack(fill=tk.X, padx=5, pady=5)
-            
-            # Get company objects
-            company_objects = self.model.get_company_objects(company_id)
-            
-            for object_id, object_data in company_objects.items():
-                obj_frame = ttk.Frame(objects_frame)
-                obj_frame.pack(fill=tk.X, padx=5, pady=2)
-                
-                ttk.Label(obj_frame, text=object_id, width=20).pack(side=tk.LEFT)
-                
-                access_button = ttk.Button(obj_frame, text="Access", 
-                                         command=lambda cid=company_id, oid=object_id: 
-                                         self.attempt_access(cid, oid))
-                access_button.pack(side=tk.RIGHT, padx=5)
+    def create_class_tab(self, tab, coi_class_id):
+        """Build the list of a COI tab when the tab is first shown"""
+        # Only the rows in view have widgets, however many companies the class has
+        class_list = VirtualList(tab, self.create_list_row, self.fill_list_row, row_height=32)
+        class_list.pack(fill=tk.BOTH, expand=True)
+        self.class_lists[coi_class_id] = class_list
+        self.show_class(coi_class_id)
+    
+    def show_class(self, coi_class_id):
+        """List a COI tab's companies, each followed by its data objects if the user can access it"""
+        # Tabs not built yet, or dropped, are listed when next shown
+        class_list = self.class_lists.get(coi_class_id)
+        if class_list is None or not class_list.winfo_exists():
+            return
+        
+        items = []
+        for company_id in self.class_companies[coi_class_id]:
+            items.append((company_id, None))
+            if self.company_rows[company_id]["shown"][0]:
+                items.extend((company_id, object_id) for object_id in self.model.get_company_objects(company_id))
+        class_list.set_items(items)
+    
+    def create_list_row(self, parent):
+        """Create a reusable row of a COI tab's list"""
+        row = ttk.Frame(parent)
+        row.name_label = ttk.Label(row, width=30)
+        row.name_label.pack(side=tk.LEFT, padx=5)
+        row.status_label = ttk.Label(row)
+        row.status_label.pack(side=tk.LEFT, padx=5)
+        row.access_button = ttk.Button(row, text="Access")
+        return row
+    
+    def fill_list_row(self, row, item, selected):
+        """Show a company, with its status or the reason for restriction, or one of its data objects"""
+        company_id, object_id = item
+        company_row = self.company_rows[company_id]
+        if object_id is None:
+            can_access, reason = company_row["shown"]
+            row.name_label.config(text=f"{company_row['name']} ({company_id})", font=('Arial', 10, 'bold'))
+            row.status_label.config(text="Status: Accessible" if can_access else f"Status: Restricted - {reason}",
+                                    foreground="green" if can_access else "red")
+            row.access_button.pack_forget()
         else:
-            # Show reason for restriction
-            restriction_label = ttk.Label(card_frame, text=f"Reason: {reason}", 
-                                        foreground="red")
-            restriction_label.pack(anchor=tk.W, padx=5, pady=5)
+            row.name_label.config(text=f"    {object_id}", font=('Arial', 10))
+            row.status_label.config(text="")
+            row.access_button.config(command=lambda: self.attempt_access(company_id, object_id))
+            row.access_button.pack(side=tk.RIGHT, padx=5)
+    
+    def update_company_row(self, company_id, decision=None):
+        """
+        Record the user's (can_access, reason) for a company, looking it up when not given
+        Returns: bool - whether the row shows something else now
+        """
+        company_row = self.company_rows.get(company_id)
+        if company_row is None:
+            return False
+        
+        # The reason is only shown for restricted companies
+        can_access, reason = decision or self.model.can_access(self.current_user, company_id)
+        shown = (True, None) if can_access else (False, reason)
+        if shown == company_row["shown"]:
+            return False
+        company_row["shown"] = shown
+        return True
     
     def attempt_access(self, company_id, object_id):
         """Attempt to access a company's data object"""
@@ -202,15 +232,8 @@ class MainDashboard(ttk.Frame):
         access_granted, reason = self.data_manager.simulate_access_attempt(
             self.current_user, company_id, object_id)
         
-        # Show result in message box
-        company_name = self.model.companies[company_id]['name']
-        messagebox.showinfo(
-            "Access Attempt", 
-            f"Attempting to access '{object_id}' from {company_name}:\n\n" +
-            format_access_result(access_granted, reason)
-        )
-        
         # Add to log
+        company_name = self.model.companies[company_id]['name']
         self.log_text.config(state=tk.NORMAL)
         self.log_text.insert(tk.END, 
                            f"[{timestamp}] {company_name} - {object_id}: " +
@@ -218,8 +241,12 @@ class MainDashboard(ttk.Frame):
         self.log_text.see(tk.END)
         self.log_text.config(state=tk.DISABLED)
         
-        # Refresh the dashboard to reflect changes
-        self.refresh()
+        # Show result in message box
+        messagebox.showinfo(
+            "Access Attempt", 
+            f"Attempting to access '{object_id}' from {company_name}:\n\n" +
+            format_access_result(access_granted, reason)
+        )
     
     def reset_access_history(self):
         """Reset the user's access history"""
@@ -230,7 +257,65 @@ class MainDashboard(ttk.Frame):
             messagebox.showinfo("Reset Complete", 
                                "Your access history has been reset. " +
                                "You can now access any company.")
+    
+    def update_access_history(self):
+        """Redraw the list of companies the user has accessed"""
+        for widget in self.history_list.winfo_children():
+            widget.destroy()
+        
+        # Get user's access history
+        access_history = list(self.model.user_access_history.get(self.current_user, {}))
+        
+        # COI classes the listed companies belong to, whose rows a reset unlocks
+        self.history_classes = {self.model.companies[company_id]['coi_class'] for company_id in access_history}
+        
+        if access_history:
+            for company_id in access_history:
+                company_name = self.model.companies[company_id]['name']
+                ttk.Label(self.history_list, text=f"• {company_name}").pack(anchor=tk.W, padx=10, pady=2)
+        else:
+            ttk.Label(self.history_list, text="No access history").pack(anchor=tk.W, padx=10, pady=2)
+    
+    def on_model_changed(self, events):
+        """
+        Update the dashboard after changes to the catalog or to the current user.
+        An access can only change the rows of the accessed company's COI class,
+        and a reset those of the classes in the history, so only they are checked.
+        """
+        if self.current_user not in self.model.users:
+            return
+        events = [event for event in events if event.user_id in (None, self.current_user)]
+        if not events:
+            return
+        
+        # Catalog and profile changes are rare; redraw everything
+        if any(event.kind in CATALOG_EVENTS or event.kind == USER_CHANGED for event in events):
             self.refresh()
+            return
+        
+        changed_classes = set()
+        relisted = set()
+        for event in events:
+            if event.kind == OBJECT_CHANGED:
+                if event.company_id in self.company_rows:
+                    relisted.add(self.company_rows[event.company_id]["coi_class"])
+            elif event.kind == HISTORY_RESET and event.company_id is None:
+                changed_classes |= self.history_classes
+            else:
+                company_info = self.model.companies.get(event.company_id)
+                if company_info is not None:
+                    changed_classes.add(company_info['coi_class'])
+        
+        if changed_classes:
+            self.update_access_history()
+        for coi_class_id in changed_classes & set(self.class_companies):
+            changed = [self.update_company_row(company_id) for company_id in self.class_companies[coi_class_id]]
+            if any(changed):
+                relisted.add(coi_class_id)
+        
+        # Relist the tabs whose rows changed; the row widgets are reused
+        for coi_class_id in relisted:
+            self.show_class(coi_class_id)
     
     def refresh(self):
         """Refresh the dashboard to reflect changes"""
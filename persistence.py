@@ -0,0 +1,311 @@
+"""
+Persistence for the Chinese Wall Model
+Appends every model mutation to a write-ahead log and periodically writes
+compact snapshots, so state survives restarts.
+"""
+
+import glob
+import gzip
+import json
+import os
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+from chinese_wall_model import ChineseWallModel
+
+# Model methods that may be replayed from the write-ahead log
+REPLAYABLE_OPERATIONS = {
+    "add_coi_class", "delete_coi_class",
+    "add_company", "update_company", "delete_company",
+    "add_object", "add_objects", "update_object", "delete_object",
+    "add_user", "update_user", "delete_user", "reset_user_history", "revoke_access",
+    "access_object", "access_objects", "clear_access_logs", "clear", "apply_batch",
+}
+
+SNAPSHOT_FILE = "snapshot.json.gz"
+WAL_PATTERN = "wal-*.log"
+
+def snapshot_model(model: ChineseWallModel) -> Dict[str, Any]:
+    """Capture the state of a model as JSON-serializable data"""
+    return {
+        "coi_classes": list(model.coi_classes),
+        "companies": {company_id: {"name": info["name"],
+                                   "coi_class": info["coi_class"],
+                                   "objects": dict(model.company_objects[company_id])}
+                      for company_id, info in model.companies.items()},
+        "users": {user_id: dict(info) for user_id, info in model.users.items()},
+        "user_access_history": {user_id: list(history)
+                                for user_id, history in model.user_access_history.items()},
+        # Spilled access log segments are already on disk and only referenced
+        "access_log_segments": list(model.access_logs.segments),
+        "access_logs": list(model.access_logs.records(include_spilled=False)),
+    }
+
+def restore_model(model: ChineseWallModel, state: Dict[str, Any]) -> None:
+    """Load a state captured by snapshot_model into an empty model"""
+    for coi_class_id in state["coi_classes"]:
+        model.add_coi_class(coi_class_id, coi_class_id)
+    
+    for company_id, info in state["companies"].items():
+        model.add_company(company_id, info["name"], info["coi_class"])
+        model.add_objects((company_id, object_id, object_data)
+                          for object_id, object_data in info["objects"].items())
+    
+    for user_id, info in state["users"].items():
+        model.add_user(user_id, info["name"], info["role"])
+    
+    # Histories are restored in access order so the COI index matches
+    for user_id, history in state["user_access_history"].items():
+        for company_id in history:
+            model._record_access(user_id, company_id)
+    
+    model.access_logs.attach_segments([tuple(segment) for segment in state.get("access_log_segments", ())])
+    for record in state["access_logs"]:
+        model._append_access_log(*record)
+
+class PersistentStore:
+    """
+    Write-ahead log and snapshot persistence for a ChineseWallModel.
+
+    Each mutation is appended to the current log segment as a JSON line
+    [sequence, operation, args]. By default the mutating thread waits until
+    its record is fsynced, so a mutation that returned survives a crash. The
+    first waiting thread writes and fsyncs every pending record while the
+    others queue behind it, so concurrent mutations share one fsync (group
+    commit). With durable=False mutations return at once and a background
+    thread commits them every commit_interval seconds, which may lose the
+    last interval on a crash. After every snapshot_interval records the
+    background thread writes a gzip snapshot and removes older log segments,
+    which bounds the replay on open(). Snapshots hold every model lock,
+    never a thread that is mutating.
+    """
+    
+    def __init__(self, model: ChineseWallModel, directory: str,
+                 snapshot_interval: int = 10000, commit_interval: float = 0.05, durable: bool = True):
+        self.model = model
+        self.directory = directory
+        self.snapshot_interval = snapshot_interval
+        self.commit_interval = commit_interval
+        self.durable = durable
+        
+        # Sequence number of the last record appended to the log, and of the last one fsynced
+        self.sequence = 0
+        self.durable_sequence = 0
+        
+        # Records since the last snapshot
+        self.records_since_snapshot = 0
+        
+        # Encoded records waiting for the next group commit
+        # Format: [json line]
+        self._pending: List[str] = []
+        self._lock = threading.Lock()
+        
+        # Set while a thread writes and fsyncs records without holding the lock;
+        # the others wait on _committed for it to finish
+        self._committing = False
+        self._committed = threading.Condition(self._lock)
+        self._wal_file = None
+        self._closed = threading.Event()
+        self._committer: Optional[threading.Thread] = None
+    
+    def open(self) -> bool:
+        """
+        Restore the model from disk and start logging its mutations
+        Returns: bool - whether any persisted state was found
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        
+        found = False
+        snapshot_path = os.path.join(self.directory, SNAPSHOT_FILE)
+        if os.path.exists(snapshot_path):
+            with gzip.open(snapshot_path, "rt", encoding="utf-8") as snapshot_file:
+                snapshot = json.load(snapshot_file)
+            restore_model(self.model, snapshot["state"])
+            self.sequence = snapshot["sequence"]
+            found = True
+        
+        segments = self._segments()
+        for index, (_, path) in enumerate(segments):
+            if self._replay_segment(path, last_segment=index == len(segments) - 1):
+                found = True
+        
+        # Continue in a fresh segment so a truncated tail is never appended to
+        self.durable_sequence = self.sequence
+        self._start_segment()
+        self.model.add_mutation_listener(self._on_mutation)
+        
+        self._closed.clear()
+        self._committer = threading.Thread(target=self._commit_loop, name="wal-commit", daemon=True)
+        self._committer.start()
+        return found
+    
+    def close(self) -> None:
+        """Stop logging, commit pending records and close the log"""
+        if self._committer is None:
+            return
+        
+        self.model.remove_mutation_listener(self._on_mutation)
+        self._closed.set()
+        self._committer.join()
+        self._committer = None
+        
+        with self._lock:
+            self._commit_pending()
+            self._close_segment()
+    
+    def flush(self) -> None:
+        """Write and fsync all pending records now"""
+        with self._lock:
+            self._commit_pending()
+    
+    def snapshot(self) -> None:
+        """Write a snapshot of the model and remove the log segments it covers"""
+        # No mutation can be recorded while every model lock is held, so the
+        # state matches the sequence number
+        with self.model.lock_all():
+            state = snapshot_model(self.model)
+            with self._lock:
+                self._commit_pending()
+                sequence = self.sequence
+                self.records_since_snapshot = 0
+                self._start_segment()
+        
+        path = os.path.join(self.directory, SNAPSHOT_FILE)
+        tmp_path = path + ".tmp"
+        with gzip.open(tmp_path, "wt", encoding="utf-8") as snapshot_file:
+            json.dump({"sequence": sequence, "state": state}, snapshot_file)
+        self._fsync_path(tmp_path)
+        os.replace(tmp_path, path)
+        self._fsync_path(self.directory)
+        
+        for first_sequence, segment_path in self._segments():
+            if first_sequence <= sequence:
+                os.remove(segment_path)
+    
+    def _on_mutation(self, operation: str, args: Tuple[Any, ...]) -> None:
+        """Append a model mutation to the pending records and, if durable, wait until it is fsynced"""
+        with self._lock:
+            self.sequence += 1
+            self._pending.append(json.dumps([self.sequence, operation, args]))
+            self.records_since_snapshot += 1
+            
+            if self.durable:
+                sequence = self.sequence
+                while self.durable_sequence < sequence:
+                    if self._committing:
+                        self._committed.wait()
+                    else:
+                        self._commit_pending()
+    
+    def _commit_loop(self) -> None:
+        """Group-commit pending records and take due snapshots until the store is closed"""
+        while not self._closed.wait(self.commit_interval):
+            if self.records_since_snapshot >= self.snapshot_interval:
+                self.snapshot()
+            else:
+                with self._lock:
+                    self._commit_pending()
+    
+    def _commit_pending(self) -> None:
+        """
+        Write and fsync pending records. The caller holds the lock, which is
+        released during the fsync so other threads can append records for the
+        next commit meanwhile.
+        """
+        while self._committing:
+            self._committed.wait()
+        if not self._pending:
+            return
+        
+        records, self._pending = self._pending, []
+        sequence = self.sequence
+        wal_file = self._wal_file
+        self._committing = True
+        self._lock.release()
+        try:
+            wal_file.write("\n".join(records) + "\n")
+            wal_file.flush()
+            os.fsync(wal_file.fileno())
+        except BaseException:
+            self._lock.acquire()
+            # Keep the records for the next attempt
+            self._pending = records + self._pending
+            raise
+        else:
+            self._lock.acquire()
+            self.durable_sequence = sequence
+        finally:
+            self._committing = False
+            self._committed.notify_all()
+    
+    def _start_segment(self) -> None:
+        """Close the current log segment and open a new one after self.sequence"""
+        self._close_segment()
+        
+        path = os.path.join(self.directory, f"wal-{self.sequence + 1:020d}.log")
+        self._wal_file = open(path, "a", encoding="utf-8")
+        self._fsync_path(self.directory)
+    
+    def _close_segment(self) -> None:
+        """Close the current log segment, removing it if nothing was written"""
+        if self._wal_file is None:
+            return
+        
+        empty = self._wal_file.tell() == 0
+        self._wal_file.close()
+        if empty:
+            os.remove(self._wal_file.name)
+        self._wal_file = None
+    
+    def _segments(self) -> List[Tuple[int, str]]:
+        """List the log segments as (first sequence, path), oldest first"""
+        segments = []
+        for path in glob.glob(os.path.join(self.directory, WAL_PATTERN)):
+            name = os.path.basename(path)
+            segments.append((int(name[4:-4]), path))
+        return sorted(segments)
+    
+    def _replay_segment(self, path: str, last_segment: bool) -> bool:
+        """
+        Apply the records of a log segment not covered by the snapshot
+        Returns: bool - whether any record was applied
+        """
+        applied = False
+        with open(path, "rb") as segment_file:
+            offset = 0
+            for line in segment_file:
+                try:
+                    sequence, operation, args = json.loads(line)
+                except ValueError:
+                    if not last_segment:
+                        raise ValueError(f"Corrupt write-ahead log record in {path} at byte {offset}")
+                    # A torn write at the end of the log: drop it
+                    segment_file.close()
+                    os.truncate(path, offset)
+                    break
+                
+                offset += len(line)
+                if sequence <= self.sequence:
+                    continue
+                if operation not in REPLAYABLE_OPERATIONS:
+                    raise ValueError(f"Unknown operation '{operation}' in write-ahead log {path}")
+                
+                getattr(self.model, operation)(*args)
+                self.sequence = sequence
+                applied = True
+        return applied
+    
+    @staticmethod
+    def _fsync_path(path: str) -> None:
+        """fsync a file or directory by path"""
+        try:
+            fd = os.open(path, os.O_RDONLY)
+        except OSError:
+            return
+        try:
+            os.fsync(fd)
+        except OSError:
+            # Directories cannot be fsynced on some platforms
+            pass
+        finally:
+            os.close(fd)
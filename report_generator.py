@@ -4,27 +4,52 @@ Handles generation of reports and visualizations
 """
 
 import csv
+import io
 import os
-from datetime import datetime
+from datetime import datetime, timedelta
 import matplotlib.pyplot as plt
 from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
 
+# How many entries an export writes between progress reports
+EXPORT_PROGRESS_INTERVAL = 1000
+
+# How many entries a report preview shows
+PREVIEW_ENTRIES = 50
+
+def date_range_start(date_range):
+    """
+    Get the inclusive start timestamp of a date range option of the report screen
+    Returns: str or None - None for all time
+    """
+    now = datetime.now()
+    if date_range == "Today":
+        return now.strftime("%Y-%m-%d")
+    if date_range == "Last 7 Days":
+        return (now - timedelta(days=7)).strftime("%Y-%m-%d %H:%M:%S")
+    if date_range == "Last 30 Days":
+        return (now - timedelta(days=30)).strftime("%Y-%m-%d %H:%M:%S")
+    return None
+
 class ReportGenerator:
     def __init__(self, model):
         """Initialize with a reference to the ChineseWallModel instance"""
         self.model = model
     
-    def generate_access_report(self, output_format="dict"):
+    def generate_access_report(self, output_format="dict", start=None, end=None):
         """
         Generate a report of all access attempts
         output_format: 'dict', 'csv', or 'text'
+        start, end: optional inclusive "YYYY-MM-DD HH:MM:SS" bounds on the timestamp
         """
-        logs = self.model.access_logs
-        
         if output_format == "dict":
-            return logs
+            if start is None and end is None:
+                return self.model.access_logs
+            return self.model.query_access_logs(start=start, end=end)
+        
+        # Stream the entries so spilled logs are never all loaded at once
+        logs = self.get_access_log(start=start, end=end)
         
-        elif output_format == "csv":
+        if output_format == "csv":
             timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
             filename = f"access_report_{timestamp}.csv"
             
@@ -58,9 +83,95 @@ class ReportGenerator:
             
             return report
     
+    def export_report(self, filepath, format_type, date_range, task=None):
+        """
+        Write the access log entries in a date range to filepath, as CSV or TXT.
+        The report is written to a temporary file that replaces filepath once
+        complete, so a failed or cancelled export leaves any previous file intact.
+        task: optional BackgroundTask to report progress to; the export stops if it is cancelled
+        """
+        if format_type not in ("CSV", "TXT"):
+            raise ValueError(f"Exporting to {format_type} is not supported")
+        
+        tmp_path = filepath + ".tmp"
+        report_file = open(tmp_path, 'w', newline='')
+        try:
+            with report_file:
+                self.write_report(report_file, format_type, date_range, task=task)
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+        os.replace(tmp_path, filepath)
+        
+        return filepath
+    
+    def generate_report_preview(self, format_type, date_range):
+        """Get the start of the report export_report would write, up to PREVIEW_ENTRIES entries"""
+        preview = io.StringIO()
+        self.write_report(preview, format_type, date_range, max_entries=PREVIEW_ENTRIES)
+        return preview.getvalue()
+    
+    def write_report(self, report_file, format_type, date_range, task=None, max_entries=None):
+        """Write the access log entries in a date range to an open file, as CSV or TXT"""
+        start = date_range_start(date_range)
+        
+        # The number of entries is only known without a date filter
+        total = len(self.model.access_logs) if start is None else None
+        
+        if format_type == "CSV":
+            fieldnames = ['timestamp', 'user_name', 'company_name', 'object_id', 'access_granted', 'reason']
+            writer = csv.DictWriter(report_file, fieldnames=fieldnames, extrasaction='ignore')
+            writer.writeheader()
+        else:
+            report_file.write(f"COMPLETE ACCESS LOG ({date_range})\n")
+            report_file.write("=" * 80 + "\n")
+            report_file.write(f"Generated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
+            report_file.write("=" * 80 + "\n\n")
+        
+        # Stream the entries so spilled logs are never all loaded at once
+        for written, log in enumerate(self.get_access_log(start=start), 1):
+            if format_type == "CSV":
+                writer.writerow(log)
+            else:
+                status = "GRANTED" if log['access_granted'] else "DENIED"
+                report_file.write(f"[{log['timestamp']}] {log['user_name']} -> {log['company_name']} "
+                                  f"({log['object_id']}): {status}\n")
+                report_file.write(f"  Reason: {log['reason']}\n\n")
+            
+            if written == max_entries:
+                break
+            if task is not None and written % EXPORT_PROGRESS_INTERVAL == 0:
+                task.check_cancelled()
+                task.report_progress(min(written / total, 1.0) if total else None,
+                                     f"{written} entries written")
+    
+    def get_access_log(self, user_id=None, company_id=None, start=None, end=None):
+        """
+        Stream the access log entries matching all the given filters, oldest first
+        start, end: optional inclusive "YYYY-MM-DD HH:MM:SS" bounds on the timestamp
+        """
+        return self.model.iter_access_logs(user_id=user_id, company_id=company_id, start=start, end=end)
+    
+    def get_summary_statistics(self):
+        """Count granted and denied access attempts"""
+        total = granted = 0
+        for log in self.get_access_log():
+            total += 1
+            if log['access_granted']:
+                granted += 1
+        denied = total - granted
+        
+        return {
+            'total': total,
+            'granted': granted,
+            'denied': denied,
+            'granted_percent': round(100 * granted / total, 1) if total else 0,
+            'denied_percent': round(100 * denied / total, 1) if total else 0
+        }
+    
     def generate_user_report(self, user_id):
         """Generate a report for a specific user's access history"""
-        logs = [log for log in self.model.access_logs if log['user_id'] == user_id]
+        logs = self.get_access_log(user_id=user_id)
         
         report = f"ACCESS REPORT FOR USER: {self.model.users[user_id]['name']}\n"
         report += "=" * 80 + "\n"
@@ -76,7 +187,7 @@ class ReportGenerator:
     
     def generate_company_report(self, company_id):
         """Generate a report for a specific company's access attempts"""
-        logs = [log for log in self.model.access_logs if log['company_id'] == company_id]
+        logs = self.get_access_log(company_id=company_id)
         
         report = f"ACCESS REPORT FOR COMPANY: {self.model.companies[company_id]['name']}\n"
         report += "=" * 80 + "\n"
@@ -92,11 +203,10 @@ class ReportGenerator:
     
     def create_access_summary_chart(self, frame):
         """Create a chart summarizing access attempts (granted vs. denied)"""
-        logs = self.model.access_logs
-        
         # Count granted and denied access attempts
-        granted = sum(1 for log in logs if log['access_granted'])
-        denied = len(logs) - granted
+        summary = self.get_summary_statistics()
+        granted = summary['granted']
+        denied = summary['denied']
         
         # Create figure and axis
         fig, ax = plt.subplots(figsize=(5, 4))
@@ -108,11 +218,14 @@ class ReportGenerator:
         canvas = FigureCanvasTkAgg(fig, master=frame)
         canvas.draw()
         
+        # The canvas keeps the figure; drop pyplot's reference so charts rebuilt later do not pile up
+        plt.close(fig)
+        
         return canvas.get_tk_widget()
     
     def create_company_access_chart(self, frame):
         """Create a chart showing access attempts by company"""
-        logs = self.model.access_logs
+        logs = self.get_access_log()
         
         # Count access attempts by company
         company_access = {}
@@ -150,12 +263,13 @@ class ReportGenerator:
         # Embed in Tkinter
         canvas = FigureCanvasTkAgg(fig, master=frame)
         canvas.draw()
+        plt.close(fig)
         
         return canvas.get_tk_widget()
     
     def create_user_access_chart(self, frame):
         """Create a chart showing access attempts by user"""
-        logs = self.model.access_logs
+        logs = self.get_access_log()
         
         # Count access attempts by user
         user_access = {}
@@ -193,6 +307,7 @@ class ReportGenerator:
         # Embed in Tkinter
         canvas = FigureCanvasTkAgg(fig, master=frame)
         canvas.draw()
+        plt.close(fig)
         
         return canvas.get_tk_widget()
     
@@ -249,5 +364,6 @@ class ReportGenerator:
         # Embed in Tkinter
         canvas = FigureCanvasTkAgg(fig, master=frame)
         canvas.draw()
+        plt.close(fig)
         
         return canvas.get_tk_widget()
@@ -8,20 +8,38 @@ import matplotlib
 matplotlib.use('TkAgg')  # Set the backend for matplotlib
 from utils import (create_tooltip, create_scrollable_frame, create_section_header, 
                   create_card, create_badge, create_notification, create_data_table,
-                  create_info_box)
+                  create_info_box, LazyNotebook)
 import datetime
+from report_generator import date_range_start
+from change_events import ACCESS_RECORDED, CATALOG_EVENTS, HISTORY_RESET, LOGS_CLEARED, USER_CHANGED
+
+# How many log entries are read between progress reports and cancellation checks
+LOG_PROGRESS_INTERVAL = 1000
 
 class ReportScreen(ttk.Frame):
-    def __init__(self, parent, model, report_generator, current_user, back_callback):
+    def __init__(self, parent, model, report_generator, current_user, back_callback, events, executor):
         super().__init__(parent)
         self.parent = parent
         self.model = model
         self.report_generator = report_generator
         self.current_user = current_user
         self.back_callback = back_callback
+        self.events = events
+        self.executor = executor
+        
+        # Background task loading the access log rows, if one is running
+        self.log_task = None
+        
+        # Changes not shown yet: tabs to rebuild, and whether the log rows must be reloaded.
+        # While the screen is hidden they are collected and applied when it is shown again.
+        self.stale_tabs = set()
+        self.log_rows_stale = False
         
         self.pack(fill=tk.BOTH, expand=True)
         self.create_widgets()
+        
+        self.events.subscribe_widget(self, self.on_model_changed)
+        self.bind("<Destroy>", self.on_destroy, add="+")
     
     def create_widgets(self):
         """Create the widgets for the report screen"""
@@ -54,29 +72,15 @@ class ReportScreen(ttk.Frame):
         content_frame = ttk.Frame(self)
         content_frame.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
         
-        # Create notebook for different report types
-        notebook = ttk.Notebook(content_frame)
-        notebook.pack(fill=tk.BOTH, expand=True)
-        
-        # Access Log tab
-        access_log_tab = ttk.Frame(notebook)
-        notebook.add(access_log_tab, text="Access Log")
-        self.create_access_log_tab(access_log_tab)
-        
-        # Analytics tab
-        analytics_tab = ttk.Frame(notebook)
-        notebook.add(analytics_tab, text="Analytics")
-        self.create_analytics_tab(analytics_tab)
-        
-        # Structure Visualization tab
-        structure_tab = ttk.Frame(notebook)
-        notebook.add(structure_tab, text="COI Structure")
-        self.create_structure_tab(structure_tab)
-        
-        # Export Reports tab
-        export_tab = ttk.Frame(notebook)
-        notebook.add(export_tab, text="Export Reports")
-        self.create_export_tab(export_tab)
+        # Create notebook for different report types; each tab is built when first shown,
+        # so the charts are only drawn if the analytics tab is opened
+        self.notebook = LazyNotebook(content_frame)
+        self.notebook.pack(fill=tk.BOTH, expand=True)
+        
+        self.log_tab = self.notebook.add_lazy("Access Log", self.create_access_log_tab)
+        self.analytics_tab = self.notebook.add_lazy("Analytics", self.create_analytics_tab)
+        self.structure_tab = self.notebook.add_lazy("COI Structure", self.create_structure_tab)
+        self.notebook.add_lazy("Export Reports", self.create_export_tab)
     
     def create_access_log_tab(self, parent):
         """Create the Access Log tab"""
@@ -172,16 +176,16 @@ class ReportScreen(ttk.Frame):
         # Create the table headers
         headers = ["Timestamp", "User", "Company", "Object", "Status", "Reason"]
         
-        # Get the log data
-        self.log_data = self.get_filtered_log_data()
-        
-        # Create the table
+        # Create the table; the log data is loaded in the background
+        self.log_data = []
         self.log_table = create_data_table(table_frame, headers, self.log_data)
         
         # Status message
-        self.status_label = tk.Label(log_card, text=f"Showing {len(self.log_data)} entries", 
+        self.status_label = tk.Label(log_card, text="Loading entries...", 
                                     bg="white", fg="#757575", font=('Arial', 9))
         self.status_label.pack(side=tk.RIGHT, padx=15, pady=(0, 10))
+        
+        self.reload_access_log()
     
     def create_analytics_tab(self, parent):
         """Create the Analytics tab"""
@@ -334,17 +338,9 @@ This visualization shows the structure of COI Classes and the companies within t
         tk.Label(type_frame, text="Report Type:", bg="white", 
                 font=('Arial', 10, 'bold')).pack(anchor=tk.W)
         
-        self.report_type_var = tk.StringVar(value="Complete Access Log")
-        report_type = ttk.Combobox(type_frame, textvariable=self.report_type_var, 
-                                  state="readonly", width=30)
-        report_type['values'] = [
-            "Complete Access Log", 
-            "User-Specific Report", 
-            "Company-Specific Report",
-            "COI Class Analysis",
-            "Security Audit Report"
-        ]
-        report_type.pack(anchor=tk.W, pady=2)
+        # The complete access log is the only report that can be exported
+        tk.Label(type_frame, text="Complete Access Log", bg="white", 
+                font=('Arial', 10)).pack(anchor=tk.W, pady=2)
         
         # Format options
         format_frame = tk.Frame(options_content, bg="white")
@@ -358,20 +354,11 @@ This visualization shows the structure of COI Classes and the companies within t
         format_options_frame = tk.Frame(format_frame, bg="white")
         format_options_frame.pack(anchor=tk.W)
         
-        formats = [("CSV", "CSV"), ("Text", "TXT"), ("PDF", "PDF")]
+        formats = [("CSV", "CSV"), ("Text", "TXT")]
         for text, value in formats:
             ttk.Radiobutton(format_options_frame, text=text, value=value, 
                            variable=self.format_var).pack(side=tk.LEFT, padx=10)
         
-        # Include charts option
-        charts_frame = tk.Frame(options_content, bg="white")
-        charts_frame.pack(fill=tk.X, pady=5)
-        
-        self.include_charts_var = tk.BooleanVar(value=True)
-        charts_check = ttk.Checkbutton(charts_frame, text="Include charts and visualizations", 
-                                      variable=self.include_charts_var)
-        charts_check.pack(anchor=tk.W)
-        
         # Date range
         date_frame = tk.Frame(options_content, bg="white")
         date_frame.pack(fill=tk.X, pady=5)
@@ -385,7 +372,7 @@ This visualization shows the structure of COI Classes and the companies within t
         self.date_range_var = tk.StringVar(value="All Time")
         date_options = ttk.Combobox(date_options_frame, textvariable=self.date_range_var, 
                                    state="readonly", width=15)
-        date_options['values'] = ["All Time", "Today", "Last 7 Days", "Last 30 Days", "Custom Range"]
+        date_options['values'] = ["All Time", "Today", "Last 7 Days", "Last 30 Days"]
         date_options.pack(side=tk.LEFT, pady=2)
         
         # Export button
@@ -428,9 +415,37 @@ This visualization shows the structure of COI Classes and the companies within t
         create_tooltip(preview_button, "Generate a preview of the report with current settings")
     
     def update_access_log(self):
-        """Update the access log based on the selected filters"""
-        # Get filtered log data
-        self.log_data = self.get_filtered_log_data()
+        """Update the access log based on the selected filters, showing the progress"""
+        self.reload_access_log(show_progress=True)
+    
+    def reload_access_log(self, show_progress=False):
+        """Reload the access log rows with the selected filters on a worker thread"""
+        if self.log_task is not None:
+            self.log_task.cancel()
+        
+        # Tk variables may only be read on the Tk thread. The selected names are
+        # resolved to IDs here under the model locks, so the worker never iterates
+        # the users and companies while another thread changes them.
+        with self.model.lock_all():
+            user_ids = self._filter_ids(self.model.users, self.user_filter_var.get(), "All Users")
+            company_ids = self._filter_ids(self.model.companies, self.company_filter_var.get(), "All Companies")
+        filters = (user_ids, company_ids, self.status_filter_var.get(), self.date_filter_var.get())
+        
+        if show_progress:
+            self.log_task = self.executor.run_with_progress(
+                self, "Loading Access Log", self.get_filtered_log_data, *filters,
+                on_done=lambda log_data: self.show_log_data(log_data, notify=True))
+        else:
+            self.log_task = self.executor.submit(self.get_filtered_log_data, *filters,
+                                                 on_done=self.show_log_data)
+    
+    def show_log_data(self, log_data, notify=False):
+        """Show loaded access log rows in the table"""
+        self.log_task = None
+        if not self.log_table.winfo_exists():
+            return  # The log tab was emptied to be rebuilt
+        
+        self.log_data = log_data
         
         # Clear existing table
         for item in self.log_table.get_children():
@@ -443,8 +458,45 @@ This visualization shows the structure of COI Classes and the companies within t
         # Update status label
         self.status_label.config(text=f"Showing {len(self.log_data)} entries")
         
-        # Show notification
-        create_notification(self, f"Access log updated with {len(self.log_data)} entries", "info")
+        if notify:
+            self.notify(f"Access log updated with {len(self.log_data)} entries", "info")
+    
+    def on_destroy(self, event):
+        """Stop loading the log when the screen is destroyed"""
+        if event.widget is self and self.log_task is not None:
+            self.log_task.cancel()
+    
+    def on_model_changed(self, events):
+        """Mark the tabs that show changed data, and update them now if the screen is shown"""
+        kinds = {event.kind for event in events}
+        if kinds & (CATALOG_EVENTS | {USER_CHANGED}):
+            # Names in the filters, charts and structure may have changed
+            self.stale_tabs |= {self.log_tab, self.analytics_tab, self.structure_tab}
+        if kinds & {ACCESS_RECORDED, LOGS_CLEARED}:
+            self.log_rows_stale = True
+            self.stale_tabs.add(self.analytics_tab)
+        if any(event.kind in (ACCESS_RECORDED, HISTORY_RESET) and event.user_id == self.current_user
+               for event in events):
+            # The structure highlights the companies the current user accessed
+            self.stale_tabs.add(self.structure_tab)
+        
+        if self.winfo_viewable():
+            self.on_show()
+    
+    def on_show(self):
+        """
+        Apply the changes made since the screen was last shown.
+        The log rows are reloaded in place; other stale tabs are emptied, and
+        rebuilt now if selected or else when next selected.
+        """
+        if (self.log_rows_stale and self.log_tab not in self.stale_tabs and
+                self.notebook.is_built(self.log_tab)):
+            self.reload_access_log()
+        self.log_rows_stale = False
+        
+        if self.stale_tabs:
+            self.notebook.invalidate(*self.stale_tabs)
+            self.stale_tabs = set()
     
     def clear_filters(self):
         """Reset all filters to their default values"""
@@ -456,67 +508,60 @@ This visualization shows the structure of COI Classes and the companies within t
         # Update the log
         self.update_access_log()
     
-    def get_filtered_log_data(self):
-        """Get access log data based on the selected filters"""
-        # Get all access log entries
-        all_logs = self.report_generator.get_access_log()
+    def get_filtered_log_data(self, task, user_ids, company_ids, status, date_range):
+        """
+        Get access log data matching the given filters; runs on a worker thread.
+        user_ids, company_ids: IDs to include, or [None] for all
+        """
+        # The user, company and date filters are passed down to the log so it
+        # only reads the matching entries, including spilled ones
+        start = date_range_start(date_range)
         
         # Apply filters
         filtered_logs = []
-        for log in all_logs:
-            # Check user filter
-            if self.user_filter_var.get() != "All Users" and log['user_name'] != self.user_filter_var.get():
-                continue
-            
-            # Check company filter
-            if self.company_filter_var.get() != "All Companies" and log['company_name'] != self.company_filter_var.get():
-                continue
-            
-            # Check status filter
-            if self.status_filter_var.get() == "Granted" and not log['granted']:
-                continue
-            if self.status_filter_var.get() == "Denied" and log['granted']:
-                continue
-            
-            # Check date filter
-            if self.date_filter_var.get() != "All Time":
-                log_date = datetime.datetime.strptime(log['timestamp'], "%Y-%m-%d %H:%M:%S")
-                now = datetime.datetime.now()
-                
-                if self.date_filter_var.get() == "Today":
-                    if log_date.date() != now.date():
-                        continue
-                elif self.date_filter_var.get() == "Last 7 Days":
-                    if (now - log_date).days > 7:
+        for user_id in user_ids:
+            for company_id in company_ids:
+                for read, log in enumerate(self.report_generator.get_access_log(user_id=user_id, company_id=company_id,
+                                                                                start=start), 1):
+                    if read % LOG_PROGRESS_INTERVAL == 0:
+                        task.check_cancelled()
+                        task.report_progress(None, f"{len(filtered_logs)} matching entries found")
+                    
+                    # Check status filter
+                    if status == "Granted" and not log['access_granted']:
                         continue
-                elif self.date_filter_var.get() == "Last 30 Days":
-                    if (now - log_date).days > 30:
+                    if status == "Denied" and log['access_granted']:
                         continue
-            
-            # Format the row for the table
-            status_text = "Granted" if log['granted'] else "Denied"
-            row = [
-                log['timestamp'],
-                log['user_name'],
-                log['company_name'],
-                log['object_id'],
-                status_text,
-                log['reason']
-            ]
-            filtered_logs.append(row)
+                    
+                    # Format the row for the table
+                    status_text = "Granted" if log['access_granted'] else "Denied"
+                    row = [
+                        log['timestamp'],
+                        log['user_name'],
+                        log['company_name'],
+                        log['object_id'],
+                        status_text,
+                        log['reason']
+                    ]
+                    filtered_logs.append(row)
         
         # Sort by timestamp (newest first)
         filtered_logs.sort(key=lambda x: x[0], reverse=True)
         
         return filtered_logs
     
+    def _filter_ids(self, entities, selected_name, all_label):
+        """Map a filter selection to the IDs with that name, or [None] for no filter"""
+        if selected_name == all_label:
+            return [None]
+        return [entity_id for entity_id, info in entities.items() if info['name'] == selected_name]
+    
     def update_preview(self):
         """Update the report preview"""
         # Get the report content
         report_content = self.report_generator.generate_report_preview(
-            report_type=self.report_type_var.get(),
-            date_range=self.date_range_var.get(),
-            include_charts=self.include_charts_var.get()
+            format_type=self.format_var.get(),
+            date_range=self.date_range_var.get()
         )
         
         # Update the preview text
@@ -529,7 +574,7 @@ This visualization shows the structure of COI Classes and the companies within t
         create_notification(self, "Report preview generated", "info")
     
     def export_report(self):
-        """Export the report with the selected options"""
+        """Export the report with the selected options on a worker thread"""
         # Get the file extension
         file_ext = self.format_var.get().lower()
         
@@ -547,19 +592,21 @@ This visualization shows the structure of COI Classes and the companies within t
         if not filepath:
             return  # User cancelled
         
-        try:
-            # Generate and save the report
-            self.report_generator.export_report(
-                filepath=filepath,
-                report_type=self.report_type_var.get(),
-                format_type=self.format_var.get(),
-                date_range=self.date_range_var.get(),
-                include_charts=self.include_charts_var.get()
-            )
-            
-            # Show success notification
-            create_notification(self, f"Report exported successfully to {filepath}", "success")
-            
-        except Exception as e:
-            # Show error notification
-            create_notification(self, f"Error exporting report: {str(e)}", "error")
+        # Read the options here, as Tk variables may only be read on the Tk thread
+        options = {
+            "filepath": filepath,
+            "format_type": self.format_var.get(),
+            "date_range": self.date_range_var.get()
+        }
+        
+        # Generate and save the report, then show a success or error notification
+        self.executor.run_with_progress(
+            self, "Exporting Report",
+            lambda task: self.report_generator.export_report(task=task, **options),
+            on_done=lambda result: self.notify(f"Report exported successfully to {filepath}", "success"),
+            on_error=lambda error: self.notify(f"Error exporting report: {str(error)}", "error"))
+    
+    def notify(self, message, notification_type):
+        """Show a notification, unless the screen was closed while a background task ran"""
+        if self.winfo_exists():
+            create_notification(self, message, notification_type)
@@ -0,0 +1,629 @@
+"""
+Process-Sharded Chinese Wall Model
+Partitions users over worker processes by a hash of user_id, so decisions for
+different users run on separate cores instead of sharing one interpreter.
+"""
+
+import heapq
+import multiprocessing
+import os
+import signal
+import threading
+import zlib
+from collections.abc import Mapping, Sequence
+from contextlib import ExitStack
+from operator import itemgetter
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+import numpy as np
+
+from access_log import AccessLog
+from chinese_wall_model import ChineseWallModel
+from shared_catalog import CatalogReplicaModel, SharedCatalog
+
+# Catalog operations replayed on every shard
+BROADCAST_OPERATIONS = {
+    "add_coi_class", "delete_coi_class",
+    "add_company", "update_company", "delete_company",
+    "clear_access_logs", "clear",
+}
+
+# User operations replayed only on the shard owning the user
+USER_OPERATIONS = {"add_user", "update_user", "delete_user"}
+
+# Operations that change a shared catalog, and those that change it only when it includes objects
+CATALOG_OPERATIONS = {
+    "add_coi_class", "delete_coi_class",
+    "add_company", "update_company", "delete_company", "clear",
+}
+OBJECT_OPERATIONS = {"add_object", "add_objects", "update_object", "delete_object"}
+
+# Access log entries fetched from a shard per round trip when streaming
+LOG_PAGE = 5000
+
+def shard_of(user_id: str, shards: int) -> int:
+    """Get the shard owning a user; stable across processes and runs"""
+    return zlib.crc32(user_id.encode("utf-8")) % shards
+
+class ShardWorker:
+    """Runs one shard's model in a worker process and answers its front end"""
+    
+    def __init__(self, model: ChineseWallModel):
+        self.model = model
+        
+        # Open access log streams
+        # Format: {cursor: iterator of log entry dicts}
+        self._cursors: Dict[int, Iterator[Dict[str, Any]]] = {}
+        self._next_cursor = 0
+    
+    def serve(self, connection) -> None:
+        """
+        Answer (operation, args) messages until None or a closed connection.
+        Operations are ShardWorker methods or else model methods; each reply is
+        (True, result) or (False, exception).
+        """
+        sync_catalog = getattr(self.model, "sync_catalog", None)
+        while True:
+            try:
+                message = connection.recv()
+            except EOFError:
+                return
+            if message is None:
+                return
+            
+            # Requests see the catalog as published when they were sent
+            if sync_catalog is not None:
+                sync_catalog()
+            
+            operation, args = message
+            handler = getattr(self, operation) if hasattr(ShardWorker, operation) else getattr(self.model, operation)
+            try:
+                reply = (True, handler(*args))
+            except Exception as error:
+                reply = (False, error)
+            connection.send(reply)
+    
+    def user_history(self, user_id: str) -> Optional[Dict[str, bool]]:
+        """Get a copy of a user's access history, or None for an unknown user"""
+        history = self.model.user_access_history.get(user_id)
+        return None if history is None else dict(history)
+    
+    def histories(self) -> Dict[str, List[str]]:
+        """Get every user's accessed companies, in access order"""
+        return {user_id: list(history) for user_id, history in self.model.user_access_history.items()}
+    
+    def accessible_companies(self, user_id: str) -> List[str]:
+        """Get the companies a user can access, as a list"""
+        return self.model.get_user_accessible_companies(user_id).snapshot()
+    
+    def log_length(self) -> int:
+        """Count the shard's access log entries"""
+        return len(self.model.access_logs)
+    
+    def log_records(self, include_spilled: bool) -> List[Tuple[Any, ...]]:
+        """Get the shard's access log entries as AccessLog.append() arguments"""
+        return list(self.model.access_logs.records(include_spilled))
+    
+    def log_segments(self) -> List[Tuple[str, int]]:
+        """Get the shard's spilled access log segments"""
+        return list(self.model.access_logs.segments)
+    
+    def spill_logs(self, directory: str, max_entries: int) -> None:
+        """Spill the shard's older access log entries to directory"""
+        self.model.access_logs.spill_to(directory, max_entries)
+    
+    def attach_log_segments(self, segments: List[Tuple[str, int]]) -> None:
+        """Adopt segments this shard spilled in an earlier run"""
+        self.model.access_logs.attach_segments(segments)
+    
+    def open_logs(self, *filters: Optional[str]) -> int:
+        """Start streaming the access log entries matching the filters"""
+        cursor = self._next_cursor
+        self._next_cursor += 1
+        self._cursors[cursor] = self.model.iter_access_logs(*filters)
+        return cursor
+    
+    def read_logs(self, cursor: int, count: int) -> List[Dict[str, Any]]:
+        """Get up to count more entries of a stream; a short page ends it"""
+        entries = []
+        stream = self._cursors.get(cursor, iter(()))
+        for entry in stream:
+            entries.append(entry)
+            if len(entries) == count:
+                return entries
+        self._cursors.pop(cursor, None)
+        return entries
+    
+    def close_logs(self, cursor: int) -> None:
+        """Abandon a stream"""
+        self._cursors.pop(cursor, None)
+
+def run_shard(connection, engine: type, catalog_name: Optional[str] = None) -> None:
+    """Worker process entry point; the catalog is read from catalog_name if given"""
+    # Interrupts are handled by the front end, which shuts the workers down
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    model = CatalogReplicaModel(catalog_name) if catalog_name else engine()
+    try:
+        ShardWorker(model).serve(connection)
+    finally:
+        model.close()
+
+class Shard:
+    """A worker process and the pipe to it; calls are serialized by a lock"""
+    
+    def __init__(self, context, engine: type, catalog_name: Optional[str] = None):
+        self.connection, child_connection = context.Pipe()
+        self.process = context.Process(target=run_shard, args=(child_connection, engine, catalog_name),
+                                       daemon=True)
+        self.process.start()
+        child_connection.close()
+        self.lock = threading.Lock()
+    
+    def send(self, operation: str, *args: Any) -> None:
+        """Send a request; the caller must hold the lock until it receives the reply"""
+        self.connection.send((operation, args))
+    
+    def receive(self) -> Any:
+        """Receive the reply to the last request, raising the worker's exception if it failed"""
+        succeeded, result = self.connection.recv()
+        if not succeeded:
+            raise result
+        return result
+    
+    def call(self, operation: str, *args: Any) -> Any:
+        """Run an operation on the worker and wait for its result"""
+        with self.lock:
+            self.send(operation, *args)
+            return self.receive()
+    
+    def close(self) -> None:
+        """Stop the worker process"""
+        with self.lock:
+            try:
+                self.connection.send(None)
+            except OSError:
+                pass
+            self.connection.close()
+        self.process.join(timeout=5)
+        if self.process.is_alive():
+            self.process.terminate()
+
+class AccessHistoryView(Mapping):
+    """Read-only {user_id: {company_id: True}} view over the shards' user histories"""
+    
+    def __init__(self, model: "ShardedChineseWallModel"):
+        self.model = model
+    
+    def __getitem__(self, user_id: str) -> Dict[str, bool]:
+        self.model._publish_catalog()
+        history = self.model._shard(user_id).call("user_history", user_id)
+        if history is None:
+            raise KeyError(user_id)
+        return history
+    
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.model.users)
+    
+    def __len__(self) -> int:
+        return len(self.model.users)
+    
+    def items(self) -> Iterator[Tuple[str, Dict[str, bool]]]:
+        """Yield every user's history, fetching each shard's histories in one call"""
+        self.model._publish_catalog()
+        for histories in self.model._scatter({index: ("histories",) for index in range(len(self.model._shards))}):
+            for user_id, history in histories.items():
+                yield user_id, dict.fromkeys(history, True)
+
+class ShardedAccessLog(Sequence):
+    """
+    Read-only list-like view of the shards' access logs, merged oldest first.
+
+    Entries are merged by timestamp, so entries of different users with equal
+    timestamps may come back in another order than they were logged. Each
+    shard spills to its own subdirectory, named after the shard count, so a
+    snapshot's segments can be handed back to the shards that wrote them.
+    """
+    
+    def __init__(self, model: "ShardedChineseWallModel"):
+        self.model = model
+        self.spill_directory: Optional[str] = None
+    
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        
+        length = len(self)
+        if index < 0:
+            index += length
+        if not 0 <= index < length:
+            raise IndexError("access log index out of range")
+        
+        for position, entry in enumerate(self):
+            if position == index:
+                return entry
+        raise IndexError("access log index out of range")
+    
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        return self.model.iter_access_logs()
+    
+    def __len__(self) -> int:
+        self.model._publish_catalog()
+        return sum(self.model._scatter({index: ("log_length",) for index in range(len(self.model._shards))}))
+    
+    @property
+    def segments(self) -> List[Tuple[str, int]]:
+        """Spilled segments of every shard, as paths relative to the spill directory"""
+        self.model._publish_catalog()
+        shards = len(self.model._shards)
+        segments = self.model._scatter({index: ("log_segments",) for index in range(shards)})
+        return [(os.path.join(self._shard_directory_name(index), file_name), count)
+                for index, shard_segments in enumerate(segments)
+                for file_name, count in shard_segments]
+    
+    def spill_to(self, directory: str, max_entries: int = 100000) -> None:
+        """Have each shard keep at most max_entries entries in memory and spill older ones"""
+        self.spill_directory = directory
+        shards = len(self.model._shards)
+        self.model._scatter({index: ("spill_logs", os.path.join(directory, self._shard_directory_name(index)),
+                                     max_entries)
+                             for index in range(shards)})
+    
+    def attach_segments(self, segments: Sequence[Tuple[str, int]]) -> None:
+        """
+        Adopt previously spilled segments as the oldest entries of empty logs.
+        Segments spilled by the same number of shards are handed back to their
+        shard; any others are read and their entries re-appended by user.
+        """
+        shards = len(self.model._shards)
+        owned: Dict[int, List[Tuple[str, int]]] = {index: [] for index in range(shards)}
+        foreign = []
+        for file_name, count in segments:
+            directory, _, base_name = file_name.rpartition(os.sep)
+            for index in range(shards):
+                if directory == self._shard_directory_name(index):
+                    owned[index].append((base_name, count))
+                    break
+            else:
+                foreign.append((file_name, count))
+        
+        self.model._scatter({index: ("attach_log_segments", shard_segments)
+                             for index, shard_segments in owned.items() if shard_segments})
+        
+        if foreign:
+            log = AccessLog(self.model)
+            log.spill_directory = self.spill_directory
+            log.attach_segments(foreign)
+            for record in log.records():
+                self.model._append_access_log(*record)
+    
+    def records(self, include_spilled: bool = True) -> Iterator[Tuple[str, str, str, str, bool, int, Optional[str]]]:
+        """Yield each entry as AccessLog.append() arguments, shard by shard"""
+        self.model._publish_catalog()
+        for records in self.model._scatter({index: ("log_records", include_spilled)
+                                            for index in range(len(self.model._shards))}):
+            yield from records
+    
+    def _shard_directory_name(self, index: int) -> str:
+        """Get the spill subdirectory of a shard"""
+        return os.path.join(f"shards-{len(self.model._shards)}", f"shard-{index}")
+
+class ShardedChineseWallModel(ChineseWallModel):
+    """
+    ChineseWallModel front end that partitions users over worker processes.
+
+    A decision only reads the history of the user it is about, so each user
+    belongs to one shard, chosen by a CRC32 of the user ID. Each worker runs
+    its own engine holding its users' histories and access logs. The front
+    end keeps the full catalog, including objects, so the GUI reads it as
+    before, and user changes are replayed on the user's shard.
+    user_access_history and access_logs are read-only views that fetch from
+    the shards, the logs merged by timestamp.
+
+    With shared_catalog, the workers run CatalogReplicaModel and read the
+    COI classes and companies (and objects, with share_objects) from one
+    SharedCatalog instead of each holding a copy. Catalog changes mark it
+    stale, and it is republished before the next request reaches a shard,
+    together with the history clean-ups of moved and deleted companies.
+    Otherwise each worker runs engine with its own replica of the COI
+    classes and companies, and catalog changes are replayed on every shard.
+
+    Each call on a shard is a pipe round trip, far slower than an in-process
+    decision, so throughput comes from batches: access_objects and
+    can_access_many split their work by shard and run it on every shard at
+    once, and concurrent callers reach different shards in parallel. Call
+    close() to stop the workers.
+    """
+    
+    def __init__(self, shards: Optional[int] = None, engine: type = ChineseWallModel,
+                 shared_catalog: bool = True, share_objects: bool = False):
+        super().__init__()
+        if shared_catalog and engine is not ChineseWallModel:
+            raise ValueError("a shared catalog is read by the dict engine only")
+        
+        # Catalog published to the workers, or None when each worker keeps a replica
+        self._catalog = SharedCatalog() if shared_catalog else None
+        self._share_objects = share_objects
+        self._catalog_dirty = shared_catalog
+        
+        # History clean-ups to replay on every shard once the catalog is republished
+        # Format: [(operation, *args)]
+        self._history_changes: List[Tuple[Any, ...]] = []
+        
+        context = multiprocessing.get_context("spawn")
+        catalog_name = self._catalog.name if self._catalog is not None else None
+        self._shards = [Shard(context, engine, catalog_name) for _ in range(shards or os.cpu_count() or 1)]
+        
+        self.user_access_history = AccessHistoryView(self)
+        self.access_logs = ShardedAccessLog(self)
+        self.add_mutation_listener(self._replicate)
+    
+    @property
+    def shard_count(self) -> int:
+        """Number of worker processes"""
+        return len(self._shards)
+    
+    def close(self) -> None:
+        """Stop the worker processes and remove the shared catalog"""
+        for shard in self._shards:
+            shard.close()
+        if self._catalog is not None:
+            self._catalog.close()
+            self._catalog = None
+    
+    def _shard(self, user_id: str) -> Shard:
+        """Get the shard owning a user"""
+        return self._shards[shard_of(user_id, len(self._shards))]
+    
+    def _scatter(self, requests: Dict[int, Tuple[Any, ...]]) -> List[Any]:
+        """
+        Run one (operation, *args) request on each of several shards at once
+        Returns: list of results, in shard order of the requests
+        """
+        # Shard locks are taken in index order, as by every other caller
+        order = sorted(requests)
+        with ExitStack() as stack:
+            for index in order:
+                stack.enter_context(self._shards[index].lock)
+            for index in order:
+                self._shards[index].send(*requests[index])
+            return [self._shards[index].receive() for index in order]
+    
+    def _record_mutation(self, operation: str, *args: Any) -> None:
+        """Notify the mutation listeners; inside a batch the shards still follow each change as it is made"""
+        if self._batch_mutations is not None:
+            self._replicate(operation, args)
+        super()._record_mutation(operation, *args)
+    
+    def _replicate(self, operation: str, args: Tuple[Any, ...]) -> None:
+        """Replay a catalog mutation applied here on the shards that need it"""
+        if operation == "apply_batch":
+            # Already replayed change by change
+            return
+        if operation in USER_OPERATIONS:
+            self._shard(args[0]).call(operation, *args)
+        elif self._catalog is None:
+            if operation in BROADCAST_OPERATIONS:
+                self._scatter({index: (operation, *args) for index in range(len(self._shards))})
+        else:
+            if operation in CATALOG_OPERATIONS or (self._share_objects and operation in OBJECT_OPERATIONS):
+                self._catalog_dirty = True
+            if operation in ("clear", "clear_access_logs"):
+                self._publish_catalog()
+                self._scatter({index: (operation,) for index in range(len(self._shards))})
+    
+    def _publish_catalog(self) -> None:
+        """Publish the catalog to the workers if it changed, then replay pending history clean-ups"""
+        if not self._catalog_dirty:
+            return
+        
+        # Callers hold no user locks, so taking them all cannot deadlock
+        with self.lock_all():
+            if not self._catalog_dirty:
+                return
+            self._catalog.publish(self, self._share_objects)
+            self._catalog_dirty = False
+            
+            changes, self._history_changes = self._history_changes, []
+            for change in changes:
+                self._scatter({index: change for index in range(len(self._shards))})
+    
+    def can_access(self, user_id: str, company_id: str, object_id: Optional[str] = None) -> Tuple[bool, str]:
+        """
+        Check if a user can access a company's data based on Chinese Wall rules
+        Returns: (bool, str) - (access_granted, reason)
+        """
+        self._publish_catalog()
+        with self._user_locks[hash(user_id) % self.lock_stripes]:
+            return self._shard(user_id).call("can_access", user_id, company_id)
+    
+    def can_access_many(self, user_ids: Sequence[str], company_ids: Sequence[str],
+                        with_reasons: bool = False) -> Union[np.ndarray, Tuple[np.ndarray, np.ndarray]]:
+        """
+        Check access for every (user, company) pair, each shard checking its users at once
+        Returns: bool matrix of shape (len(user_ids), len(company_ids)), plus an
+        int8 matrix of reason codes when with_reasons is True
+        """
+        self._publish_catalog()
+        rows: Dict[int, List[int]] = {}
+        for row, user_id in enumerate(user_ids):
+            rows.setdefault(shard_of(user_id, len(self._shards)), []).append(row)
+        
+        granted = np.zeros((len(user_ids), len(company_ids)), dtype=bool)
+        reasons = np.zeros(granted.shape, dtype=np.int8)
+        requests = {index: ("can_access_many", [user_ids[row] for row in shard_rows], list(company_ids), True)
+                    for index, shard_rows in rows.items()}
+        with self.lock_all():
+            for index, (shard_granted, shard_reasons) in zip(sorted(requests), self._scatter(requests)):
+                granted[rows[index]] = shard_granted
+                reasons[rows[index]] = shard_reasons
+        
+        if not with_reasons:
+            return granted
+        return granted, reasons
+    
+    def access_object(self, user_id: str, company_id: str, object_id: str, timestamp: str) -> Tuple[bool, str]:
+        """
+        Attempt to access an object and record the access
+        Returns: (bool, str) - (access_granted, reason)
+        """
+        self._publish_catalog()
+        
+        # The user's lock orders the mutation record with the shard's change
+        with self._user_locks[hash(user_id) % self.lock_stripes]:
+            result = self._shard(user_id).call("access_object", user_id, company_id, object_id, timestamp)
+            self._record_mutation("access_object", user_id, company_id, object_id, timestamp)
+        return result
+    
+    def access_objects(self, accesses: Iterable[Tuple[str, str, str, str]]) -> List[Tuple[bool, str]]:
+        """
+        Attempt a batch of (user_id, company_id, object_id, timestamp) accesses,
+        each shard running its users' part of the batch at the same time
+        Returns: [(bool, str)] - (access_granted, reason) of each access, as access_object would
+        """
+        self._publish_catalog()
+        accesses = list(accesses)
+        positions: Dict[int, List[int]] = {}
+        for position, access in enumerate(accesses):
+            positions.setdefault(shard_of(access[0], len(self._shards)), []).append(position)
+        
+        results: List[Tuple[bool, str]] = [None] * len(accesses)
+        with self._lock_users(access[0] for access in accesses):
+            requests = {index: ("access_objects", [accesses[position] for position in shard_positions])
+                        for index, shard_positions in positions.items()}
+            for index, shard_results in zip(sorted(requests), self._scatter(requests)):
+                for position, result in zip(positions[index], shard_results):
+                    results[position] = result
+            
+            if accesses:
+                self._record_mutation("access_objects", accesses)
+        return results
+    
+    def decision_cache_stats(self) -> Dict[str, int]:
+        """Get the decision cache's hits, misses, entries and capacity, summed over the shards"""
+        self._publish_catalog()
+        totals = {"hits": 0, "misses": 0, "entries": 0, "capacity": 0}
+        for stats in self._scatter({index: ("decision_cache_stats",) for index in range(len(self._shards))}):
+            for name in totals:
+                totals[name] += stats[name]
+        return totals
+    
+    def get_company_users(self, company_id: str) -> List[str]:
+        """Get the users whose access history includes a company, gathered from every shard"""
+        self._publish_catalog()
+        requests = {index: ("get_company_users", company_id) for index in range(len(self._shards))}
+        return [user_id for users in self._scatter(requests) for user_id in users]
+    
+    def check_company_users(self) -> List[str]:
+        """
+        Compare each shard's company -> users index with its user access histories
+        Returns: [str] - a description of each mismatch, prefixed by its shard; empty when consistent
+        """
+        self._publish_catalog()
+        results = self._scatter({index: ("check_company_users",) for index in range(len(self._shards))})
+        return [f"shard {index}: {problem}" for index, problems in enumerate(results) for problem in problems]
+    
+    def get_user_accessible_companies(self, user_id: str) -> List[str]:
+        """Get all companies a user can access based on their history, as a list built by their shard"""
+        self._publish_catalog()
+        return self._shard(user_id).call("accessible_companies", user_id)
+    
+    def get_company_access_by_class(self, user_id: str) -> Dict[str, List[Tuple[str, str, bool, str]]]:
+        """
+        Decide every company for one user in a single pass over the catalog, made by their shard
+        Returns: {coi_class_id: [(company_id, company_name, access_granted, reason)]} in catalog order
+        """
+        self._publish_catalog()
+        with self._user_locks[hash(user_id) % self.lock_stripes]:
+            return self._shard(user_id).call("get_company_access_by_class", user_id)
+    
+    def iter_access_logs(self, user_id: Optional[str] = None, company_id: Optional[str] = None,
+                         start: Optional[str] = None, end: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+        """Stream the access logs matching all the given filters, merged from the shards oldest first"""
+        self._publish_catalog()
+        filters = (user_id, company_id, start, end)
+        if user_id is not None:
+            return self._stream_logs(self._shard(user_id), filters)
+        return heapq.merge(*(self._stream_logs(shard, filters) for shard in self._shards),
+                           key=itemgetter("timestamp"))
+    
+    def _stream_logs(self, shard: Shard, filters: Tuple[Optional[str], ...]) -> Iterator[Dict[str, Any]]:
+        """Stream one shard's matching log entries a page at a time"""
+        cursor = shard.call("open_logs", *filters)
+        finished = False
+        try:
+            while not finished:
+                page = shard.call("read_logs", cursor, LOG_PAGE)
+                finished = len(page) < LOG_PAGE
+                yield from page
+        finally:
+            if not finished:
+                shard.call("close_logs", cursor)
+    
+    def reset_user_history(self, user_id: str) -> bool:
+        """Reset a user's access history"""
+        self._publish_catalog()
+        with self._user_locks[hash(user_id) % self.lock_stripes]:
+            if not self._shard(user_id).call("reset_user_history", user_id):
+                return False
+            self._record_mutation("reset_user_history", user_id)
+        return True
+    
+    def revoke_access(self, user_id: str, company_id: str) -> bool:
+        """Remove one company from a user's access history on their shard"""
+        self._publish_catalog()
+        with self._user_locks[hash(user_id) % self.lock_stripes]:
+            if not self._shard(user_id).call("revoke_access", user_id, company_id):
+                return False
+            self._record_mutation("revoke_access", user_id, company_id)
+        return True
+    
+    def find_wall_violations(self, company_id: str) -> List[Dict[str, Any]]:
+        """
+        Find the users holding a company together with others of its COI class,
+        each shard examining its own users
+        Returns: [{"user_id", "company_id", "coi_class", "conflicting_companies"}]
+        """
+        self._publish_catalog()
+        requests = {index: ("find_wall_violations", company_id) for index in range(len(self._shards))}
+        return [violation for violations in self._scatter(requests) for violation in violations]
+    
+    def _record_access(self, user_id: str, company_id: str) -> None:
+        """Add a company to a user's access history on their shard"""
+        self._publish_catalog()
+        self._shard(user_id).call("_record_access", user_id, company_id)
+    
+    def _append_access_log(self, timestamp: str, user_id: str, company_id: str, object_id: str,
+                           access_granted: bool, reason_code: int, reason_company_id: Optional[str]) -> None:
+        """Store an access log entry on the user's shard"""
+        self._publish_catalog()
+        self._shard(user_id).call("_append_access_log", timestamp, user_id, company_id, object_id,
+                                  access_granted, reason_code, reason_company_id)
+    
+    # Histories and logs live on the shards, which apply these changes
+    # themselves when the mutation is replicated, or for a shared catalog
+    # when it is next published
+    
+    def _reset_access_logs(self) -> None:
+        """Logs are cleared by each shard"""
+    
+    def _init_user_history(self, user_id: str) -> None:
+        """Histories are created by the user's shard"""
+    
+    def _clear_user_history(self, user_id: str) -> None:
+        """Histories are cleared by the user's shard"""
+    
+    def _drop_user_history(self, user_id: str) -> None:
+        """Histories are dropped by the user's shard"""
+    
+    def _reset_histories(self) -> None:
+        """Histories are reset by each shard"""
+    
+    def _reindex_moved_company(self, company_id: str, old_coi_class_id: str) -> None:
+        """Histories are re-indexed by each shard"""
+        if self._catalog is not None:
+            self._history_changes.append(("_reindex_moved_company", company_id, old_coi_class_id))
+    
+    def _remove_company_from_histories(self, company_id: str, coi_class_id: str) -> None:
+        """Histories are cleaned up by each shard"""
+        if self._catalog is not None:
+            self._history_changes.append(("_remove_company_from_histories", company_id, coi_class_id))
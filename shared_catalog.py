@@ -0,0 +1,388 @@
+"""
+Shared-Memory Catalog for the Chinese Wall Model
+Publishes the COI classes, companies and (optionally) objects of a model in a
+fixed binary layout in shared memory, so worker processes read one copy.
+"""
+
+import struct
+import zlib
+from collections.abc import Mapping
+from multiprocessing import shared_memory
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from chinese_wall_model import ChineseWallModel, exclusive
+
+CATALOG_MAGIC = b"CWCATLG1"
+CONTROL_MAGIC = b"CWCTRL01"
+
+# Sections of a catalog block, in layout order, with the type of their items
+SECTIONS = (
+    ("class_offsets", "q"), ("class_ids", "B"), ("class_slots", "i"),
+    ("company_offsets", "q"), ("company_ids", "B"), ("company_slots", "i"),
+    ("name_offsets", "q"), ("names", "B"), ("company_classes", "i"),
+    ("object_starts", "q"), ("object_offsets", "q"), ("object_ids", "B"),
+    ("payload_offsets", "q"), ("payloads", "B"),
+)
+
+# Block header: magic, generation, then the (offset, size) of every section in bytes
+HEADER = struct.Struct("<8sQ" + "QQ" * len(SECTIONS))
+
+# Control block: magic, sequence number (odd while a publish is being written),
+# generation and the name of the current catalog block
+CONTROL = struct.Struct("<8sQQ64s")
+
+NO_SLOT = -1
+
+def pack_strings(values: Sequence[str]) -> Tuple[np.ndarray, bytes, List[bytes]]:
+    """Encode strings as an offsets array and a UTF-8 blob; also returns the encoded strings"""
+    encoded = [value.encode("utf-8") for value in values]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(value) for value in encoded], out=offsets[1:])
+    return offsets, b"".join(encoded), encoded
+
+def hash_slots(encoded: Sequence[bytes]) -> np.ndarray:
+    """Build an open-addressing table mapping CRC32 slots to string indexes"""
+    size = 1
+    while size < 2 * len(encoded):
+        size *= 2
+    slots = np.full(size, NO_SLOT, dtype=np.int32)
+    mask = size - 1
+    for index, value in enumerate(encoded):
+        slot = zlib.crc32(value) & mask
+        while slots[slot] != NO_SLOT:
+            slot = (slot + 1) & mask
+        slots[slot] = index
+    return slots
+
+class StringTable:
+    """Read-only strings of a catalog block, with lookup of a string's index"""
+    
+    def __init__(self, offsets: memoryview, blob: memoryview, slots: Optional[memoryview] = None):
+        self.offsets = offsets
+        self.blob = blob
+        self.slots = slots
+    
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+    
+    def __getitem__(self, index: int) -> str:
+        return self.blob[self.offsets[index]:self.offsets[index + 1]].tobytes().decode("utf-8")
+    
+    def find(self, value: str) -> int:
+        """Get the index of a string, or NO_SLOT if it is not in the table"""
+        encoded = value.encode("utf-8")
+        slots, offsets, blob = self.slots, self.offsets, self.blob
+        mask = len(slots) - 1
+        slot = zlib.crc32(encoded) & mask
+        while True:
+            index = slots[slot]
+            if index == NO_SLOT or blob[offsets[index]:offsets[index + 1]].tobytes() == encoded:
+                return index
+            slot = (slot + 1) & mask
+
+class CatalogBlock:
+    """An attached catalog block, read in place"""
+    
+    def __init__(self, name: str):
+        self.memory = shared_memory.SharedMemory(name=name)
+        fields = HEADER.unpack_from(self.memory.buf)
+        if fields[0] != CATALOG_MAGIC:
+            self.memory.close()
+            raise ValueError(f"{name} is not a catalog block")
+        self.generation = fields[1]
+        
+        # Every memoryview of the block, released before it is closed
+        self._views: List[memoryview] = []
+        sections: Dict[str, memoryview] = {}
+        for i, (section, item_type) in enumerate(SECTIONS):
+            offset, size = fields[2 + 2 * i], fields[3 + 2 * i]
+            raw = self.memory.buf[offset:offset + size]
+            view = raw.cast(item_type)
+            self._views += [view, raw]
+            sections[section] = view
+        
+        self.classes = StringTable(sections["class_offsets"], sections["class_ids"], sections["class_slots"])
+        self.company_ids = StringTable(sections["company_offsets"], sections["company_ids"], sections["company_slots"])
+        self.names = StringTable(sections["name_offsets"], sections["names"])
+        self.company_classes = sections["company_classes"]
+        self.object_starts = sections["object_starts"]
+        self.object_ids = StringTable(sections["object_offsets"], sections["object_ids"])
+        self.payloads = StringTable(sections["payload_offsets"], sections["payloads"])
+        
+        # COI class IDs are few and read on every decision, so they are decoded once
+        self.class_ids = [self.classes[i] for i in range(len(self.classes))]
+    
+    def objects(self, company_index: int) -> Dict[str, str]:
+        """Get the objects of a company, or an empty dict if objects were not published"""
+        if not len(self.object_starts):
+            return {}
+        object_ids, payloads = self.object_ids, self.payloads
+        return {object_ids[i]: payloads[i]
+                for i in range(self.object_starts[company_index], self.object_starts[company_index + 1])}
+    
+    def close(self) -> None:
+        """Detach from the block"""
+        for view in self._views:
+            view.release()
+        self.memory.close()
+
+class CompanyView(Mapping):
+    """Read-only {company_id: {"name": name, "coi_class": coi_class_id}} view of a catalog block"""
+    
+    def __init__(self, block: CatalogBlock):
+        self.block = block
+    
+    def __getitem__(self, company_id: str) -> Dict[str, str]:
+        company_info = self.get(company_id)
+        if company_info is None:
+            raise KeyError(company_id)
+        return company_info
+    
+    def get(self, company_id: str, default: Any = None) -> Any:
+        block = self.block
+        index = block.company_ids.find(company_id)
+        if index == NO_SLOT:
+            return default
+        return {"name": block.names[index], "coi_class": block.class_ids[block.company_classes[index]]}
+    
+    def __contains__(self, company_id: object) -> bool:
+        return isinstance(company_id, str) and self.block.company_ids.find(company_id) != NO_SLOT
+    
+    def __iter__(self) -> Iterator[str]:
+        company_ids = self.block.company_ids
+        return (company_ids[i] for i in range(len(company_ids)))
+    
+    def __len__(self) -> int:
+        return len(self.block.company_ids)
+
+class CompanyObjectsView(Mapping):
+    """Read-only {company_id: {object_id: object_data}} view of a catalog block"""
+    
+    def __init__(self, block: CatalogBlock):
+        self.block = block
+    
+    def __getitem__(self, company_id: str) -> Dict[str, str]:
+        index = self.block.company_ids.find(company_id)
+        if index == NO_SLOT:
+            raise KeyError(company_id)
+        return self.block.objects(index)
+    
+    def __iter__(self) -> Iterator[str]:
+        return iter(CompanyView(self.block))
+    
+    def __len__(self) -> int:
+        return len(self.block.company_ids)
+
+class CoiClassView(Mapping):
+    """Read-only {coi_class_id: {company_id: {object_id: object_data}}} view of a catalog block"""
+    
+    def __init__(self, block: CatalogBlock):
+        self.block = block
+    
+    def __getitem__(self, coi_class_id: str) -> Dict[str, Dict[str, str]]:
+        block = self.block
+        class_index = block.classes.find(coi_class_id)
+        if class_index == NO_SLOT:
+            raise KeyError(coi_class_id)
+        return {block.company_ids[i]: block.objects(i)
+                for i in range(len(block.company_ids)) if block.company_classes[i] == class_index}
+    
+    def __contains__(self, coi_class_id: object) -> bool:
+        return isinstance(coi_class_id, str) and self.block.classes.find(coi_class_id) != NO_SLOT
+    
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.block.class_ids)
+    
+    def __len__(self) -> int:
+        return len(self.block.class_ids)
+
+class SharedCatalog:
+    """
+    Writer side of a shared catalog.
+
+    Each publish() writes the whole catalog into a new shared memory block
+    and then points a small control block at it, bumping its generation.
+    Readers check the generation and attach the new block when it changes,
+    so a catalog block is never modified after it has been published.
+    Superseded blocks are unlinked at once; readers still attached to them
+    keep reading them until they move on.
+    """
+    
+    def __init__(self):
+        self.control = shared_memory.SharedMemory(create=True, size=CONTROL.size)
+        self.generation = 0
+        self._block: Optional[shared_memory.SharedMemory] = None
+        self._write_control(0, b"")
+    
+    @property
+    def name(self) -> str:
+        """Name readers attach to"""
+        return self.control.name
+    
+    def publish(self, model: ChineseWallModel, with_objects: bool = False) -> None:
+        """Write the model's catalog as the next generation; objects are included if with_objects"""
+        class_ids = list(model.coi_classes)
+        class_offsets, class_blob, encoded_classes = pack_strings(class_ids)
+        class_positions = {coi_class_id: i for i, coi_class_id in enumerate(class_ids)}
+        
+        company_ids = list(model.companies)
+        company_offsets, company_blob, encoded_companies = pack_strings(company_ids)
+        name_offsets, name_blob, _ = pack_strings([model.companies[company_id]["name"] for company_id in company_ids])
+        company_classes = np.array([class_positions[model.companies[company_id]["coi_class"]]
+                                    for company_id in company_ids], dtype=np.int32)
+        
+        object_ids: List[str] = []
+        payloads: List[str] = []
+        object_starts = np.zeros(len(company_ids) + 1 if with_objects else 0, dtype=np.int64)
+        if with_objects:
+            for i, company_id in enumerate(company_ids):
+                company_objects = model.company_objects[company_id]
+                object_ids.extend(company_objects)
+                payloads.extend(company_objects.values())
+                object_starts[i + 1] = len(object_ids)
+        object_offsets, object_blob, _ = pack_strings(object_ids)
+        payload_offsets, payload_blob, _ = pack_strings(payloads)
+        
+        self.generation += 1
+        sections = {
+            "class_offsets": class_offsets, "class_ids": class_blob, "class_slots": hash_slots(encoded_classes),
+            "company_offsets": company_offsets, "company_ids": company_blob,
+            "company_slots": hash_slots(encoded_companies),
+            "name_offsets": name_offsets, "names": name_blob, "company_classes": company_classes,
+            "object_starts": object_starts, "object_offsets": object_offsets, "object_ids": object_blob,
+            "payload_offsets": payload_offsets, "payloads": payload_blob,
+        }
+        block = self._write_block(sections)
+        
+        previous, self._block = self._block, block
+        self._write_control(self.generation, block.name.encode("ascii"))
+        if previous is not None:
+            previous.close()
+            previous.unlink()
+    
+    def close(self) -> None:
+        """Unlink the control block and the current catalog block"""
+        for memory in (self._block, self.control):
+            if memory is not None:
+                memory.close()
+                memory.unlink()
+        self._block = None
+    
+    def _write_block(self, sections: Dict[str, Any]) -> shared_memory.SharedMemory:
+        """Lay the sections out, 8-byte aligned, in a new shared memory block"""
+        data = [bytes(sections[section]) if isinstance(sections[section], bytes)
+                else sections[section].tobytes() for section, _ in SECTIONS]
+        placements = []
+        offset = HEADER.size
+        for section_bytes in data:
+            offset = (offset + 7) & ~7
+            placements.append((offset, len(section_bytes)))
+            offset += len(section_bytes)
+        
+        block = shared_memory.SharedMemory(create=True, size=max(offset, 1))
+        HEADER.pack_into(block.buf, 0, CATALOG_MAGIC, self.generation,
+                         *(value for placement in placements for value in placement))
+        for (offset, size), section_bytes in zip(placements, data):
+            block.buf[offset:offset + size] = section_bytes
+        return block
+    
+    def _write_control(self, generation: int, block_name: bytes) -> None:
+        """Point the control block at a catalog block, as a seqlock write"""
+        buf = self.control.buf
+        sequence = CONTROL.unpack_from(buf)[1]
+        struct.pack_into("<Q", buf, 8, sequence + 1)
+        CONTROL.pack_into(buf, 0, CONTROL_MAGIC, sequence + 1, generation, block_name)
+        struct.pack_into("<Q", buf, 8, sequence + 2)
+
+class CatalogReader:
+    """Reader side of a shared catalog: attaches the current block by generation"""
+    
+    def __init__(self, name: str):
+        self.control = shared_memory.SharedMemory(name=name)
+        self.block: Optional[CatalogBlock] = None
+    
+    @property
+    def generation(self) -> int:
+        """Generation of the attached block, 0 before the first publish"""
+        return 0 if self.block is None else self.block.generation
+    
+    def sync(self) -> bool:
+        """Attach the newest published block if it changed; returns whether it did"""
+        while True:
+            _, sequence, generation, block_name = CONTROL.unpack_from(self.control.buf)
+            if generation == self.generation:
+                return False
+            if sequence % 2:
+                continue
+            
+            try:
+                block = CatalogBlock(block_name.rstrip(b"\0").decode("ascii"))
+            except FileNotFoundError:
+                # Superseded while attaching; read the control block again
+                continue
+            if CONTROL.unpack_from(self.control.buf)[1] != sequence:
+                block.close()
+                continue
+            
+            if self.block is not None:
+                self.block.close()
+            self.block = block
+            return True
+    
+    def close(self) -> None:
+        """Detach from the catalog"""
+        if self.block is not None:
+            self.block.close()
+            self.block = None
+        self.control.close()
+
+class CatalogReplicaModel(ChineseWallModel):
+    """
+    ChineseWallModel whose COI classes, companies and objects are read from a
+    SharedCatalog instead of being held in dicts.
+
+    Used by shard workers: users, histories and access logs stay local, and
+    the catalog views follow the published generation on sync_catalog().
+    Catalog mutations are made on the publishing model only.
+    """
+    
+    def __init__(self, catalog_name: str):
+        super().__init__()
+        self.catalog = CatalogReader(catalog_name)
+        self.sync_catalog()
+    
+    def sync_catalog(self) -> None:
+        """Switch the catalog views to the newest published generation"""
+        if self.catalog.sync():
+            self._catalog_version += 1
+            block = self.catalog.block
+            self.coi_classes = CoiClassView(block)
+            self.companies = CompanyView(block)
+            self.company_objects = CompanyObjectsView(block)
+    
+    @exclusive
+    def clear(self) -> None:
+        """Remove all users, histories and logs; the catalog is cleared by its publisher"""
+        self.users = {}
+        self._reset_histories()
+        self._reset_access_logs()
+        self._record_mutation("clear")
+    
+    def _rebuild_user_coi_index(self, user_id: str) -> None:
+        """
+        Recompute a user's COI class index from their access history, skipping
+        companies already deleted from the catalog whose clean-up is still to come
+        """
+        index: Dict[str, str] = {}
+        companies = self.companies
+        for company_id in self.user_access_history.get(user_id, {}):
+            company_info = companies.get(company_id)
+            if company_info is not None:
+                index.setdefault(company_info["coi_class"], company_id)
+        self.user_coi_index[user_id] = index
+    
+    def close(self) -> None:
+        """Detach from the shared catalog"""
+        self.catalog.close()
@@ -0,0 +1,370 @@
+"""
+SQLite-backed Chinese Wall Model Implementation
+Stores the catalog, per-user access histories and access logs in a local
+SQLite database so reports can be answered with indexed queries.
+"""
+
+import sqlite3
+from typing import AbstractSet, Any, Dict, Iterable, Iterator, List, Mapping, Optional, Sequence, Tuple
+
+from chinese_wall_model import ChineseWallModel, exclusive
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS coi_classes (
+    coi_class_id TEXT PRIMARY KEY,
+    name TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS companies (
+    company_id TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    coi_class_id TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS companies_by_coi_class ON companies (coi_class_id);
+CREATE TABLE IF NOT EXISTS objects (
+    company_id TEXT NOT NULL,
+    object_id TEXT NOT NULL,
+    object_data TEXT NOT NULL,
+    PRIMARY KEY (company_id, object_id)
+);
+CREATE TABLE IF NOT EXISTS users (
+    user_id TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    role TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS user_history (
+    user_id TEXT NOT NULL,
+    company_id TEXT NOT NULL,
+    coi_class_id TEXT NOT NULL,
+    UNIQUE (user_id, company_id)
+);
+CREATE INDEX IF NOT EXISTS user_history_by_coi_class ON user_history (user_id, coi_class_id);
+CREATE INDEX IF NOT EXISTS user_history_by_company ON user_history (company_id);
+CREATE TABLE IF NOT EXISTS access_logs (
+    timestamp TEXT NOT NULL,
+    user_id TEXT NOT NULL,
+    user_name TEXT NOT NULL,
+    company_id TEXT NOT NULL,
+    company_name TEXT NOT NULL,
+    object_id TEXT NOT NULL,
+    access_granted INTEGER NOT NULL,
+    reason TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS access_logs_by_user ON access_logs (user_id, timestamp);
+CREATE INDEX IF NOT EXISTS access_logs_by_company ON access_logs (company_id, timestamp);
+CREATE INDEX IF NOT EXISTS access_logs_by_timestamp ON access_logs (timestamp);
+"""
+
+# Columns of an access log row, in table order
+LOG_COLUMNS = ("timestamp", "user_id", "user_name", "company_id", "company_name",
+               "object_id", "access_granted", "reason")
+
+# The statements below are issued as constant strings so sqlite3 reuses the
+# prepared statement from its per-connection cache on every call
+HELD_COMPANY_SQL = ("SELECT company_id FROM user_history WHERE user_id = ? AND coi_class_id = ? "
+                    "ORDER BY company_id = ? DESC, rowid LIMIT 1")
+HELD_CLASSES_SQL = "SELECT DISTINCT coi_class_id FROM user_history WHERE user_id = ?"
+COMPANY_USERS_SQL = "SELECT user_id FROM user_history WHERE company_id = ?"
+HISTORY_SQL = "SELECT company_id FROM user_history WHERE user_id = ? ORDER BY rowid"
+HAS_ACCESSED_SQL = "SELECT 1 FROM user_history WHERE user_id = ? AND company_id = ?"
+RECORD_ACCESS_SQL = "INSERT OR IGNORE INTO user_history VALUES (?, ?, ?)"
+INSERT_LOG_SQL = f"INSERT INTO access_logs VALUES ({', '.join('?' * len(LOG_COLUMNS))})"
+SELECT_LOGS_SQL = f"SELECT {', '.join(LOG_COLUMNS)} FROM access_logs"
+
+# Rows fetched per lock acquisition when streaming query results
+FETCH_ROWS = 1000
+
+def log_entry_from_row(row: Tuple[Any, ...]) -> Dict[str, Any]:
+    """Convert an access_logs row to the model's log entry dict"""
+    log_entry = dict(zip(LOG_COLUMNS, row))
+    log_entry["access_granted"] = bool(log_entry["access_granted"])
+    return log_entry
+
+class UserHistoryView(Mapping):
+    """Read-only {company_id: True} view of a single user's access history"""
+    
+    def __init__(self, model: "SQLiteChineseWallModel", user_id: str):
+        self.model = model
+        self.user_id = user_id
+    
+    def __getitem__(self, company_id: str) -> bool:
+        if self.model._connection.execute(HAS_ACCESSED_SQL, (self.user_id, company_id)).fetchone() is None:
+            raise KeyError(company_id)
+        return True
+    
+    def __iter__(self) -> Iterator[str]:
+        rows = self.model._connection.execute(HISTORY_SQL, (self.user_id,)).fetchall()
+        return (company_id for company_id, in rows)
+    
+    def __len__(self) -> int:
+        return self.model._connection.execute(
+            "SELECT COUNT(*) FROM user_history WHERE user_id = ?", (self.user_id,)).fetchone()[0]
+
+class AccessHistoryView(Mapping):
+    """Read-only {user_id: {company_id: True}} view over all user histories"""
+    
+    def __init__(self, model: "SQLiteChineseWallModel"):
+        self.model = model
+    
+    def __getitem__(self, user_id: str) -> UserHistoryView:
+        if user_id not in self.model.users:
+            raise KeyError(user_id)
+        return UserHistoryView(self.model, user_id)
+    
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.model.users)
+    
+    def __len__(self) -> int:
+        return len(self.model.users)
+
+class AccessLogView(Sequence):
+    """Read-only list-like view of the access_logs table, oldest first"""
+    
+    def __init__(self, model: "SQLiteChineseWallModel"):
+        self.model = model
+    
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        
+        with self.model.lock_all():
+            length = len(self)
+            if index < 0:
+                index += length
+            if not 0 <= index < length:
+                raise IndexError("access log index out of range")
+            
+            row = self.model._connection.execute(
+                f"{SELECT_LOGS_SQL} ORDER BY rowid LIMIT 1 OFFSET ?", (index,)).fetchone()
+        return log_entry_from_row(row)
+    
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        return self.model.iter_access_logs()
+    
+    def __len__(self) -> int:
+        with self.model.lock_all():
+            self.model._flush_access_logs()
+            return self.model._connection.execute("SELECT COUNT(*) FROM access_logs").fetchone()[0]
+
+class SQLiteChineseWallModel(ChineseWallModel):
+    """
+    ChineseWallModel engine persisted in a SQLite database.
+
+    COI classes, companies, objects and users are mirrored to the database
+    and loaded back on start, so the dicts read by the GUI stay available.
+    Access histories and access logs live only in the database:
+    user_access_history and access_logs are read-only views over their tables.
+    The connection is shared, so model calls are serialized by a single lock.
+    Each decision is one indexed lookup on (user, COI class). History and
+    catalog changes are committed with synchronous=FULL before the mutation
+    that made them returns, so a grant is never lost to a crash. Batched
+    calls (access_objects, apply_batch) commit once for the whole batch.
+    Only log rows are buffered. They are inserted with executemany every
+    batch_size entries; call commit() or close() to write the rest.
+    """
+    
+    lock_stripes = 1
+    
+    def __init__(self, path: str = ":memory:", batch_size: int = 10000):
+        super().__init__()
+        self.path = path
+        self.batch_size = batch_size
+        
+        # Access log rows waiting for the next batched insert
+        # Format: [(timestamp, user_id, user_name, company_id, company_name, object_id, granted, reason)]
+        self._pending_logs: List[Tuple[Any, ...]] = []
+        
+        self._connection = sqlite3.connect(path, cached_statements=256, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=FULL")
+        self._connection.execute("PRAGMA cache_size=-65536")
+        self._connection.executescript(SCHEMA)
+        
+        self.user_access_history = AccessHistoryView(self)
+        self.access_logs = AccessLogView(self)
+        self._load_catalog()
+        self.add_mutation_listener(self._store_mutation)
+    
+    @exclusive
+    def commit(self) -> None:
+        """Write buffered log entries and commit all pending changes"""
+        self._flush_access_logs()
+        self._connection.commit()
+    
+    @exclusive
+    def close(self) -> None:
+        """Commit pending changes and close the database"""
+        self.commit()
+        self._connection.close()
+    
+    def iter_access_logs(self, user_id: Optional[str] = None, company_id: Optional[str] = None,
+                         start: Optional[str] = None, end: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+        """Stream the access logs matching all the given filters from the database, oldest first"""
+        conditions = []
+        parameters = []
+        for column, operator, value in (("user_id", "=", user_id), ("company_id", "=", company_id),
+                                        ("timestamp", ">=", start), ("timestamp", "<=", end)):
+            if value is not None:
+                conditions.append(f"{column} {operator} ?")
+                parameters.append(value)
+        
+        query = SELECT_LOGS_SQL
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        
+        return self._stream_rows(query + " ORDER BY rowid", parameters)
+    
+    def _stream_rows(self, query: str, parameters: List[Any]) -> Iterator[Dict[str, Any]]:
+        """Yield the log entries of a query, fetching rows in chunks under the model lock"""
+        with self.lock_all():
+            self._flush_access_logs()
+            cursor = self._connection.execute(query, parameters)
+        while True:
+            with self.lock_all():
+                rows = cursor.fetchmany(FETCH_ROWS)
+            if not rows:
+                return
+            yield from map(log_entry_from_row, rows)
+    
+    def _load_catalog(self) -> None:
+        """Fill the catalog dicts from the database"""
+        connection = self._connection
+        for coi_class_id, name in connection.execute("SELECT coi_class_id, name FROM coi_classes ORDER BY rowid"):
+            super().add_coi_class(coi_class_id, name)
+        for company_id, name, coi_class_id in connection.execute(
+                "SELECT company_id, name, coi_class_id FROM companies ORDER BY rowid"):
+            super().add_company(company_id, name, coi_class_id)
+        super().add_objects(connection.execute(
+            "SELECT company_id, object_id, object_data FROM objects ORDER BY rowid"))
+        for user_id, name, role in connection.execute("SELECT user_id, name, role FROM users ORDER BY rowid"):
+            super().add_user(user_id, name, role)
+    
+    def _store_mutation(self, operation: str, args: Tuple[Any, ...]) -> None:
+        """Mirror a catalog mutation to the database and commit it with the history rows it changed"""
+        self._store_operation(operation, args)
+        self._connection.commit()
+    
+    def _store_operation(self, operation: str, args: Tuple[Any, ...]) -> None:
+        """Mirror one catalog mutation to the database, without committing"""
+        store = getattr(self, f"_store_{operation}", None)
+        if store is not None:
+            store(*args)
+    
+    def _store_add_coi_class(self, coi_class_id: str, name: str) -> None:
+        self._connection.execute("INSERT INTO coi_classes VALUES (?, ?)", (coi_class_id, name))
+    
+    def _store_delete_coi_class(self, coi_class_id: str) -> None:
+        self._connection.execute("DELETE FROM coi_classes WHERE coi_class_id = ?", (coi_class_id,))
+    
+    def _store_add_company(self, company_id: str, name: str, coi_class_id: str) -> None:
+        self._connection.execute("INSERT INTO companies VALUES (?, ?, ?)", (company_id, name, coi_class_id))
+    
+    def _store_update_company(self, company_id: str, name: str, coi_class_id: str) -> None:
+        self._connection.execute("UPDATE companies SET name = ?, coi_class_id = ? WHERE company_id = ?",
+                                 (name, coi_class_id, company_id))
+    
+    def _store_delete_company(self, company_id: str) -> None:
+        self._connection.execute("DELETE FROM companies WHERE company_id = ?", (company_id,))
+        self._connection.execute("DELETE FROM objects WHERE company_id = ?", (company_id,))
+    
+    def _store_add_object(self, company_id: str, object_id: str, object_data: str) -> None:
+        self._store_add_objects([(company_id, object_id, object_data)])
+    
+    def _store_add_objects(self, objects: List[Tuple[str, str, str]]) -> None:
+        self._connection.executemany("INSERT OR REPLACE INTO objects VALUES (?, ?, ?)", objects)
+    
+    def _store_update_object(self, company_id: str, object_id: str, object_data: str) -> None:
+        self._connection.execute("UPDATE objects SET object_data = ? WHERE company_id = ? AND object_id = ?",
+                                 (object_data, company_id, object_id))
+    
+    def _store_delete_object(self, company_id: str, object_id: str) -> None:
+        self._connection.execute("DELETE FROM objects WHERE company_id = ? AND object_id = ?",
+                                 (company_id, object_id))
+    
+    def _store_add_user(self, user_id: str, name: str, role: str) -> None:
+        self._connection.execute("INSERT INTO users VALUES (?, ?, ?)", (user_id, name, role))
+    
+    def _store_update_user(self, user_id: str, name: str, role: str) -> None:
+        self._connection.execute("UPDATE users SET name = ?, role = ? WHERE user_id = ?", (name, role, user_id))
+    
+    def _store_delete_user(self, user_id: str) -> None:
+        self._connection.execute("DELETE FROM users WHERE user_id = ?", (user_id,))
+    
+    def _store_apply_batch(self, operations: List[Tuple[str, Tuple[Any, ...]]]) -> None:
+        for operation, args in operations:
+            self._store_operation(operation, args)
+    
+    def _store_clear(self) -> None:
+        for table in ("coi_classes", "companies", "objects", "users"):
+            self._connection.execute(f"DELETE FROM {table}")
+        self.commit()
+    
+    def _accessed_company_in_class(self, user_id: str, coi_class_id: str,
+                                   company_id: Optional[str] = None) -> Optional[str]:
+        """
+        Return the company the user has accessed in a COI class, if any.
+        company_id is returned itself when the user has already accessed it.
+        """
+        row = self._connection.execute(HELD_COMPANY_SQL, (user_id, coi_class_id, company_id)).fetchone()
+        return row[0] if row is not None else None
+    
+    def _held_coi_classes(self, user_id: str) -> AbstractSet[str]:
+        """Get the COI classes in which a user has accessed a company"""
+        return {row[0] for row in self._connection.execute(HELD_CLASSES_SQL, (user_id,))}
+    
+    def _record_access(self, user_id: str, company_id: str) -> None:
+        """Add a company to a user's access history"""
+        self._connection.execute(RECORD_ACCESS_SQL,
+                                 (user_id, company_id, self.companies[company_id]["coi_class"]))
+    
+    def _append_access_log(self, timestamp: str, user_id: str, company_id: str, object_id: str,
+                           access_granted: bool, reason_code: int, reason_company_id: Optional[str]) -> None:
+        """Buffer an access log entry for the next batched insert"""
+        self._pending_logs.append((timestamp, user_id, self.users.get(user_id, {}).get("name", "Unknown"),
+                                   company_id, self.companies.get(company_id, {}).get("name", "Unknown"),
+                                   object_id, access_granted, self.format_reason(reason_code, reason_company_id)))
+        if len(self._pending_logs) >= self.batch_size:
+            self._flush_access_logs()
+    
+    def _flush_access_logs(self) -> None:
+        """Insert the buffered access log entries"""
+        if self._pending_logs:
+            self._connection.executemany(INSERT_LOG_SQL, self._pending_logs)
+            self._pending_logs = []
+    
+    def _reset_access_logs(self) -> None:
+        """Delete all stored access log entries"""
+        self._pending_logs = []
+        self._connection.execute("DELETE FROM access_logs")
+    
+    def _init_user_history(self, user_id: str) -> None:
+        """New users start without history rows"""
+    
+    def _clear_user_history(self, user_id: str) -> None:
+        """Empty a user's access history"""
+        self._connection.execute("DELETE FROM user_history WHERE user_id = ?", (user_id,))
+    
+    def _forget_access(self, user_id: str, company_id: str) -> None:
+        """Remove one company from a user's access history"""
+        self._connection.execute("DELETE FROM user_history WHERE user_id = ? AND company_id = ?",
+                                 (user_id, company_id))
+    
+    def _drop_user_history(self, user_id: str) -> None:
+        """Forget the access history of a deleted user"""
+        self._clear_user_history(user_id)
+    
+    def _reset_histories(self) -> None:
+        """Forget the access histories of all users"""
+        self._connection.execute("DELETE FROM user_history")
+    
+    def _company_users(self, company_id: str) -> Iterable[str]:
+        """Get the users whose access history includes a company, from the user_history_by_company index"""
+        return [row[0] for row in self._connection.execute(COMPANY_USERS_SQL, (company_id,))]
+    
+    def _reindex_moved_company(self, company_id: str, old_coi_class_id: str) -> None:
+        """Re-file a moved company under its new COI class in affected histories"""
+        self._connection.execute("UPDATE user_history SET coi_class_id = ? WHERE company_id = ?",
+                                 (self.companies[company_id]["coi_class"], company_id))
+    
+    def _remove_company_from_histories(self, company_id: str, coi_class_id: str) -> None:
+        """Remove a deleted company from every user's access history"""
+        self._connection.execute("DELETE FROM user_history WHERE company_id = ?", (company_id,))
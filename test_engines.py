@@ -0,0 +1,74 @@
+"""
+Tests that the model engines agree
+Run with: python -m unittest test_engines
+"""
+
+import random
+import unittest
+
+from bitset_model import BitsetChineseWallModel
+from chinese_wall_model import ChineseWallModel
+from data_manager import DataManager
+from sharded_model import ShardedChineseWallModel
+from sqlite_model import SQLiteChineseWallModel
+
+class EngineEquivalenceTest(unittest.TestCase):
+    def run_random_operations(self, seed):
+        """Apply the same random mutations to every engine and compare decisions and histories"""
+        engines = [ChineseWallModel(), BitsetChineseWallModel(), SQLiteChineseWallModel(":memory:")]
+        for model in engines:
+            DataManager(model).initialize_sample_data()
+        reference = engines[0]
+        users = list(reference.users)
+        
+        rng = random.Random(seed)
+        for step in range(60):
+            companies, coi_classes = list(reference.companies), list(reference.coi_classes)
+            choice = rng.random()
+            # Moves put two companies of one class in a history, so releasing one must promote the earliest
+            if choice < 0.55:
+                operation = ("access_object", rng.choice(users), rng.choice(companies), "object", f"t{step:03d}")
+            elif choice < 0.75:
+                operation = ("update_company", rng.choice(companies), "Name", rng.choice(coi_classes))
+            elif choice < 0.85:
+                operation = ("revoke_access", rng.choice(users), rng.choice(companies))
+            elif choice < 0.9:
+                operation = ("delete_company", rng.choice(companies))
+            elif choice < 0.95:
+                operation = ("add_company", f"new{step}", "New", rng.choice(coi_classes))
+            else:
+                operation = ("reset_user_history", rng.choice(users))
+            
+            results = [getattr(model, operation[0])(*operation[1:]) for model in engines]
+            for model, result in zip(engines[1:], results[1:]):
+                self.assertEqual(result, results[0], (seed, step, operation, type(model).__name__))
+                
+                for user_id in users:
+                    self.assertEqual(list(model.user_access_history.get(user_id, {})),
+                                     list(reference.user_access_history.get(user_id, {})))
+                    for company_id in reference.companies:
+                        self.assertEqual(model.can_access(user_id, company_id),
+                                         reference.can_access(user_id, company_id),
+                                         (seed, step, operation, type(model).__name__, user_id, company_id))
+    
+    def test_random_operations(self):
+        for seed in range(30):
+            self.run_random_operations(seed)
+
+class ShardedModelTest(unittest.TestCase):
+    def setUp(self):
+        self.model = ShardedChineseWallModel(shards=2)
+        self.addCleanup(self.model.close)
+        DataManager(self.model).initialize_sample_data()
+    
+    def test_history_follows_deleted_company(self):
+        model = self.model
+        model.access_object("user1", "bank1", "bank1_data1", "2024-01-01 00:00:00")
+        model.delete_company("bank1")
+        
+        # Read before any other call could republish the catalog
+        self.assertEqual(dict(model.user_access_history["user1"]), {})
+        self.assertEqual(dict(model.user_access_history.items())["user1"], {})
+
+if __name__ == "__main__":
+    unittest.main()
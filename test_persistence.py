@@ -0,0 +1,128 @@
+"""
+Tests that model state survives a crash, with the write-ahead log or SQLite
+Run with: python -m unittest test_persistence
+"""
+
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import unittest
+from unittest import mock
+
+import persistence
+from chinese_wall_model import ChineseWallModel
+from data_manager import DataManager
+from persistence import PersistentStore
+from sqlite_model import SQLiteChineseWallModel
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Grants an access and kills the process before the background commit could run
+CRASH_SCRIPT = """
+import os, sys
+sys.path.insert(0, {repo_dir!r})
+from chinese_wall_model import ChineseWallModel
+from data_manager import DataManager
+from persistence import PersistentStore
+
+model = ChineseWallModel()
+store = PersistentStore(model, {data_dir!r}, commit_interval=3600, durable={durable!r})
+store.open()
+DataManager(model).initialize_sample_data()
+granted, _ = model.access_object("user1", "bank1", "bank1_data1", "2024-01-01 00:00:00")
+print(granted, flush=True)
+os._exit(0)
+"""
+
+# The same crash on the SQLite engine
+SQLITE_CRASH_SCRIPT = """
+import os, sys
+sys.path.insert(0, {repo_dir!r})
+from data_manager import DataManager
+from sqlite_model import SQLiteChineseWallModel
+
+model = SQLiteChineseWallModel({path!r})
+DataManager(model).initialize_sample_data()
+granted, _ = model.access_object("user1", "bank1", "bank1_data1", "2024-01-01 00:00:00")
+print(granted, flush=True)
+os._exit(0)
+"""
+
+class PersistentStoreTest(unittest.TestCase):
+    def setUp(self):
+        self.data_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.data_dir)
+    
+    def crash_after_access(self, durable):
+        """Run CRASH_SCRIPT in a child process and reopen what it left on disk"""
+        script = CRASH_SCRIPT.format(repo_dir=REPO_DIR, data_dir=self.data_dir, durable=durable)
+        output = subprocess.run([sys.executable, "-c", script], check=True,
+                                capture_output=True, text=True).stdout
+        self.assertEqual(output.strip(), "True")
+        
+        model = ChineseWallModel()
+        store = PersistentStore(model, self.data_dir)
+        store.open()
+        self.addCleanup(store.close)
+        return model
+    
+    def test_granted_access_survives_crash(self):
+        model = self.crash_after_access(durable=True)
+        self.assertIn("bank1", model.user_access_history["user1"])
+        self.assertFalse(model.can_access("user1", "bank2")[0])
+    
+    def test_concurrent_mutations_share_fsyncs(self):
+        model = ChineseWallModel()
+        store = PersistentStore(model, self.data_dir, commit_interval=3600)
+        store.open()
+        DataManager(model).initialize_sample_data()
+        
+        fsyncs = []
+        real_fsync = os.fsync
+        def counting_fsync(fd):
+            fsyncs.append(fd)
+            real_fsync(fd)
+        
+        def access_many(user_id):
+            for i in range(50):
+                model.access_object(user_id, "tech1", "tech1_data1", f"2024-01-01 00:00:{i:02d}")
+        
+        with mock.patch.object(persistence.os, "fsync", counting_fsync):
+            threads = [threading.Thread(target=access_many, args=(user_id,)) for user_id in model.users]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        
+        self.assertEqual(store.durable_sequence, store.sequence)
+        self.assertLessEqual(len(fsyncs), 50 * len(threads))
+        store.close()
+        
+        restored = ChineseWallModel()
+        restored_store = PersistentStore(restored, self.data_dir)
+        restored_store.open()
+        self.addCleanup(restored_store.close)
+        self.assertEqual(len(restored.access_logs), len(model.access_logs))
+
+class SQLiteDurabilityTest(unittest.TestCase):
+    def setUp(self):
+        self.data_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.data_dir)
+    
+    def test_granted_access_survives_crash(self):
+        path = os.path.join(self.data_dir, "model.db")
+        script = SQLITE_CRASH_SCRIPT.format(repo_dir=REPO_DIR, path=path)
+        output = subprocess.run([sys.executable, "-c", script], check=True,
+                                capture_output=True, text=True).stdout
+        self.assertEqual(output.strip(), "True")
+        
+        model = SQLiteChineseWallModel(path)
+        self.addCleanup(model.close)
+        self.assertIn("bank1", model.user_access_history["user1"])
+        self.assertFalse(model.can_access("user1", "bank2")[0])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -5,9 +5,15 @@ Utility functions for the Chinese Wall Model Application
 import tkinter as tk
 from tkinter import ttk, font
 import random
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from typing import Optional, Callable, Dict, Any, List, Tuple
 import platform
 
+# How often, in milliseconds, a BackgroundExecutor checks its tasks
+TASK_POLL_INTERVAL_MS = 100
+
 def create_tooltip(widget, text):
     """Create a tooltip for a widget"""
     def enter(event):
@@ -92,6 +98,407 @@ def create_scrollable_frame(parent):
     
     return frame
 
+class VirtualList(ttk.Frame):
+    """
+    Scrollable list that only has widgets for the rows in view.
+
+    Rows have a fixed height. create_row(parent) builds a row widget and
+    fill_row(row, item, selected) shows an item in it. As the list scrolls the
+    same row widgets are filled with other items, so the number of widgets
+    depends on the height of the list, not on the number of items.
+    """
+    
+    def __init__(self, parent, create_row, fill_row, row_height=30, on_select=None, on_context_menu=None):
+        super().__init__(parent)
+        self.create_row = create_row
+        self.fill_row = fill_row
+        self.row_height = row_height
+        self.on_select = on_select
+        self.on_context_menu = on_context_menu
+        
+        self.items = []
+        self.selected_index = None
+        
+        # Row widgets with their canvas windows, and the index of the item each one shows
+        # Format: [(row, window_id)], [item index or None]
+        self._rows = []
+        self._row_items = []
+        
+        # One row is scrolled per unit, so rows stay aligned to the top
+        self.canvas = tk.Canvas(self, borderwidth=0, highlightthickness=0, yscrollincrement=row_height)
+        scrollbar = ttk.Scrollbar(self, orient=tk.VERTICAL, command=self.yview)
+        self.canvas.configure(yscrollcommand=scrollbar.set)
+        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        self.canvas.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        
+        self.canvas.bind('<Configure>', self._on_configure)
+        self._bind_mousewheel(self.canvas)
+    
+    def set_items(self, items):
+        """Show a new list of items, keeping the scroll position and, if unmoved, the selected item"""
+        selected = self.selection()
+        self.items = list(items)
+        if self.selected_index is not None and (self.selected_index >= len(self.items) or
+                                                self.items[self.selected_index] != selected):
+            self.selected_index = None
+        self._update_scrollregion()
+        self.refresh()
+    
+    def selection(self):
+        """Get the selected item, or None"""
+        return None if self.selected_index is None else self.items[self.selected_index]
+    
+    def select(self, index):
+        """Select the item at index"""
+        if index != self.selected_index:
+            self.selected_index = index
+            self.refresh()
+            if self.on_select:
+                self.on_select(self.items[index])
+    
+    def yview(self, *args):
+        """Scroll the list; the scrollbar's command"""
+        self.canvas.yview(*args)
+        self.refresh()
+    
+    def refresh(self):
+        """Fill the rows in view, creating more rows only if the list has grown taller"""
+        first, last = self._visible_range()
+        while len(self._rows) < last - first:
+            self._add_row()
+        
+        for slot, (row, window_id) in enumerate(self._rows):
+            index = first + slot
+            if index < min(last, len(self.items)):
+                self.canvas.coords(window_id, 0, index * self.row_height)
+                self.canvas.itemconfigure(window_id, state=tk.NORMAL)
+                self.fill_row(row, self.items[index], index == self.selected_index)
+                self._row_items[slot] = index
+            elif self._row_items[slot] is not None:
+                self.canvas.itemconfigure(window_id, state=tk.HIDDEN)
+                self._row_items[slot] = None
+    
+    def _visible_range(self):
+        """Get the (first, last + 1) indexes of the items that fit in view, including a partly shown one"""
+        first = int(self.canvas.canvasy(0)) // self.row_height
+        return first, first + self.canvas.winfo_height() // self.row_height + 2
+    
+    def _update_scrollregion(self):
+        self.canvas.configure(scrollregion=(0, 0, self.canvas.winfo_width(), len(self.items) * self.row_height))
+    
+    def _on_configure(self, event):
+        """Stretch the rows to the new width and fill any newly visible rows"""
+        for row, window_id in self._rows:
+            self.canvas.itemconfigure(window_id, width=event.width)
+        self._update_scrollregion()
+        self.refresh()
+    
+    def _add_row(self):
+        """Create a row widget and bind its clicks to the item it shows"""
+        slot = len(self._rows)
+        row = self.create_row(self.canvas)
+        window_id = self.canvas.create_window(0, 0, window=row, anchor="nw", state=tk.HIDDEN,
+                                              width=self.canvas.winfo_width(), height=self.row_height)
+        self._rows.append((row, window_id))
+        self._row_items.append(None)
+        
+        widgets = [row]
+        while widgets:
+            widget = widgets.pop()
+            widgets.extend(widget.winfo_children())
+            widget.bind('<Button-1>', lambda event: self._on_click(slot), add="+")
+            widget.bind('<Button-3>', lambda event: self._on_right_click(slot, event), add="+")
+            self._bind_mousewheel(widget)
+    
+    def _on_click(self, slot):
+        if self._row_items[slot] is not None:
+            self.select(self._row_items[slot])
+    
+    def _on_right_click(self, slot, event):
+        if self._row_items[slot] is not None:
+            self.select(self._row_items[slot])
+            if self.on_context_menu:
+                self.on_context_menu(self.items[self._row_items[slot]], event)
+    
+    def _bind_mousewheel(self, widget):
+        """Scroll the list with the mouse wheel while the pointer is over widget"""
+        def _on_mousewheel(event):
+            # Cross-platform mouse wheel scrolling
+            if platform.system() == 'Windows':
+                self.yview(tk.SCROLL, int(-1*(event.delta/120)), "units")
+            elif event.num == 4:
+                self.yview(tk.SCROLL, -1, "units")
+            elif event.num == 5:
+                self.yview(tk.SCROLL, 1, "units")
+        
+        if platform.system() == 'Windows':
+            widget.bind("<MouseWheel>", _on_mousewheel, add="+")
+        else:
+            widget.bind("<Button-4>", _on_mousewheel, add="+")
+            widget.bind("<Button-5>", _on_mousewheel, add="+")
+
+class LazyNotebook(ttk.Notebook):
+    """
+    Notebook whose tabs are filled the first time they are selected.
+
+    add_lazy(text, build) adds an empty tab and build(frame) fills it when it
+    is first shown. With max_built set, the contents of the least recently
+    shown tabs beyond that number are destroyed, to be built again if shown.
+    """
+    
+    def __init__(self, parent, max_built=None, **kwargs):
+        super().__init__(parent, **kwargs)
+        self.max_built = max_built
+        
+        # Format: {tab frame path: build function}
+        self._builders = {}
+        
+        # Built tabs, least recently shown first
+        # Format: {tab frame path: tab frame}
+        self._built = OrderedDict()
+        
+        self.bind('<<NotebookTabChanged>>', lambda event: self._build_selected(), add="+")
+    
+    def add_lazy(self, text, build, **kwargs):
+        """
+        Add a tab that build(frame) fills when it is first selected
+        Returns: ttk.Frame - the tab's frame
+        """
+        frame = ttk.Frame(self)
+        self._builders[str(frame)] = build
+        self.add(frame, text=text, **kwargs)
+        
+        # The first tab is selected as it is added
+        self._build_selected()
+        return frame
+    
+    def is_built(self, frame):
+        """Check whether a tab has been filled"""
+        return str(frame) in self._built
+    
+    def invalidate(self, *frames):
+        """Empty the given tabs (default: all) so they are built again from current data; the selected tab is rebuilt now"""
+        for path in [str(frame) for frame in frames] if frames else list(self._built):
+            frame = self._built.pop(path, None)
+            if frame is not None:
+                for widget in frame.winfo_children():
+                    widget.destroy()
+        self._build_selected()
+    
+    def _build_selected(self):
+        """Fill the selected tab if needed, and empty the tabs shown least recently"""
+        selected = self.select()
+        if not selected or selected not in self._builders:
+            return
+        
+        if selected in self._built:
+            self._built.move_to_end(selected)
+        else:
+            frame = self.nametowidget(selected)
+            self._built[selected] = frame
+            self._builders[selected](frame)
+        
+        while self.max_built is not None and len(self._built) > self.max_built:
+            _, frame = self._built.popitem(last=False)
+            for widget in frame.winfo_children():
+                widget.destroy()
+
+class TaskCancelled(Exception):
+    """Raised by BackgroundTask.check_cancelled to stop a cancelled task"""
+
+class BackgroundTask:
+    """
+    A callable running on a BackgroundExecutor.
+
+    On a thread pool the callable gets its task as first argument, to report
+    progress and to stop early once the task is cancelled. The callbacks are
+    called on the Tk thread.
+    """
+    
+    def __init__(self, on_done=None, on_error=None, on_progress=None, on_finished=None):
+        self.on_done = on_done
+        self.on_error = on_error
+        self.on_progress = on_progress
+        self.on_finished = on_finished
+        self.future = None
+        self._cancelled = threading.Event()
+        
+        # Latest progress reported by the worker and not delivered yet
+        # Format: (fraction or None, message) or None
+        self._progress = None
+    
+    def report_progress(self, fraction=None, message=""):
+        """Report progress from the worker; fraction is from 0 to 1, or None if the total is unknown"""
+        self._progress = (fraction, message)
+    
+    def cancel(self):
+        """Ask the task to stop; a task that has not started is dropped, and no result is delivered"""
+        self._cancelled.set()
+        if self.future is not None:
+            self.future.cancel()
+    
+    def is_cancelled(self):
+        """Check whether the task was cancelled"""
+        return self._cancelled.is_set()
+    
+    def check_cancelled(self):
+        """Stop the worker with TaskCancelled if the task was cancelled"""
+        if self._cancelled.is_set():
+            raise TaskCancelled()
+    
+    def _take_progress(self):
+        progress, self._progress = self._progress, None
+        return progress
+
+class BackgroundExecutor:
+    """
+    Runs long operations on a thread or process pool, off the Tk thread.
+
+    Tk may only be called from its own thread, so progress, results and
+    errors are handed back by polling the tasks with root.after every
+    TASK_POLL_INTERVAL_MS while any are running.
+    """
+    
+    def __init__(self, root, max_workers=2, use_processes=False):
+        self.root = root
+        self.use_processes = use_processes
+        if use_processes:
+            self._pool = ProcessPoolExecutor(max_workers=max_workers)
+        else:
+            self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="gui-worker")
+        
+        self._tasks = []
+        self._poll_id = None
+    
+    def submit(self, fn, *args, on_done=None, on_error=None, on_progress=None, on_finished=None):
+        """
+        Run fn in the pool: as fn(task, *args) on a thread pool, or as fn(*args) on a
+        process pool, where fn and args must be picklable and there is no progress.
+        on_done(result), on_error(exception), on_progress(fraction, message) and
+        on_finished() are called on the Tk thread; a cancelled task only gets on_finished.
+        Returns: BackgroundTask
+        """
+        task = BackgroundTask(on_done, on_error, on_progress, on_finished)
+        if self.use_processes:
+            task.future = self._pool.submit(fn, *args)
+        else:
+            task.future = self._pool.submit(fn, task, *args)
+        
+        self._tasks.append(task)
+        if self._poll_id is None:
+            self._poll_id = self.root.after(TASK_POLL_INTERVAL_MS, self._poll)
+        return task
+    
+    def run_with_progress(self, parent, title, fn, *args, on_done=None, on_error=None, cancellable=True):
+        """
+        Submit fn and show its progress in a ProgressDialog until it finishes
+        Returns: BackgroundTask
+        """
+        dialog = ProgressDialog(parent, title)
+        task = self.submit(fn, *args, on_done=on_done, on_error=on_error,
+                           on_progress=dialog.show_progress, on_finished=dialog.destroy)
+        if cancellable:
+            dialog.on_cancel = task.cancel
+        else:
+            dialog.cancel_button.config(state=tk.DISABLED)
+        return task
+    
+    def shutdown(self):
+        """Cancel the tasks and stop polling; running workers stop at their next cancellation check"""
+        for task in self._tasks:
+            task.cancel()
+        self._tasks = []
+        if self._poll_id is not None:
+            self.root.after_cancel(self._poll_id)
+            self._poll_id = None
+        self._pool.shutdown(wait=False)
+    
+    def _poll(self):
+        """Deliver the progress of running tasks and the outcome of finished ones"""
+        self._poll_id = None
+        
+        # Callbacks may submit new tasks, which are added to the emptied list
+        tasks, self._tasks = self._tasks, []
+        running = []
+        for task in tasks:
+            progress = task._take_progress()
+            if progress is not None and task.on_progress and not task.is_cancelled():
+                task.on_progress(*progress)
+            if task.future.done():
+                self._finish(task)
+            else:
+                running.append(task)
+        
+        self._tasks = running + self._tasks
+        if self._tasks and self._poll_id is None:
+            self._poll_id = self.root.after(TASK_POLL_INTERVAL_MS, self._poll)
+    
+    def _finish(self, task):
+        """Call the callbacks of a finished task"""
+        try:
+            if task.is_cancelled():
+                return
+            error = task.future.exception()
+            if isinstance(error, TaskCancelled):
+                return
+            if error is not None:
+                if task.on_error:
+                    task.on_error(error)
+                else:
+                    self.root.report_callback_exception(type(error), error, error.__traceback__)
+            elif task.on_done:
+                task.on_done(task.future.result())
+        finally:
+            if task.on_finished:
+                task.on_finished()
+
+class ProgressDialog(tk.Toplevel):
+    """Window showing the progress of a background task, with a Cancel button"""
+    
+    def __init__(self, parent, title):
+        super().__init__(parent)
+        self.title(title)
+        self.transient(parent.winfo_toplevel())
+        self.resizable(False, False)
+        
+        # Called when Cancel is pressed
+        self.on_cancel = None
+        
+        self.message_var = tk.StringVar(value="Working...")
+        ttk.Label(self, textvariable=self.message_var, wraplength=300).pack(fill=tk.X, padx=15, pady=(15, 5))
+        
+        # Indeterminate until the task reports how far along it is
+        self.progress_bar = ttk.Progressbar(self, length=300, mode="indeterminate", maximum=1.0)
+        self.progress_bar.pack(padx=15, pady=5)
+        self.progress_bar.start()
+        
+        self.cancel_button = ttk.Button(self, text="Cancel", command=self.cancel)
+        self.cancel_button.pack(side=tk.RIGHT, padx=15, pady=(5, 15))
+        self.protocol("WM_DELETE_WINDOW", self.cancel)
+    
+    def show_progress(self, fraction, message):
+        """Show reported progress; fraction is None when the total is unknown"""
+        if not self.winfo_exists():
+            return
+        if message:
+            self.message_var.set(message)
+        if fraction is None:
+            if str(self.progress_bar.cget("mode")) != "indeterminate":
+                self.progress_bar.config(mode="indeterminate")
+                self.progress_bar.start()
+        else:
+            self.progress_bar.stop()
+            self.progress_bar.config(mode="determinate", value=fraction)
+    
+    def cancel(self):
+        """Cancel the task; the dialog closes once the worker has stopped"""
+        if self.on_cancel is None:
+            return
+        self.on_cancel()
+        self.on_cancel = None
+        self.cancel_button.config(state=tk.DISABLED)
+        self.message_var.set("Cancelling...")
+
 def create_styled_button(parent, text, command, **kwargs):
     """Create a styled button"""
     style_name = f"Custom.TButton.{random.randint(1000, 9999)}"
@@ -340,6 +747,7 @@ def create_collapsible_section(parent, title, content_creator_func):
     content_frame = None
     
     def toggle():
+        nonlocal content_frame
         if is_expanded.get():
             # Collapse
             if content_frame:
@@ -348,7 +756,6 @@ def create_collapsible_section(parent, title, content_creator_func):
             toggle_button.configure(text="▶")
         else:
             # Expand
-            nonlocal content_frame
             content_frame = ttk.Frame(frame)
             content_frame.pack(fill=tk.X, padx=20, pady=5)
             content_creator_func(content_frame)